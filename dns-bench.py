@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# vim: autoindent tabstop=4 shiftwidth=4 expandtab softtabstop=4 filetype=python
+
+import sys
+import json
+import argparse
+from lib.bench import *
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DNS monitoring against local stub nameservers. '
+                                                 'Needs Linux and permission to listen on port 53 of loopback.')
+    parser.add_argument('--mode', dest='modes', action='append', choices=Benchmark.MODES,
+                        help='Monitor mode to benchmark, can be given many times. Default is all.')
+    parser.add_argument('--records', dest='scales', type=int, action='append',
+                        help='Number of records to watch, can be given many times. Default = %s' %
+                             ', '.join(str(scale) for scale in Benchmark.DEFAULT_SCALES))
+    parser.add_argument('--asyncio', dest='engine', action='store_const', const='asyncio', default='threads',
+                        help='Benchmark the asyncio engine instead of threads')
+    parser.add_argument('--parallel', dest='parallel', type=int,
+                        help='Max number of DNS-servers to query at once. Default is what engine has.')
+    parser.add_argument('--passes', dest='passes', type=int, default=Benchmark.DEFAULT_PASSES,
+                        help='Passes to measure per case. Default = %d' % Benchmark.DEFAULT_PASSES)
+    parser.add_argument('-W', '--timeout', dest='timeout', type=float, default=2.0,
+                        help='Time to wait for DNS response. Default = 2.0 [seconds]')
+    parser.add_argument('--servers', dest='servers', type=int, default=4,
+                        help='Number of authority stub servers. Default = 4')
+    parser.add_argument('--authorities-per-zone', dest='authorities_per_zone', type=int, default=2,
+                        help='Number of authorities of each zone. Default = 2')
+    parser.add_argument('--records-per-zone', dest='records_per_zone', type=int, default=100,
+                        help='Default = 100')
+    parser.add_argument('--latency', dest='latency', type=float, default=0.0,
+                        help='Delay of every stub response. Default = 0 [seconds]')
+    parser.add_argument('--jitter', dest='jitter', type=float, default=0.0,
+                        help='Random extra delay of stub responses, up to this. Default = 0 [seconds]')
+    parser.add_argument('--drop-rate', dest='drop_rate', type=float, default=0.0,
+                        help='Share of UDP queries left unanswered, 0 - 1. Default = 0')
+    parser.add_argument('--truncate-rate', dest='truncate_rate', type=float, default=0.0,
+                        help='Share of UDP responses truncated to force TCP, 0 - 1. Default = 0')
+    parser.add_argument('--answer-size', dest='answer_size', type=int, default=1,
+                        help='Records in every answer. Over 512 bytes will go over TCP. Default = 1')
+    parser.add_argument('--label', dest='label',
+                        help='Tag results with this, eg. a commit')
+    parser.add_argument('--output', dest='output', metavar='FILE',
+                        help='Append results as JSON Lines, one object per case')
+    parser.add_argument('--baseline', dest='baseline', metavar='FILE',
+                        help='Results of an earlier run to compare to')
+
+    args = parser.parse_args()
+
+    scales = args.scales or Benchmark.DEFAULT_SCALES
+    layout = FarmLayout(records=max(scales), records_per_zone=args.records_per_zone, servers=args.servers,
+                        authorities_per_zone=args.authorities_per_zone, answer_size=args.answer_size)
+    farm = StubFarm(layout, latency=args.latency, jitter=args.jitter, drop_rate=args.drop_rate,
+                    truncate_rate=args.truncate_rate)
+    try:
+        farm.start()
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        exit(1)
+
+    baseline = Benchmark.read(args.baseline) if args.baseline else {}
+    output = open(args.output, 'a') if args.output else None
+    benchmark = Benchmark(farm, modes=args.modes, scales=scales, engine=args.engine, passes=args.passes,
+                          timeout=args.timeout, parallel=args.parallel, label=args.label)
+    print(Benchmark.header(), flush=True)
+    try:
+        for result in benchmark.run():
+            print(Benchmark.format(result, baseline.get(Benchmark.case_key(result))), flush=True)
+            if output:
+                output.write(json.dumps(result, separators=(',', ':')))
+                output.write('\n')
+                output.flush()
+    finally:
+        farm.stop()
+        if output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
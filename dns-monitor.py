@@ -3,31 +3,112 @@
 # vim: autoindent tabstop=4 shiftwidth=4 expandtab softtabstop=4 filetype=python
 
 import sys
+import atexit
+import signal
 import argparse
-from lib.dns import *
-from lib.monitor import *
+import functools
+
+# Has to start before the first import of lib to see all of them
+if '--profile-imports' in sys.argv:
+    from lib.bench.import_profile import ImportProfile
+    import_profile = ImportProfile()
+    import_profile.start()
+    atexit.register(lambda: print("\n%s" % import_profile.report(), file=sys.stderr, flush=True))
+
+# Packages of lib load modules on first use. The rest is imported where needed,
+# a single pass loads only the selected mode and engine.
+from lib.dns import DNS, DNSMonitorError, QueryCoalescer, ResolverPool
+from lib.monitor import PollScheduler
 
 DEFAULT_DNS_TIMEOUT = 5.0
+DEFAULT_METRICS_INTERVAL = 60
+DEFAULT_RESOLVER_RATE = 10
 
 
 def main():
     parser = argparse.ArgumentParser(description='DNS query helper tool')
-    parser.add_argument('host',
+    parser.add_argument('host', nargs='?',
                         help='FQDN to query')
+    parser.add_argument('--watchlist', dest='watchlist', metavar='FILE',
+                        help='Monitor multiple records listed in a file, - for stdin. '
+                             'One record per line: host [RR-type [expected value[,value...]]]')
     parser.add_argument('-t', '--rr-type', dest='rr_type', default='A',
                         help='DNS RR-type to query. Default = A')
     parser.add_argument('--override-local-dns', dest='local_dns', action='append',
                         help='Use this DNS/DNSes as local instead of default one/ones')
     parser.add_argument('-d', '--dns', dest='additional_dns', action='append',
                         help='Additional DNS-servers to use')
+    parser.add_argument('--resolvers', dest='resolvers', metavar='FILE',
+                        help='Sweep a list of resolvers, eg. public and ISP ones, as additional DNS-servers. '
+                             'One per line: IP-address [region [name]]. Use with --asyncio and a high --parallel '
+                             'for hundreds of resolvers.')
+    parser.add_argument('--resolver-rate', dest='resolver_rate', type=float, metavar='QPS',
+                        help='Max queries per second to any one DNS-server. Default = %d with --resolvers' %
+                             DEFAULT_RESOLVER_RATE)
+    parser.add_argument('--total-rate', dest='total_rate', type=float, metavar='QPS',
+                        help='Max queries per second to all DNS-servers together. When exceeded, queries to local '
+                             'DNS go first, then authorities, then additional DNS-servers')
+    parser.add_argument('--resolver-max-timeouts', dest='resolver_max_timeouts', type=int,
+                        default=ResolverPool.DEFAULT_MAX_TIMEOUTS,
+                        help='With --resolvers: stop querying a resolver after this many timeouts in a row. '
+                             'Default = %d' % ResolverPool.DEFAULT_MAX_TIMEOUTS)
+    parser.add_argument('--query-freshness', dest='query_freshness', type=float, metavar='SECONDS',
+                        default=QueryCoalescer.DEFAULT_FRESHNESS,
+                        help='Identical queries to a server in flight are sent once. Queries repeated within this '
+                             'time are answered from the last response, polling faster than this sees stale '
+                             'answers. Default = %.1f, merge queries in flight only' %
+                             QueryCoalescer.DEFAULT_FRESHNESS)
+    parser.add_argument('--tls', dest='use_tls', action='store_true', default=False,
+                        help='Query DNS-servers using DNS-over-TLS. Connections are kept open between queries.')
+    parser.add_argument('--asyncio', dest='use_asyncio', action='store_true', default=False,
+                        help='Send queries from a single asyncio event loop instead of a thread per query. '
+                             'Use with a high --parallel to watch large numbers of records.')
+    parser.add_argument('--authority-addresses', dest='authority_addresses', choices=['race', 'all'],
+                        default='race',
+                        help='Authorities with several IPv6- and IPv4-addresses: race the addresses and use first '
+                             'answer (default) or query and report every address separately')
+    parser.add_argument('--authority-cache', dest='authority_cache', metavar='FILE',
+                        help='Keep found authorities in a file between runs. Entries expire with their TTL.')
     parser.add_argument('-i', '--interval', dest='interval',
                         help='Keep looping forever with given interval')
+    parser.add_argument('--adaptive-interval', dest='adaptive_interval', action='store_true', default=False,
+                        help='Adapt --interval to TTL of local DNS and back off on timeouts')
+    parser.add_argument('--min-interval', dest='min_interval', type=float,
+                        help='With --adaptive-interval, never wait less than this, eg. when cached TTL is about '
+                             'to expire. Default = --interval')
+    parser.add_argument('--max-interval', dest='max_interval', type=float,
+                        help='With --adaptive-interval, never wait more than this. Default = %d' %
+                             PollScheduler.DEFAULT_MAX_INTERVAL)
+    parser.add_argument('--soa-precheck', dest='soa_precheck', action='store_true', default=False,
+                        help='Ask authorities for serial of the zone first, query the record only when a serial '
+                             'has moved')
+    parser.add_argument('--notify-listen', dest='notify_listen', metavar='[ADDRESS:]PORT',
+                        help='Listen for DNS NOTIFY from the primary and check right away when one arrives')
+    parser.add_argument('--notify-from', dest='notify_from', metavar='ADDRESS', action='append',
+                        help='With --notify-listen: accept NOTIFY only from this address. Default is any.')
     parser.add_argument('--continue-on-success', dest='interval_stop_on_success', action='store_false', default=True,
                         help='Keep looping with given --interval even if a success is found')
+    parser.add_argument('--json', dest='json_output', metavar='FILE',
+                        help='Write results as JSON Lines, one object per server per pass. - for stdout')
+    parser.add_argument('--metrics-listen', dest='metrics_listen', metavar='[ADDRESS:]PORT',
+                        help='Daemon mode: keep monitoring and serve Prometheus metrics at http://ADDRESS:PORT/metrics')
+    parser.add_argument('--history', dest='history', metavar='FILE',
+                        help='Append changes of every server\'s answers to a history file for later reporting')
+    parser.add_argument('--history-report', dest='history_report', metavar='FILE',
+                        help='Print time-to-propagate per server and region from a history file and exit')
+    parser.add_argument('--regions', dest='regions', metavar='FILE',
+                        help='With --history-report: regions of servers, one per line: server region')
     parser.add_argument('--print-only-fail', action='store_true', dest='only_fail',
                         help="Default is to print all results. Keep output terse.")
-    parser.add_argument('-W', '--timeout', dest='timeout', default=DEFAULT_DNS_TIMEOUT,
+    parser.add_argument('-W', '--timeout', dest='timeout', type=float, default=DEFAULT_DNS_TIMEOUT,
                         help='Time to wait fo DNS response. %s [seconds]' % DEFAULT_DNS_TIMEOUT)
+    parser.add_argument('--processes', dest='processes', type=int, default=1,
+                        help='With --watchlist: split records by zone to this many worker processes. '
+                             'Rate limits are shared equally by the processes. Default = 1')
+    parser.add_argument('--parallel', dest='max_parallel_queries', type=int,
+                        default=DNS.DEFAULT_MAX_PARALLEL_QUERIES,
+                        help='Max number of DNS-servers to query at once. Default = %d' %
+                             DNS.DEFAULT_MAX_PARALLEL_QUERIES)
     parser.add_argument('--mode-match-authoritative-to-local', dest='mode_authoritative_compare_to_local',
                         action='store_true',
                         help='Mode: Monitor both local and authoritative DNS. Wait for their values to match.')
@@ -36,96 +117,264 @@ def main():
                         action='store_true',
                         help='Mode: Monitor both local and parent of authoritative DNS. Wait for their values to match.')
     parser.add_argument('--mode-monitor-local-expected', dest='mode_local_expected', metavar='EXPECTED_VALUE',
-                        help='Monitor for an upcoming change. Wait for expected result to appear in local DNS.')
+                        help='Monitor for an upcoming change. Wait for expected result to appear in local DNS. '
+                             'Separate records of a multi-valued RRset with commas.')
     parser.add_argument('--mode-monitor-remote-expected', dest='mode_remote_expected', metavar='EXPECTED_VALUE',
-                        help='Monitor for an upcoming change. Wait for expected result to appear in authoritative DNS.')
+                        help='Monitor for an upcoming change. Wait for expected result to appear in authoritative DNS. '
+                             'Separate records of a multi-valued RRset with commas.')
     parser.add_argument('--mode-monitor-local-change', dest='mode_local_change', action='store_true',
                         help='Monitor for an upcoming change. Wait for local DNS value to change.')
     parser.add_argument('--mode-monitor-remote-change', dest='mode_remote_change', action='store_true',
                         help='Monitor for an upcoming change. Wait for authoritative DNS value to change.')
+    parser.add_argument('--mode-monitor-dnssec-rollover', dest='mode_dnssec_rollover', metavar='KEY_TAG',
+                        nargs='?', type=int, const=-1,
+                        help='Monitor a KSK or ZSK rollover of zone given as host. Wait for DS at parent and DNSKEY '
+                             'and signatures at authorities to form a valid chain, with KEY_TAG in use if given.')
+    parser.add_argument('--mode-monitor-zone-transfer', dest='mode_zone_transfer', action='store_true',
+                        help='Transfer zone of host from every authority with AXFR. Wait for the copies to be same, '
+                             'or same as --expected-zone.')
+    parser.add_argument('--expected-zone', dest='expected_zone', metavar='FILE',
+                        help='With --mode-monitor-zone-transfer: compare the copies to this zone file')
+    parser.add_argument('--ixfr-serial', dest='ixfr_serial', type=int, metavar='SERIAL',
+                        help='With --mode-monitor-zone-transfer: transfer and compare changes since this serial '
+                             'with IXFR')
+    parser.add_argument('--change-share', dest='change_share', type=float, metavar='PERCENT', default=100.0,
+                        help='With --mode-monitor-remote-change: success when this share of servers has changed. '
+                             'Default = 100')
+    parser.add_argument('--stats', action='store_true', default=False,
+                        help='Print query latency percentiles, timeouts and errors per server at exit. '
+                             'Also printed on SIGUSR1.')
+    parser.add_argument('--profile-imports', dest='profile_imports', action='store_true', default=False,
+                        help='Print the slowest imports and total time spent importing at exit')
     parser.add_argument('--verbose', '-v', action='store_true', default=False,
                         help="Noisy. Output status.")
 
     args = parser.parse_args()
 
-    if not args.host:
+    if args.history_report:
+        from lib.monitor import PropagationHistory
+        regions = PropagationHistory.read_regions(args.regions) if args.regions else None
+        print(PropagationHistory.read(args.history_report).report(regions=regions))
+        exit(0)
+
+    if args.metrics_listen:
+        # Daemon never stops on its own
+        args.interval_stop_on_success = False
+        if not args.interval:
+            args.interval = DEFAULT_METRICS_INTERVAL
+
+    if not args.host and not args.watchlist:
         parser.print_help(sys.stderr)
         exit(1)
 
-    dns = DNS(default_resolver=args.local_dns, query_timeout=args.timeout)
-    monitor = None
-    if args.mode_authoritative_compare_to_local:
-        monitor = MonitorAuthoritativeCompareLocal(dns, additional_dns=args.additional_dns)
-    elif args.mode_parent_authoritative_compare_to_local:
-        monitor = MonitorParentAuthoritativeCompareLocal(dns, additional_dns=args.additional_dns)
-    elif args.mode_local_expected:
-        monitor = MonitorLocalExpected(dns, args.mode_local_expected)
-    elif args.mode_remote_expected:
-        monitor = MonitorAuthoritativeExpected(dns, additional_dns=args.additional_dns)
-    elif args.mode_local_change:
-        monitor = MonitorLocalChange(dns)
-    elif args.mode_remote_change:
-        raise Exception("Not yet --mode-monitor-remote-change !")
-    else:
+    if args.resolvers:
+        if (args.mode_local_expected or args.mode_local_change or args.mode_dnssec_rollover is not None or
+                args.mode_zone_transfer):
+            print("--resolvers needs a mode querying additional DNS-servers. Cannot continue.", file=sys.stderr)
+            exit(1)
+        if args.resolver_rate is None:
+            args.resolver_rate = DEFAULT_RESOLVER_RATE
+
+    if args.expected_zone and args.ixfr_serial is not None:
+        print("--expected-zone cannot be compared to changes of --ixfr-serial. Cannot continue.", file=sys.stderr)
+        exit(1)
+
+    if args.notify_listen and args.processes > 1:
+        print("--notify-listen cannot be used with --processes. Cannot continue.", file=sys.stderr)
+        exit(1)
+
+    dns = create_dns(args)
+    notify_listener = create_notify_listener(args)
+    if dns.resolver_pool and not args.json_output == '-':
+        print("Sweeping %d resolvers" % len(dns.resolver_pool.resolvers))
+    setup_stats(dns, args.stats)
+
+    if not (args.mode_authoritative_compare_to_local or args.mode_parent_authoritative_compare_to_local or
+            args.mode_local_expected or args.mode_remote_expected or
+            args.mode_local_change or args.mode_remote_change or args.mode_dnssec_rollover is not None or
+            args.mode_zone_transfer):
         print("Need --mode-* to operate. Cannot continue.", file=sys.stderr)
         exit(1)
 
+    if args.watchlist:
+        watch_multiple(args, dns, notify_listener)
+        exit(0)
+
+    monitor = create_monitor(args, dns, args.mode_local_expected or args.mode_remote_expected)
+    monitor.output = create_output(args, dns)
+    monitor.notify_listener = notify_listener
+    # Keep stdout machine-readable
+    monitor.quiet = args.json_output == '-'
     monitor.init_monitor(args.host, args.rr_type)
 
     # Do a single pass only?
     args.timeout = int(args.timeout)
     if not args.interval:
-        if args.mode_authoritative_compare_to_local:
-            monitor.single_pass(args.host, args.rr_type,
-                                timeout=args.timeout, verbose=args.verbose)
-        elif args.mode_parent_authoritative_compare_to_local:
-            monitor.single_pass(args.host, args.rr_type,
-                                timeout=args.timeout, verbose=args.verbose)
-        elif args.mode_local_expected:
-            monitor.single_pass(args.host, args.rr_type,
-                                timeout=args.timeout, verbose=args.verbose)
-        elif args.mode_remote_expected:
-            monitor.single_pass(args.host, args.rr_type,
-                                timeout=args.timeout, verbose=args.verbose)
-        elif args.mode_local_change:
-            monitor.single_pass(args.host, args.rr_type,
-                                timeout=args.timeout, verbose=args.verbose)
-        elif args.mode_remote_change:
-            raise Exception("Not yet --mode-monitor-remote-change !")
-        else:
-            raise Exception("Internal: Oh really?")
+        monitor.single_pass(args.host, args.rr_type,
+                            timeout=args.timeout, verbose=args.verbose)
         exit(0)
 
+    monitor.continuous(args.host, args.rr_type,
+                       interval=args.interval, only_fail=args.only_fail,
+                       stop_on_success=args.interval_stop_on_success,
+                       min_interval=args.min_interval, max_interval=args.max_interval,
+                       adaptive=args.adaptive_interval,
+                       timeout=args.timeout, verbose=args.verbose)
+
+
+def create_dns(args, workers=1):
+    if args.use_asyncio:
+        from lib.dns import EventLoopDNS as engine
+    else:
+        engine = DNS
+    resolver_pool = None
+    if args.resolvers:
+        try:
+            resolver_pool = ResolverPool.read(args.resolvers, max_timeouts=args.resolver_max_timeouts)
+        except (OSError, ValueError) as exc:
+            print("Cannot read resolvers: %s" % exc, file=sys.stderr)
+            exit(1)
+    rate_limiter = None
+    if args.resolver_rate or args.total_rate:
+        from lib.dns import RateLimiter
+        # Worker processes of a sharded watchlist get an equal share each
+        rate_limiter = RateLimiter(per_server=args.resolver_rate / workers if args.resolver_rate else None,
+                                   total=args.total_rate / workers if args.total_rate else None)
+
+    return engine(default_resolver=args.local_dns, query_timeout=args.timeout,
+                  max_parallel_queries=args.max_parallel_queries, delegation_cache_file=args.authority_cache,
+                  use_tls=args.use_tls, authority_addresses=args.authority_addresses,
+                  resolver_pool=resolver_pool, rate_limiter=rate_limiter, query_freshness=args.query_freshness)
+
+
+def create_monitor(args, dns, expected):
     if args.mode_authoritative_compare_to_local:
-        monitor.continuous(args.host, args.rr_type,
-                           interval=args.interval, only_fail=args.only_fail,
-                           stop_on_success=args.interval_stop_on_success,
-                           timeout=args.timeout, verbose=args.verbose)
+        from lib.monitor import MonitorAuthoritativeCompareLocal
+        monitor = MonitorAuthoritativeCompareLocal(dns, additional_dns=args.additional_dns)
     elif args.mode_parent_authoritative_compare_to_local:
-        monitor.continuous(args.host, args.rr_type,
-                           interval=args.interval, only_fail=args.only_fail,
-                           stop_on_success=args.interval_stop_on_success,
-                           timeout=args.timeout, verbose=args.verbose)
+        from lib.monitor import MonitorParentAuthoritativeCompareLocal
+        monitor = MonitorParentAuthoritativeCompareLocal(dns, additional_dns=args.additional_dns)
     elif args.mode_local_expected:
-        monitor.continuous(args.host, args.rr_type,
-                           interval=args.interval, only_fail=args.only_fail,
-                           stop_on_success=args.interval_stop_on_success,
-                           timeout=args.timeout, verbose=args.verbose)
+        from lib.monitor import MonitorLocalExpected
+        monitor = MonitorLocalExpected(dns, expected)
     elif args.mode_remote_expected:
-        monitor.continuous(args.host, args.rr_type,
-                           interval=args.interval, only_fail=args.only_fail,
-                           stop_on_success=args.interval_stop_on_success,
-                           timeout=args.timeout, verbose=args.verbose)
+        from lib.monitor import MonitorAuthoritativeExpected
+        monitor = MonitorAuthoritativeExpected(dns, expected, additional_dns=args.additional_dns)
     elif args.mode_local_change:
-        monitor.continuous(args.host, args.rr_type,
-                           interval=args.interval, only_fail=args.only_fail,
-                           stop_on_success=args.interval_stop_on_success,
-                           timeout=args.timeout, verbose=args.verbose)
+        from lib.monitor import MonitorLocalChange
+        monitor = MonitorLocalChange(dns)
     elif args.mode_remote_change:
-        raise Exception("Not yet --mode-monitor-remote-change !")
+        from lib.monitor import MonitorAuthoritativeChange
+        monitor = MonitorAuthoritativeChange(dns, additional_dns=args.additional_dns,
+                                             change_share=args.change_share / 100.0)
+    elif args.mode_zone_transfer:
+        from lib.monitor import MonitorZoneTransfer
+        monitor = MonitorZoneTransfer(dns, expected_zone_file=args.expected_zone, serial=args.ixfr_serial)
+    elif args.mode_dnssec_rollover is not None:
+        from lib.monitor import MonitorDnssecRollover
+        monitor = MonitorDnssecRollover(dns, key_tag=args.mode_dnssec_rollover if args.mode_dnssec_rollover >= 0
+                                        else None)
     else:
         raise Exception("Internal: Oh really?")
+    monitor.soa_precheck = args.soa_precheck
+
+    return monitor
+
+
+def create_notify_listener(args):
+    if not args.notify_listen:
+        return None
+
+    from lib.dns import NotifyListener
+    address, _, port = args.notify_listen.rpartition(':')
+    try:
+        notify_listener = NotifyListener(address=address.strip('[]'), port=int(port),
+                                         allowed_sources=args.notify_from)
+    except (OSError, ValueError) as exc:
+        print("Cannot listen for NOTIFY at %s: %s" % (args.notify_listen, exc), file=sys.stderr)
+        exit(1)
+    notify_listener.start()
+    if args.json_output != '-':
+        print("Listening for NOTIFY at %s:%d" % (address or '*', notify_listener.port))
+
+    return notify_listener
+
+
+def create_output(args, dns):
+    from lib.monitor import ConsoleOutput, JsonLinesOutput, TeeOutput
+    if args.json_output:
+        output = JsonLinesOutput(args.json_output)
+    else:
+        output = ConsoleOutput()
+    outputs = [output]
+    if args.history:
+        from lib.monitor import HistoryOutput
+        outputs.append(HistoryOutput(args.history))
+    if args.metrics_listen:
+        from lib.monitor import MetricsOutput, MetricsServer
+        address, _, port = args.metrics_listen.rpartition(':')
+        metrics_output = MetricsOutput(dns)
+        metrics_server = MetricsServer(metrics_output, address=address.strip('[]'), port=int(port))
+        metrics_server.start()
+        if args.json_output != '-':
+            print("Serving metrics at http://%s:%d/metrics" % (address or '*', metrics_server.port))
+        outputs.append(metrics_output)
+    if len(outputs) == 1:
+        return output
+
+    return TeeOutput(outputs)
+
+
+def setup_stats(dns, print_at_exit):
+    def print_stats(signum=None, frame=None):
+        print("\n%s" % dns.stats.report(), file=sys.stderr, flush=True)
+        if dns.rate_limiter:
+            print(dns.rate_limiter.report(), file=sys.stderr, flush=True)
+
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, print_stats)
+    if print_at_exit:
+        atexit.register(print_stats)
+
+
+def watch_multiple(args, dns, notify_listener=None):
+    from lib.monitor import Watchlist
+    default_expected = args.mode_local_expected or args.mode_remote_expected
+    records = Watchlist.read(args.watchlist, default_rr_type=args.rr_type.upper(), default_expected=default_expected)
+    if not records:
+        print("No records to watch in %s. Cannot continue." % args.watchlist, file=sys.stderr)
+        exit(1)
+
+    if args.processes > 1:
+        from lib.monitor import ShardedWatchlist
+        # Workers build their own DNS and monitors, factories must be picklable
+        watchlist = ShardedWatchlist(functools.partial(create_dns, args), functools.partial(create_monitor, args),
+                                     records, args.processes, max_parallel_records=args.max_parallel_queries,
+                                     output=create_output(args, dns), dns=dns)
+    else:
+        watchlist = Watchlist(dns, functools.partial(create_monitor, args, dns), records,
+                              max_parallel_records=args.max_parallel_queries, output=create_output(args, dns))
+    # Keep stdout machine-readable
+    watchlist.quiet = args.json_output == '-'
+    watchlist.notify_listener = notify_listener
+    watchlist.init_monitor(verbose=args.verbose)
+
+    timeout = int(args.timeout)
+    if not args.interval:
+        if not watchlist.single_pass(timeout=timeout, verbose=args.verbose):
+            exit(2)
+        return
+
+    watchlist.continuous(interval=args.interval, only_fail=args.only_fail,
+                         stop_on_success=args.interval_stop_on_success,
+                         min_interval=args.min_interval, max_interval=args.max_interval,
+                         adaptive=args.adaptive_interval,
+                         timeout=timeout, verbose=args.verbose)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except DNSMonitorError as exc:
+        print(exc)
+        exit(2)
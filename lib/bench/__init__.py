@@ -0,0 +1,28 @@
+import importlib
+
+# Names are imported from their modules on first use, profiling imports of dns-monitor.py loads no stub servers.
+_MODULES = {
+    'FarmLayout': 'stub_farm',
+    'StubNameserver': 'stub_farm',
+    'StubFarm': 'stub_farm',
+    'send_notify': 'stub_farm',
+    'NullOutput': 'benchmark',
+    'Benchmark': 'benchmark',
+    'ImportProfile': 'import_profile',
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
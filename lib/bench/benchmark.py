@@ -0,0 +1,236 @@
+import json
+import time
+import resource
+import platform
+import functools
+import multiprocessing
+from .stub_farm import FarmLayout
+from ..dns.dns import DNS
+from ..dns.async_dns import AsyncDNS, EventLoopDNS
+from ..monitor.watchlist import Watchlist, WatchlistRecord
+from ..monitor.monitor_authoritative_expected import MonitorAuthoritativeExpected
+from ..monitor.monitor_authoritative_compare_local import MonitorAuthoritativeCompareLocal
+from ..monitor.monitor_authoritative_change import MonitorAuthoritativeChange
+from ..monitor.monitor_local_expected import MonitorLocalExpected
+from ..monitor.monitor_local_change import MonitorLocalChange
+
+
+class NullOutput:
+    """
+    Throw away results of passes, benchmark measures monitoring, not printing.
+    """
+
+    def report(self, pass_result, **kwargs):
+        pass
+
+    def report_record(self, pass_result, **kwargs):
+        pass
+
+    def summary(self, successes, records):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _create_monitor(mode, dns, expected):
+    if mode == 'remote-expected':
+        return MonitorAuthoritativeExpected(dns, expected)
+    elif mode == 'match-authoritative-to-local':
+        return MonitorAuthoritativeCompareLocal(dns)
+    elif mode == 'remote-change':
+        return MonitorAuthoritativeChange(dns)
+    elif mode == 'local-expected':
+        return MonitorLocalExpected(dns, expected)
+    elif mode == 'local-change':
+        return MonitorLocalChange(dns)
+
+    raise ValueError("Unknown mode %s" % mode)
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+
+    return values[max(0, (len(values) * percent + 99) // 100 - 1)]
+
+
+def _run_case(case, results):
+    """
+    Worker process: run one case with a DNS of its own, so memory use is of this case only.
+    """
+    try:
+        results.put(_measure(case))
+    except Exception as exc:
+        results.put({'error': "%s: %s" % (exc.__class__.__name__, exc)})
+
+
+def _measure(case):
+    layout = case['layout']
+    engine = EventLoopDNS if case['engine'] == 'asyncio' else DNS
+    # Every query is sent, identical ones included: measured is the engine, not the coalescing
+    dns = engine(default_resolver=[layout.LOCAL_ADDRESS], query_timeout=case['timeout'],
+                 max_parallel_queries=case['parallel'], query_freshness=None)
+    records = [WatchlistRecord(host, 'A', expected=layout.answer_values(record)[0])
+               for record, host in enumerate(layout.hosts())]
+    watchlist = Watchlist(dns, functools.partial(_create_monitor, case['mode'], dns), records,
+                          max_parallel_records=case['parallel'], output=NullOutput())
+    watchlist.quiet = True
+
+    started = time.monotonic()
+    watchlist.init_monitor()
+    init_seconds = time.monotonic() - started
+
+    pass_seconds = []
+    queries = dns.stats.queries
+    timeouts = dns.stats.timeouts
+    cpu = time.process_time()
+    started = time.monotonic()
+    for _ in range(case['passes']):
+        pass_started = time.monotonic()
+        watchlist.monitor(records, timeout=case['timeout'])
+        pass_seconds.append(time.monotonic() - pass_started)
+    seconds = time.monotonic() - started
+    cpu = time.process_time() - cpu
+    queries = dns.stats.queries - queries
+
+    return {
+        'init_s': round(init_seconds, 4),
+        'queries': queries,
+        'timeouts': dns.stats.timeouts - timeouts,
+        'qps': round(queries / seconds, 1) if seconds else None,
+        'pass_p50_s': round(_percentile(pass_seconds, 50), 4),
+        'pass_max_s': round(max(pass_seconds), 4),
+        'cpu_per_query_us': round(cpu / queries * 1e6, 1) if queries else None,
+        # Kilobytes on Linux
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+class Benchmark:
+    """
+    Measure monitoring against a StubFarm: queries per second, pass latency, CPU time per query
+    and memory, for every combination of mode and number of records.
+    Every case runs in a fresh process. Results are dicts, one per case, written as JSON Lines.
+    """
+    MODES = ['remote-expected', 'match-authoritative-to-local', 'remote-change', 'local-expected', 'local-change']
+    DEFAULT_SCALES = [1, 10, 100, 1000, 10000]
+    DEFAULT_PASSES = 5
+
+    def __init__(self, farm, modes=None, scales=None, engine='threads', passes=DEFAULT_PASSES, timeout=2.0,
+                 parallel=None, label=None):
+        """
+        :param farm: StubFarm, started by caller. Its layout needs as many records as the largest scale has.
+        :param modes: list of modes to run, default is all
+        :param scales: list of numbers of records
+        :param engine: 'threads' or 'asyncio'
+        :param passes: number of passes measured per case
+        :param timeout: seconds to wait for a response
+        :param parallel: max queries at once, default is what engine has
+        :param label: str to tag results with, eg. a commit
+        """
+        self.farm = farm
+        self.modes = modes or self.MODES
+        self.scales = scales or self.DEFAULT_SCALES
+        self.engine = engine
+        self.passes = passes
+        self.timeout = timeout
+        if parallel is None:
+            if engine == 'asyncio':
+                parallel = AsyncDNS.DEFAULT_MAX_PARALLEL_QUERIES
+            else:
+                parallel = DNS.DEFAULT_MAX_PARALLEL_QUERIES
+        self.parallel = parallel
+        self.label = label
+
+    def run_case(self, mode, records):
+        """
+        :return: dict, parameters and measurements of the case
+        """
+        layout = FarmLayout(records=records, records_per_zone=self.farm.layout.records_per_zone,
+                            servers=self.farm.layout.servers,
+                            authorities_per_zone=self.farm.layout.authorities_per_zone,
+                            answer_size=self.farm.layout.answer_size, ttl=self.farm.layout.ttl)
+        case = {'mode': mode, 'records': records, 'engine': self.engine, 'passes': self.passes,
+                'timeout': self.timeout, 'parallel': self.parallel, 'layout': layout}
+        results = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=_run_case, args=(case, results))
+        worker.start()
+        worker.join()
+        if worker.exitcode:
+            measurements = {'error': "exit code %d" % worker.exitcode}
+        else:
+            measurements = results.get()
+
+        result = {
+            'label': self.label,
+            'python': platform.python_version(),
+            'mode': mode,
+            'records': records,
+            'zones': layout.zones,
+            'engine': self.engine,
+            'parallel': self.parallel,
+            'passes': self.passes,
+            'servers': layout.servers,
+            'latency_s': self.farm.latency,
+            'drop_rate': self.farm.drop_rate,
+            'truncate_rate': self.farm.truncate_rate,
+            'answer_size': layout.answer_size,
+        }
+        result.update(measurements)
+
+        return result
+
+    def run(self):
+        """
+        :return: generator of dicts, result of every case as it finishes
+        """
+        for mode in self.modes:
+            for records in self.scales:
+                yield self.run_case(mode, records)
+
+    @staticmethod
+    def case_key(result):
+        return (result['mode'], result['records'], result['engine'], result['servers'], result['latency_s'],
+                result['drop_rate'], result['truncate_rate'], result['answer_size'])
+
+    @staticmethod
+    def read(results_file):
+        """
+        :param results_file: JSON Lines written earlier
+        :return: dict, case to result
+        """
+        results = {}
+        with open(results_file, 'r') as stream:
+            for line in stream:
+                if line.strip():
+                    result = json.loads(line)
+                    results[Benchmark.case_key(result)] = result
+
+        return results
+
+    @staticmethod
+    def format(result, baseline=None):
+        """
+        :param result: dict of a case
+        :param baseline: dict of same case from an earlier run, to show change
+        :return: str, a line of human-readable table
+        """
+        if 'error' in result:
+            return "%-30s %7d  %s" % (result['mode'], result['records'], result['error'])
+        line = "%-30s %7d %10.1f %10.4f %10.4f %10s %10d" % (
+            result['mode'], result['records'], result['qps'] or 0, result['pass_p50_s'], result['pass_max_s'],
+            result['cpu_per_query_us'] if result['cpu_per_query_us'] is not None else '-', result['max_rss_kb'])
+        if baseline and 'error' not in baseline and baseline['qps'] and result['qps']:
+            line += "  qps %+.1f%%, p50 %+.1f%%" % (
+                100.0 * (result['qps'] / baseline['qps'] - 1),
+                100.0 * (result['pass_p50_s'] / baseline['pass_p50_s'] - 1) if baseline['pass_p50_s'] else 0.0)
+
+        return line
+
+    @staticmethod
+    def header():
+        return "%-30s %7s %10s %10s %10s %10s %10s" % ('Mode', 'Records', 'Queries/s', 'Pass p50 s', 'Pass max s',
+                                                      'CPU us/q', 'Max RSS kB')
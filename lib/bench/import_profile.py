@@ -0,0 +1,106 @@
+import sys
+import time
+import threading
+
+
+class _TimedLoader:
+    """
+    Wraps the loader of a module to time executing it.
+    Everything else is passed on to the original loader.
+    """
+
+    def __init__(self, profile, name, loader, find_seconds):
+        self.profile = profile
+        self.name = name
+        self.loader = loader
+        self.seconds = find_seconds
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        start = time.perf_counter()
+        try:
+            return self.loader.create_module(spec)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def exec_module(self, module):
+        self.profile._enter()
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.profile._leave(self.name, self.seconds)
+
+
+class ImportProfile:
+    """
+    Time imports like python -X importtime does, from start() on.
+    Cumulative time of a module includes the modules it imported, self time doesn't.
+    """
+
+    def __init__(self):
+        self.started = None
+        # Tuples of module name, self and cumulative seconds in order of import
+        self.modules = []
+        # Seconds of imports not nested in other imports
+        self.total = 0.0
+        self.lock = threading.Lock()
+        # Per thread: seconds of nested imports of modules being imported
+        self.local = threading.local()
+
+    def start(self):
+        self.started = time.perf_counter()
+        sys.meta_path.insert(0, self)
+
+    def stop(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        start = time.perf_counter()
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is None:
+            # Namespace package, nothing to execute
+            return spec
+        spec.loader = _TimedLoader(self, fullname, spec.loader, time.perf_counter() - start)
+
+        return spec
+
+    def _enter(self):
+        if not hasattr(self.local, 'nested'):
+            self.local.nested = []
+        self.local.nested.append(0.0)
+
+    def _leave(self, name, seconds):
+        nested = self.local.nested.pop()
+        with self.lock:
+            self.modules.append((name, seconds - nested, seconds))
+            if self.local.nested:
+                self.local.nested[-1] += seconds
+            else:
+                self.total += seconds
+
+    def report(self, limit=20):
+        """
+        :param limit: number of slowest modules to list
+        :return: str, table of slowest imports and total time spent importing
+        """
+        lines = ["%-50s %10s %10s" % ('Module', 'Self ms', 'Cumul. ms')]
+        with self.lock:
+            for name, self_seconds, seconds in sorted(self.modules, key=lambda module: module[2],
+                                                      reverse=True)[:limit]:
+                lines.append("%-50s %10.1f %10.1f" % (name, self_seconds * 1000, seconds * 1000))
+            lines.append("%d modules imported in %.1f ms, %.1f ms since start" % (
+                len(self.modules), self.total * 1000, (time.perf_counter() - self.started) * 1000))
+
+        return "\n".join(lines)
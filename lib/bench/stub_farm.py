@@ -0,0 +1,319 @@
+import random
+import socket
+import asyncio
+import struct
+import ipaddress
+import multiprocessing
+import dns.name
+import dns.flags
+import dns.rcode
+import dns.rrset
+import dns.opcode
+import dns.message
+import dns.rdatatype
+import dns.exception
+
+
+class FarmLayout:
+    """
+    Names and addresses of a stub farm. Everything is derived from the counts,
+    the benchmark and the farm process agree on the layout without talking to each other.
+
+    Local DNS delegates zoneN.bench. to authorities nsM.bench. with glue.
+    Every authority serves every zone. Zones are spread over authorities round-robin.
+    Records are hostN.zoneM.bench., records_per_zone of them in a zone.
+    """
+    DOMAIN = 'bench.'
+    LOCAL_ADDRESS = '127.0.1.1'
+    FIRST_AUTHORITY_ADDRESS = ipaddress.IPv4Address('127.0.2.1')
+    SERIAL = 1
+
+    def __init__(self, records=1, records_per_zone=100, servers=4, authorities_per_zone=2, answer_size=1, ttl=300):
+        """
+        :param records: number of records
+        :param records_per_zone: number of records in a zone
+        :param servers: number of authority servers
+        :param authorities_per_zone: number of authorities of a zone
+        :param answer_size: number of records in an answer
+        :param ttl: TTL of all records
+        """
+        self.records = records
+        self.records_per_zone = records_per_zone
+        self.zones = max(1, (records + records_per_zone - 1) // records_per_zone)
+        self.servers = servers
+        self.authorities_per_zone = min(authorities_per_zone, servers)
+        self.answer_size = answer_size
+        self.ttl = ttl
+
+    def authority_address(self, server):
+        return str(self.FIRST_AUTHORITY_ADDRESS + server)
+
+    def authority_name(self, server):
+        return 'ns%d.%s' % (server, self.DOMAIN)
+
+    def zone_name(self, zone):
+        return 'zone%d.%s' % (zone, self.DOMAIN)
+
+    def zone_servers(self, zone):
+        return [(zone * self.authorities_per_zone + index) % self.servers
+                for index in range(self.authorities_per_zone)]
+
+    def host_name(self, record):
+        return 'host%d.%s' % (record, self.zone_name(record // self.records_per_zone))
+
+    def hosts(self):
+        return [self.host_name(record) for record in range(self.records)]
+
+    def answer_values(self, record):
+        """
+        :return: list of str, IPv4-addresses answered for a record
+        """
+        return [str(ipaddress.IPv4Address('10.0.0.0') + ((record * self.answer_size + index) % (1 << 24)))
+                for index in range(self.answer_size)]
+
+
+class StubNameserver:
+    """
+    Answers of one stub server. Authorities answer for every zone of the farm,
+    local DNS gives referrals to the zones and answers records like a resolver would.
+    """
+
+    def __init__(self, layout, local=False):
+        self.layout = layout
+        self.local = local
+        self.domain = dns.name.from_text(layout.DOMAIN)
+
+    def _soa(self, zone):
+        return dns.rrset.from_text(zone, self.layout.ttl, 'IN', 'SOA',
+                                   '%s hostmaster.%s %d 3600 600 86400 %d' % (
+                                       self.layout.authority_name(0), self.layout.DOMAIN, self.layout.SERIAL,
+                                       self.layout.ttl))
+
+    def _ns(self, zone):
+        servers = self.layout.zone_servers(zone)
+        ns_rrset = dns.rrset.from_text(self.layout.zone_name(zone), self.layout.ttl, 'IN', 'NS',
+                                       *[self.layout.authority_name(server) for server in servers])
+        glue = [dns.rrset.from_text(self.layout.authority_name(server), self.layout.ttl, 'IN', 'A',
+                                    self.layout.authority_address(server)) for server in servers]
+
+        return ns_rrset, glue
+
+    def _parse(self, name):
+        """
+        :return: tuple, zone number and record number of a name. None if not in farm.
+        """
+        labels = name.relativize(self.domain).labels
+        zone = record = None
+        try:
+            if labels and labels[-1].startswith(b'zone'):
+                zone = int(labels[-1][4:])
+            if len(labels) == 2 and labels[0].startswith(b'host'):
+                record = int(labels[0][4:])
+        except ValueError:
+            pass
+        if zone is not None and zone >= self.layout.zones:
+            zone = None
+        if record is not None and (zone is None or record >= self.layout.records or
+                                   record // self.layout.records_per_zone != zone):
+            record = None
+
+        return zone, record
+
+    def respond(self, query):
+        """
+        :param query: dns.message.Message
+        :return: dns.message.Message
+        """
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        if not question.name.is_subdomain(self.domain):
+            response.set_rcode(dns.rcode.REFUSED)
+            return response
+
+        zone, record = self._parse(question.name)
+        if question.name == self.domain:
+            # Apex of the farm, same servers serve it
+            response.flags |= dns.flags.AA
+            return response
+        if zone is None:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            return response
+
+        zone_name = self.layout.zone_name(zone)
+        if self.local and question.rdtype == dns.rdatatype.NS and record is None:
+            ns_rrset, glue = self._ns(zone)
+            response.authority.append(ns_rrset)
+            response.additional.extend(glue)
+            return response
+
+        response.flags |= dns.flags.AA
+        if record is None:
+            if question.rdtype == dns.rdatatype.SOA:
+                response.answer.append(self._soa(zone_name))
+            elif question.rdtype == dns.rdatatype.NS:
+                response.answer.append(self._ns(zone)[0])
+            else:
+                response.authority.append(self._soa(zone_name))
+        elif question.rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(question.name, self.layout.ttl, 'IN', 'A',
+                                                       *self.layout.answer_values(record)))
+        elif question.rdtype == dns.rdatatype.TXT:
+            response.answer.append(dns.rrset.from_text(question.name, self.layout.ttl, 'IN', 'TXT',
+                                                       *['"%s"' % value for value in
+                                                         self.layout.answer_values(record)]))
+        else:
+            response.authority.append(self._soa(zone_name))
+
+        return response
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, farm, nameserver):
+        self.farm = farm
+        self.nameserver = nameserver
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, wire, address):
+        try:
+            query = dns.message.from_wire(wire)
+        except dns.exception.DNSException:
+            return
+        if self.farm.drop_rate and random.random() < self.farm.drop_rate:
+            return
+        response = self.nameserver.respond(query)
+        max_size = query.payload if query.edns >= 0 else 512
+        response_wire = response.to_wire()
+        if len(response_wire) > max_size or (self.farm.truncate_rate and random.random() < self.farm.truncate_rate):
+            response.answer = []
+            response.authority = []
+            response.additional = []
+            response.flags |= dns.flags.TC
+            response_wire = response.to_wire()
+        self.farm.send_later(self.transport.sendto, response_wire, address)
+
+
+class StubFarm:
+    """
+    Local authoritative and local DNS stub servers for benchmarking, in a process of their own
+    so they don't take CPU time from what is measured.
+    Servers listen on UDP and TCP port 53 of loopback addresses 127.0.1.1 and up from 127.0.2.1,
+    this needs Linux and permission to bind port 53.
+    """
+
+    def __init__(self, layout, latency=0.0, jitter=0.0, drop_rate=0.0, truncate_rate=0.0):
+        """
+        :param layout: FarmLayout
+        :param latency: seconds, delay of every UDP and TCP response
+        :param jitter: seconds, random extra delay up to this
+        :param drop_rate: 0 - 1, share of UDP queries left unanswered
+        :param truncate_rate: 0 - 1, share of UDP responses truncated to make client retry over TCP
+        """
+        self.layout = layout
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.truncate_rate = truncate_rate
+        self.loop = None
+        self.process = None
+
+    def delay(self):
+        if self.jitter:
+            return self.latency + random.uniform(0, self.jitter)
+
+        return self.latency
+
+    def send_later(self, send, *args):
+        delay = self.delay()
+        if delay:
+            self.loop.call_later(delay, send, *args)
+        else:
+            send(*args)
+
+    async def _serve_tcp(self, nameserver, reader, writer):
+        try:
+            while True:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+                query = dns.message.from_wire(await reader.readexactly(length))
+                response_wire = nameserver.respond(query).to_wire()
+                delay = self.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(struct.pack('!H', len(response_wire)) + response_wire)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, dns.exception.DNSException):
+            pass
+        finally:
+            writer.close()
+
+    async def _start_server(self, address, nameserver):
+        await self.loop.create_datagram_endpoint(lambda: _UdpProtocol(self, nameserver), local_addr=(address, 53))
+        await asyncio.start_server(lambda reader, writer: self._serve_tcp(nameserver, reader, writer),
+                                   address, 53)
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        servers = [(self.layout.LOCAL_ADDRESS, StubNameserver(self.layout, local=True))]
+        authority = StubNameserver(self.layout)
+        servers.extend((self.layout.authority_address(server), authority) for server in range(self.layout.servers))
+        try:
+            for address, nameserver in servers:
+                self.loop.run_until_complete(self._start_server(address, nameserver))
+        except OSError as exc:
+            ready.send(str(exc))
+            return
+        ready.send(None)
+        self.loop.run_forever()
+
+    def start(self):
+        """
+        Start the farm and wait for its servers to listen.
+        """
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=self._run, args=(sender,), daemon=True)
+        self.process.start()
+        error = receiver.recv()
+        if error:
+            self.stop()
+            raise OSError("Cannot start stub servers: %s" % error)
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+
+def send_notify(zone, address, port=53, serial=None, timeout=2.0):
+    """
+    Send a DNS NOTIFY like a primary does when its zone changes, and wait for the acknowledgement.
+    :param zone: name of the zone changed
+    :param address: IP-address to notify
+    :param port: UDP-port to notify
+    :param serial: serial of the zone to announce in SOA of the answer section, None for none
+    :param timeout: seconds to wait for the acknowledgement
+    :return: dns.message.Message, the acknowledgement
+    :raises dns.exception.Timeout: if no acknowledgement arrived
+    """
+    notify = dns.message.make_query(zone, dns.rdatatype.SOA)
+    notify.set_opcode(dns.opcode.NOTIFY)
+    notify.flags |= dns.flags.AA
+    notify.flags &= ~dns.flags.RD
+    if serial is not None:
+        notify.answer.append(dns.rrset.from_text(zone, 0, 'IN', 'SOA', 'ns.%s hostmaster.%s %d 3600 600 86400 300' %
+                                                 (zone, zone, serial)))
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as notify_socket:
+        notify_socket.settimeout(timeout)
+        notify_socket.sendto(notify.to_wire(), (address, port))
+        try:
+            while True:
+                wire, _ = notify_socket.recvfrom(65535)
+                response = dns.message.from_wire(wire)
+                if response.id == notify.id:
+                    return response
+        except socket.timeout:
+            raise dns.exception.Timeout()
@@ -1 +1,55 @@
-from .dns import *
\ No newline at end of file
+import importlib
+
+# Names are imported from their modules on first use. A single-pass check loads
+# only the engine it runs, not asyncio, DNSSEC or zone transfers of dnspython.
+_MODULES = {
+    'DNSMonitorError': 'errors',
+    'ResolveError': 'errors',
+    'NoSuchRecordError': 'errors',
+    'ResolveTimeoutError': 'errors',
+    'NoAnswerError': 'errors',
+    'UnknownRRTypeError': 'errors',
+    'InvalidValueError': 'errors',
+    'AuthorityError': 'errors',
+    'NoSuchDomainError': 'errors',
+    'DNSBase': 'dns',
+    'DNS': 'dns',
+    'AsyncDNS': 'async_dns',
+    'EventLoopDNS': 'async_dns',
+    'ServerResult': 'result',
+    'Message': 'result',
+    'AnswerSet': 'answer_set',
+    'DelegationCache': 'delegation_cache',
+    'Transport': 'transport',
+    'AsyncTransport': 'async_transport',
+    'LatencyHistogram': 'stats',
+    'ServerStats': 'stats',
+    'QueryStats': 'stats',
+    'IterativeResolver': 'iterative',
+    'AsyncIterativeResolver': 'async_iterative',
+    'RateLimiter': 'rate_limit',
+    'ResolverPool': 'resolver_pool',
+    'NotifyListener': 'notify',
+    'KeyValidator': 'dnssec',
+    'split_signed': 'dnssec',
+    'ZoneTransfer': 'zone_transfer',
+    'ZoneFile': 'zone_transfer',
+    'ZoneDiff': 'zone_transfer',
+    'QueryCoalescer': 'coalesce',
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,167 @@
+import re
+import weakref
+import hashlib
+import dns.name
+import dns.rdata
+import dns.exception
+import dns.rdataclass
+import dns.rdatatype
+from .errors import InvalidValueError, UnknownRRTypeError
+
+
+class AnswerSet:
+    """
+    Canonical form of the records a server answered with.
+    Records are kept in DNSSEC canonical wire form (RFC 4034, section 6.2), sorted,
+    so order of records and case of names in them won't matter.
+    A digest is calculated once, comparing two sets is comparing their digests.
+    Text form of the records is built only when needed for reporting.
+    Sets are immutable. Equal sets are shared, a long run keeps one object per distinct answer.
+    """
+    __slots__ = ('_count', '_rdatas', '_texts', 'digest', '__weakref__')
+
+    # Digest to the shared set, sets no longer used by anyone drop out
+    _shared = weakref.WeakValueDictionary()
+    # Values separated by commas, commas within quotes are part of a value
+    _VALUE_SPLIT = re.compile(r'(?:"[^"]*"|[^,])+')
+
+    def __init__(self, rdatas=()):
+        """
+        :param rdatas: iterable of dns.rdata.Rdata
+        """
+        records = sorted((rdata.rdtype, rdata.to_digestable(), rdata) for rdata in rdatas)
+        digest = hashlib.blake2b(digest_size=16)
+        for rdtype, wire, rdata in records:
+            # Type and length prefix keep boundaries of records unambiguous
+            digest.update(rdtype.to_bytes(2, 'big'))
+            digest.update(len(wire).to_bytes(2, 'big'))
+            digest.update(wire)
+        self._count = len(records)
+        self._rdatas = tuple(rdata for rdtype, wire, rdata in records)
+        self._texts = None
+        self.digest = digest.digest()
+
+    @classmethod
+    def from_rrsets(cls, rrsets):
+        """
+        :param rrsets: list of dns.rrset.RRset, usually answer section of a response
+        :return: AnswerSet of every record in given RRsets
+        """
+        return cls(rdata for rrset in rrsets for rdata in rrset).shared()
+
+    @classmethod
+    def from_text(cls, rr_type, values):
+        """
+        :param rr_type: DNS RR-type of the values
+        :param values: str or list of str, record data in zone file format, eg. 1.2.3.4.
+                       Several records in a str are separated by commas, eg. 1.2.3.4,1.2.3.5
+                       Names are absolute, with or without the trailing dot.
+        :return: AnswerSet of given values
+        :raises InvalidValueError: if a value isn't valid data for the RR-type
+        """
+        if isinstance(values, str):
+            values = cls.split_values(values)
+        try:
+            rdtype = dns.rdatatype.from_text(rr_type)
+        except dns.rdatatype.UnknownRdatatype:
+            raise UnknownRRTypeError(rr_type)
+        rdatas = []
+        for value in values:
+            try:
+                rdatas.append(dns.rdata.from_text(dns.rdataclass.IN, rdtype, value, origin=dns.name.root,
+                                                  relativize=False))
+            except dns.exception.DNSException as exc:
+                raise InvalidValueError(rr_type, value, exc)
+
+        return cls(rdatas).shared()
+
+    @classmethod
+    def split_values(cls, text):
+        """
+        :param text: str, record data separated by commas
+        :return: list of str, record data of every record
+        """
+        return [value.strip() for value in cls._VALUE_SPLIT.findall(text) if value.strip()]
+
+    def shared(self):
+        """
+        :return: AnswerSet, the shared set equal to this one
+        """
+        return self._shared.setdefault(self.digest, self)
+
+    @property
+    def texts(self):
+        """
+        :return: tuple of str, records in text form, in canonical order
+        """
+        if self._texts is None:
+            self._texts = tuple(rdata.to_text() for rdata in self._rdatas)
+
+        return self._texts
+
+    @property
+    def rdatas(self):
+        """
+        :return: tuple of dns.rdata.Rdata, records in canonical order. Empty in a set received from another process.
+        """
+        return self._rdatas
+
+    @property
+    def soa_serial(self):
+        """
+        :return: int, serial of the SOA-record in the set. None if there is none.
+        """
+        for rdata in self._rdatas:
+            if rdata.rdtype == dns.rdatatype.SOA:
+                return rdata.serial
+
+        return None
+
+    def __eq__(self, other):
+        if not isinstance(other, AnswerSet):
+            return NotImplemented
+
+        return self.digest == other.digest
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+
+        return not result
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __len__(self):
+        return self._count
+
+    def __reduce__(self):
+        # Sent between processes as digest and text only, receiver won't need the records
+        return _restore_answer_set, (self.digest, self.texts)
+
+    def __iter__(self):
+        return iter(self.texts)
+
+    def __str__(self):
+        return ', '.join(self.texts)
+
+    def __repr__(self):
+        return "AnswerSet(%s)" % self
+
+
+def _restore_answer_set(digest, texts):
+    answer_set = AnswerSet._shared.get(digest)
+    if answer_set is not None:
+        return answer_set
+    answer_set = AnswerSet.__new__(AnswerSet)
+    answer_set._count = len(texts)
+    answer_set._rdatas = ()
+    answer_set._texts = tuple(texts)
+    answer_set.digest = digest
+
+    return answer_set.shared()
+
+
+# Servers not answering have this one
+AnswerSet.EMPTY = AnswerSet().shared()
@@ -0,0 +1,258 @@
+import time
+import asyncio
+import threading
+import dns.exception
+from .dns import DNSBase
+from .async_transport import AsyncTransport
+from .result import ServerResult
+from .async_iterative import AsyncIterativeResolver
+from .coalesce import QueryCoalescer
+
+
+class AsyncDNS(DNSBase):
+    """
+    Asyncio engine. Same operations as DNS has, as coroutines.
+    Queries of all records and servers share one event loop and a socket per address family,
+    there is no thread per query. Use from a running event loop, eg. an asyncio service.
+    """
+    DEFAULT_MAX_PARALLEL_QUERIES = 1024
+
+    def __init__(self, default_resolver=None, query_timeout=DNSBase.DEFAULT_DNS_TIMEOUT,
+                 max_parallel_queries=DEFAULT_MAX_PARALLEL_QUERIES, delegation_cache_file=None, use_tls=False,
+                 authority_addresses=DNSBase.AUTHORITY_ADDRESSES_RACE, resolver_pool=None, rate_limiter=None,
+                 query_freshness=QueryCoalescer.DEFAULT_FRESHNESS):
+        super(AsyncDNS, self).__init__(default_resolver=default_resolver, query_timeout=query_timeout,
+                                       max_parallel_queries=max_parallel_queries,
+                                       delegation_cache_file=delegation_cache_file, use_tls=use_tls,
+                                       authority_addresses=authority_addresses, resolver_pool=resolver_pool,
+                                       rate_limiter=rate_limiter, query_freshness=query_freshness)
+
+        # Sockets are kept open and reused between queries
+        self.transport = AsyncTransport(use_tls=self.use_tls, max_parallel_queries=self.max_parallel_queries)
+
+        # Walks delegations to find authorities, starting from cached zone cuts
+        self.iterative_resolver = AsyncIterativeResolver(self)
+
+    def close(self):
+        self.transport.close()
+
+    async def find_authoritative_nameservers(self, host, verbose=False):
+        zone, authorities = await self.iterative_resolver.find_zone_cut(host, verbose=verbose)
+
+        return self._set_authorities(host, authorities)
+
+    async def find_zone_authorities(self, host, verbose=False):
+        """
+        Find authorities of the zone given host belongs to.
+        :param host: hostname to find authorities for
+        :param verbose:
+        :return: dict, authority name to list of IP-addresses
+        """
+        zone, authorities = await self.iterative_resolver.find_zone_cut(host, verbose=verbose)
+
+        return self._set_zone_authorities(host, zone, authorities, verbose=verbose)
+
+    async def _query_server(self, query_request, role, server, address, timeout):
+        """
+        Query a single server, unless an identical query is in flight or was just answered.
+        :return: tuple, response or None on failure and ServerResult
+        """
+        if not self.coalescer:
+            return await self._send_query(query_request, role, server, address, timeout)
+
+        response, shared = await self.coalescer.query_async(
+            self.coalescer.key(query_request, address),
+            lambda: self._send_query(query_request, role, server, address, timeout))
+
+        return self._coalesced(response, shared, role, server)
+
+    async def _send_query(self, query_request, role, server, address, timeout):
+        """
+        Query a single server and time it.
+        :return: tuple, response or None on failure and ServerResult
+        """
+        if self.rate_limiter:
+            await self.rate_limiter.acquire_async(address, self.RATE_LIMIT_URGENCY[role])
+        result = ServerResult(role, server, address)
+        start = time.monotonic()
+        try:
+            resp = await self.transport.query(query_request, address, timeout=timeout)
+        except dns.exception.Timeout:
+            resp = None
+            result.error = ServerResult.ERROR_TIMEOUT
+        except (dns.exception.DNSException, OSError) as exc:
+            resp = None
+            result.error = str(exc)
+
+        return self._finish_query(result, resp, start)
+
+    async def _race_addresses(self, query_request, role, server, addresses, timeout):
+        """
+        Happy eyeballs. Query addresses of a server one by one, alternating IPv6 and IPv4.
+        Next address is tried after a short delay or right away if previous one fails.
+        :return: tuple, first response or None if none and ServerResult of it
+        """
+        attempts = self._address_attempts(addresses)
+        pending = set()
+        failed_result = None
+        try:
+            while attempts or pending:
+                if attempts:
+                    pending.add(asyncio.ensure_future(self._query_server(query_request, role, server,
+                                                                         attempts.pop(0), timeout)))
+                done, pending = await asyncio.wait(pending,
+                                                   timeout=self.CONNECTION_ATTEMPT_DELAY if attempts else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for query_task in done:
+                    resp, result = query_task.result()
+                    if not result.error:
+                        return resp, result
+                    failed_result = result
+        finally:
+            for query_task in pending:
+                query_task.cancel()
+
+        return None, failed_result
+
+    async def _query_authority(self, query_request, authority, addresses, timeout):
+        if len(addresses) == 1:
+            return await self._query_server(query_request, ServerResult.ROLE_AUTHORITY, authority, addresses[0],
+                                            timeout)
+
+        return await self._race_addresses(query_request, ServerResult.ROLE_AUTHORITY, authority, addresses,
+                                          timeout)
+
+    async def run_local_query(self, host_to_query, rr_type_to_query, results=None, verbose=False):
+        """
+        :param host_to_query: hostname to query DNS for
+        :param rr_type_to_query: DNS RR-type to query for
+        :param results: list, if given a ServerResult is appended
+        :param verbose:
+        :return: tuple, AnswerSet and smallest TTL
+        """
+        query_request = self._make_query(host_to_query, rr_type_to_query)
+        resp, result = await self._query_server(query_request, ServerResult.ROLE_LOCAL, self.default_ns,
+                                                self.default_ns, self.query_timeout)
+
+        return self._local_answers(resp, result, results, verbose=verbose)
+
+    async def run_query(self, host_to_query, rr_type_to_query,
+                        additional_servers, wait_seconds, authorities=None, results=None, verbose=False,
+                        want_dnssec=False):
+        """
+        :param host_to_query: hostname to query DNS for
+        :param rr_type_to_query: DNS RR-type to query for
+        :param additional_servers:
+        :param wait_seconds:
+        :param authorities: dict, authorities to query. Default is the last found ones.
+        :param results: list, if given a ServerResult per server is appended
+        :param verbose:
+        :param want_dnssec: bool, ask for RRSIGs too
+        :return: tuple, dicts of server name to AnswerSet for authorities and additional servers, and messages
+        """
+        if authorities is None:
+            authorities = self.authorities
+        additional_servers = self._additional_servers(additional_servers)
+        if results is None:
+            results = []
+        query_request = self._make_query(host_to_query, rr_type_to_query, want_dnssec=want_dnssec)
+
+        # Send all queries at once, results are collected in the same order to keep reporting stable
+        labels = []
+        queries = []
+        for label, authority, addresses in self._authority_targets(authorities):
+            if verbose:
+                print("DEBUG: Querying authority %s (%s) for %s" % (authority, ', '.join(addresses),
+                                                                    query_request.question[0]))
+            labels.append(label)
+            queries.append(self._query_authority(query_request, authority, addresses, wait_seconds))
+        for additional_server in additional_servers:
+            if verbose:
+                print("Querying additional DNS: %s" % additional_server)
+            queries.append(self._query_server(query_request, ServerResult.ROLE_ADDITIONAL,
+                                              additional_server, additional_server, wait_seconds))
+        responses = await asyncio.gather(*queries)
+
+        return self._collect_answers(list(zip(labels, responses[:len(labels)])),
+                                     list(zip(additional_servers, responses[len(labels):])),
+                                     results)
+
+    async def _query_authorities(self, query_request, authorities, wait_seconds, verbose=False):
+        """
+        :return: list of tuples, label and (response, ServerResult) of each authority
+        """
+        labels = []
+        queries = []
+        for label, authority, addresses in self._authority_targets(authorities):
+            if verbose:
+                print("DEBUG: Querying authority %s (%s) for %s" % (authority, ', '.join(addresses),
+                                                                    query_request.question[0]))
+            labels.append(label)
+            queries.append(self._query_authority(query_request, authority, addresses, wait_seconds))
+
+        return list(zip(labels, await asyncio.gather(*queries)))
+
+    async def run_queries(self, queries, wait_seconds, want_dnssec=False, verbose=False):
+        """
+        Ask several questions from authorities at once, eg. DS from parent and DNSKEY from child.
+        :param queries: list of tuples, hostname, RR-type and dict of authorities to query
+        :param wait_seconds:
+        :param want_dnssec: bool, ask for RRSIGs too
+        :param verbose:
+        :return: list of tuples, one per query: dict of authority name to AnswerSet, list of ServerResult
+                 and messages
+        """
+        responses = await asyncio.gather(*[
+            self._query_authorities(self._make_query(host, rr_type, want_dnssec=want_dnssec), authorities,
+                                    wait_seconds, verbose=verbose)
+            for host, rr_type, authorities in queries])
+
+        return [self._collect_authority_answers(authority_responses) for authority_responses in responses]
+
+
+class EventLoopDNS:
+    """
+    Blocking interface of AsyncDNS, same as DNS has, for the monitors.
+    Event loop runs in a background thread, callers only wait for their own queries to finish.
+    Everything else is read from the AsyncDNS.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param args: as for AsyncDNS
+        :param kwargs: as for AsyncDNS
+        """
+        self.engine = AsyncDNS(*args, **kwargs)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def find_authoritative_nameservers(self, host, verbose=False):
+        return self._run(self.engine.find_authoritative_nameservers(host, verbose=verbose))
+
+    def find_zone_authorities(self, host, verbose=False):
+        return self._run(self.engine.find_zone_authorities(host, verbose=verbose))
+
+    def run_local_query(self, host_to_query, rr_type_to_query, results=None, verbose=False):
+        return self._run(self.engine.run_local_query(host_to_query, rr_type_to_query, results=results,
+                                                     verbose=verbose))
+
+    def run_query(self, host_to_query, rr_type_to_query,
+                  additional_servers, wait_seconds, authorities=None, results=None, verbose=False,
+                  want_dnssec=False):
+        return self._run(self.engine.run_query(host_to_query, rr_type_to_query, additional_servers, wait_seconds,
+                                               authorities=authorities, results=results, verbose=verbose,
+                                               want_dnssec=want_dnssec))
+
+    def run_queries(self, queries, wait_seconds, want_dnssec=False, verbose=False):
+        return self._run(self.engine.run_queries(queries, wait_seconds, want_dnssec=want_dnssec, verbose=verbose))
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.engine.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
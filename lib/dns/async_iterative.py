@@ -0,0 +1,89 @@
+import asyncio
+import dns.name
+import dns.message
+import dns.rdatatype
+from .result import ServerResult
+from .iterative import IterativeResolver
+
+
+class AsyncIterativeResolver(IterativeResolver):
+    """
+    IterativeResolver for AsyncDNS. Same walk, queries are coroutines.
+    Addresses missing from glue are asked from local DNS.
+    """
+
+    async def find_zone_cut(self, host, verbose=False):
+        """
+        :param host: hostname to find zone cut for
+        :param verbose:
+        :return: tuple, zone name and dict of authority name to list of IP-addresses
+        :raises AuthorityError: if no zone cut was found below the root
+        """
+        name = dns.name.from_text(host)
+        zone, authorities, walked = self._start(name, verbose=verbose)
+        for sub in self._below(name, walked):
+            if verbose:
+                print("DEBUG: Looking up NS of %s on %s" % (sub, ', '.join(authorities.keys())))
+            response = await self._race(dns.message.make_query(sub, dns.rdatatype.NS), authorities,
+                                        verbose=verbose)
+            ns_rrset = self._delegation(zone, sub, response, verbose=verbose)
+            if not ns_rrset:
+                self._member(sub, zone, response)
+                continue
+
+            authorities, ttl = await self._authority_addresses(ns_rrset, response)
+            zone = self._delegate(sub, authorities, ttl, verbose=verbose)
+
+        return self._found(name, zone, authorities)
+
+    async def _race(self, query_request, authorities, verbose=False):
+        """
+        Query all given servers at once.
+        :return: first valid response, None if no server gave one within timeout
+        """
+        pending = {}
+        for authority, addresses in authorities.items():
+            for address in addresses:
+                query_task = asyncio.ensure_future(self.dns._query_server(query_request,
+                                                                          ServerResult.ROLE_AUTHORITY, authority,
+                                                                          address, self.dns.query_timeout))
+                pending[query_task] = authority
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for query_task in done:
+                    authority = pending.pop(query_task)
+                    response, result = query_task.result()
+                    if self._valid(authority, response, result, verbose=verbose):
+                        return response
+        finally:
+            for query_task in pending:
+                query_task.cancel()
+
+        return None
+
+    async def _authority_addresses(self, ns_rrset, response):
+        """
+        All IPv6- and IPv4-addresses of delegated nameservers.
+        Glue is used if available, the rest are resolved.
+        :return: tuple, dict of authority name to list of IP-addresses and smallest TTL involved
+        """
+        authorities, missing, ttl = self._glue_addresses(ns_rrset, response)
+        lookups = [(target, rr_type) for target in missing for rr_type in (dns.rdatatype.AAAA, dns.rdatatype.A)]
+        responses = await asyncio.gather(*[
+            self.dns._query_server(dns.message.make_query(target, rr_type), ServerResult.ROLE_LOCAL,
+                                   self.dns.default_ns, self.dns.default_ns, self.dns.query_timeout)
+            for target, rr_type in lookups])
+
+        for (target, rr_type), (lookup, result) in zip(lookups, responses):
+            if lookup is None:
+                # Skip this
+                continue
+            # Local DNS follows CNAMEs, the addresses are at the end of the chain
+            for rrset in lookup.answer:
+                if rrset.rdtype == rr_type:
+                    authorities.setdefault(target.to_text(), []).extend(rr.address for rr in rrset)
+                    ttl = min(ttl, rrset.ttl)
+
+        return authorities, ttl
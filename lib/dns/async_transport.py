@@ -0,0 +1,203 @@
+import ssl
+import copy
+import struct
+import socket
+import asyncio
+import ipaddress
+import dns.inet
+import dns.flags
+import dns.entropy
+import dns.message
+import dns.exception
+
+
+def _address_key(address):
+    # Same address may be written in many ways, eg. IPv6 with or without zeros, with zone index
+    return ipaddress.ip_address(address.split('%')[0])
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Hand out received datagrams to the queries waiting for them.
+    """
+
+    def __init__(self, pending):
+        self.pending = pending
+
+    def datagram_received(self, data, addr):
+        try:
+            response = dns.message.from_wire(data)
+        except dns.exception.DNSException:
+            # Garbage, ignore
+            return
+        waiting = self.pending.get((_address_key(addr[0]), addr[1], response.id))
+        if not waiting:
+            # Late reply to a query timed out already
+            return
+        query_request, future = waiting
+        if not future.done() and query_request.is_response(response):
+            future.set_result(response)
+
+    def error_received(self, exc):
+        # ICMP-errors can't be mapped to a query on an unconnected socket, the query will time out
+        pass
+
+
+class AsyncTransport:
+    """
+    Non-blocking counterpart of Transport for asyncio.
+    All UDP-queries share one unconnected datagram endpoint per address family, replies are
+    matched by nameserver address and query ID. Number of queries waiting at once is limited.
+    TCP- and TLS-connections are kept open and reused across passes.
+    Endpoints belong to the event loop they were opened in, they are reopened if the loop changes.
+    """
+    DNS_PORT = 53
+    DNS_OVER_TLS_PORT = 853
+    MAX_IDLE_CONNECTIONS_PER_SERVER = 4
+    RECEIVE_BUFFER = 4 * 1024 * 1024
+
+    def __init__(self, use_tls=False, max_parallel_queries=None,
+                 max_idle_connections=MAX_IDLE_CONNECTIONS_PER_SERVER):
+        """
+        :param use_tls: bool, send all queries using DNS-over-TLS
+        :param max_parallel_queries: max number of queries waiting for a response at once, None for no limit
+        :param max_idle_connections: max number of open TCP- and TLS-connections to keep per nameserver
+        """
+        self.use_tls = use_tls
+        self.max_parallel_queries = max_parallel_queries
+        self.max_idle_connections = max_idle_connections
+        self.tls_context = ssl.create_default_context() if use_tls else None
+        self.loop = None
+        self.endpoints = {}
+        self.pending = {}
+        self.idle_connections = {}
+        self.semaphore = None
+
+    async def query(self, query_request, where, timeout=None, port=None):
+        """
+        Send query and wait for its response.
+        Truncated UDP-responses are retried over TCP.
+        :param query_request: dns.message.Message
+        :param where: IP-address of nameserver
+        :param timeout: seconds to wait for the response, None is forever
+        :param port: port of nameserver, defaults to protocol default
+        :return: dns.message.Message
+        """
+        self._bind_loop()
+        try:
+            if self.semaphore:
+                async with self.semaphore:
+                    return await asyncio.wait_for(self._query(query_request, where, port), timeout)
+            return await asyncio.wait_for(self._query(query_request, where, port), timeout)
+        except asyncio.TimeoutError:
+            raise dns.exception.Timeout
+
+    def close(self):
+        for transport, protocol in self.endpoints.values():
+            transport.close()
+        self.endpoints = {}
+        for connections in self.idle_connections.values():
+            for reader, writer in connections:
+                writer.close()
+        self.idle_connections = {}
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is self.loop:
+            return
+        self.close()
+        self.pending = {}
+        self.loop = loop
+        if self.max_parallel_queries:
+            self.semaphore = asyncio.Semaphore(self.max_parallel_queries)
+
+    async def _query(self, query_request, where, port):
+        if self.use_tls:
+            return await self._query_stream(query_request, where, port or self.DNS_OVER_TLS_PORT)
+
+        response = await self._query_udp(query_request, where, port or self.DNS_PORT)
+        if response.flags & dns.flags.TC:
+            response = await self._query_stream(query_request, where, port or self.DNS_PORT)
+
+        return response
+
+    async def _endpoint(self, af):
+        endpoint = self.endpoints.get(af)
+        if endpoint:
+            return endpoint[0]
+        local_address = '::' if af == socket.AF_INET6 else '0.0.0.0'
+        endpoint = await self.loop.create_datagram_endpoint(lambda: _DatagramProtocol(self.pending),
+                                                            local_addr=(local_address, 0), family=af)
+        try:
+            # Replies to all queries arrive to this socket, make room for bursts
+            endpoint[0].get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RECEIVE_BUFFER)
+        except OSError:
+            pass
+        if af in self.endpoints:
+            # Another query opened one meanwhile
+            endpoint[0].close()
+            return self.endpoints[af][0]
+        self.endpoints[af] = endpoint
+
+        return endpoint[0]
+
+    async def _query_udp(self, query_request, where, port):
+        endpoint = await self._endpoint(dns.inet.af_for_address(where))
+        address = _address_key(where)
+        key = (address, port, query_request.id)
+        if key in self.pending:
+            # Same query is already waiting on this server, give this one an ID of its own
+            query_request = copy.copy(query_request)
+            while key in self.pending:
+                query_request.id = dns.entropy.random_16()
+                key = (address, port, query_request.id)
+        future = self.loop.create_future()
+        self.pending[key] = (query_request, future)
+        try:
+            endpoint.sendto(query_request.to_wire(), (where, port))
+            return await future
+        finally:
+            del self.pending[key]
+
+    async def _query_stream(self, query_request, where, port):
+        key = (where, port)
+        wire = query_request.to_wire()
+        message = struct.pack('!H', len(wire)) + wire
+
+        connections = self.idle_connections.get(key)
+        if connections:
+            # Server may have closed a kept connection while it was idle. Retry once with a new one.
+            try:
+                return await self._exchange_stream(key, connections.pop(), query_request, message)
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+        if self.use_tls:
+            connection = await asyncio.open_connection(where, port, ssl=self.tls_context, server_hostname=where)
+        else:
+            connection = await asyncio.open_connection(where, port)
+        try:
+            return await self._exchange_stream(key, connection, query_request, message)
+        except asyncio.IncompleteReadError:
+            raise dns.exception.DNSException("Connection closed by %s" % where)
+
+    async def _exchange_stream(self, key, connection, query_request, message):
+        reader, writer = connection
+        try:
+            writer.write(message)
+            await writer.drain()
+            while True:
+                (length,) = struct.unpack('!H', await reader.readexactly(2))
+                response = dns.message.from_wire(await reader.readexactly(length))
+                if query_request.is_response(response):
+                    break
+        except BaseException:
+            # State of the stream is unknown, don't reuse. Includes cancellation on timeout.
+            writer.close()
+            raise
+        connections = self.idle_connections.setdefault(key, [])
+        if len(connections) < self.max_idle_connections:
+            connections.append(connection)
+        else:
+            writer.close()
+
+        return response
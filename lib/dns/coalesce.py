@@ -0,0 +1,148 @@
+import time
+import threading
+from concurrent.futures import Future
+
+
+class QueryCoalescer:
+    """
+    Identical queries to same server are sent once. A query asked while the same one is in flight
+    waits for its response. With a freshness window, a query repeated within it gets the last response:
+    only successful responses are kept, and never longer than their smallest TTL.
+    Reusing responses is off by default, a monitor polling faster than the window would see stale answers.
+    Upstream load grows with distinct questions, not with the number of monitors asking them.
+    Responses are shared as is. Callers get ServerResults of their own.
+    """
+    DEFAULT_FRESHNESS = 0.0
+    MAX_FRESH = 1024
+
+    def __init__(self, freshness=DEFAULT_FRESHNESS):
+        """
+        :param freshness: seconds to keep responses for repeated queries, 0 to merge queries in flight only
+        """
+        self.freshness = freshness
+        # Query key to Future or asyncio.Task of the query in flight
+        self.in_flight = {}
+        # Query key to expiry time and (response, ServerResult)
+        self.fresh = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(query_request, address):
+        """
+        :return: tuple, what makes queries identical: server, question and flags asking for DNSSEC or recursion
+        """
+        question = query_request.question[0]
+
+        return (address, question.name.canonicalize(), question.rdtype, question.rdclass, query_request.flags,
+                query_request.ednsflags)
+
+    def _get_fresh(self, key):
+        fresh = self.fresh.get(key)
+        if fresh is None:
+            return None
+        expires, response = fresh
+        if expires < time.monotonic():
+            del self.fresh[key]
+            return None
+
+        return response
+
+    def _put_fresh(self, key, response):
+        resp, result = response
+        if not self.freshness or resp is None or result.error:
+            return
+        freshness = self.freshness
+        if result.ttl is not None:
+            freshness = min(freshness, result.ttl)
+        if not freshness:
+            return
+        now = time.monotonic()
+        if len(self.fresh) >= self.MAX_FRESH:
+            for old_key in [old_key for old_key, (expires, _) in self.fresh.items() if expires < now]:
+                del self.fresh[old_key]
+            if len(self.fresh) >= self.MAX_FRESH:
+                del self.fresh[next(iter(self.fresh))]
+        self.fresh[key] = (now + freshness, response)
+
+    def join(self, key):
+        """
+        Blocking engine: join an identical query in flight or fresh, or lead a new one.
+        Leader has to send the query and settle() it.
+        :param key: from key()
+        :return: tuple, Future of response and ServerResult and bool, True if caller leads
+        """
+        with self.lock:
+            response = self._get_fresh(key)
+            if response is not None:
+                future = Future()
+                future.set_result(response)
+                return future, False
+            future = self.in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self.in_flight[key] = future
+
+            return future, True
+
+    def settle(self, key, future, response=None, exception=None):
+        """
+        Leader: hand the outcome of its query to the others waiting for it.
+        :param response: tuple, response and ServerResult
+        :param exception: raised instead of a response
+        """
+        with self.lock:
+            del self.in_flight[key]
+            if exception is None:
+                self._put_fresh(key, response)
+        if exception is None:
+            future.set_result(response)
+        else:
+            future.set_exception(exception)
+
+    def query(self, key, send):
+        """
+        Blocking engine: send a query unless an identical one is in flight or fresh.
+        :param key: from key()
+        :param send: callable sending the query, returns tuple, response and ServerResult
+        :return: tuple, response and ServerResult and bool, True if response was shared
+        """
+        future, leading = self.join(key)
+        if not leading:
+            return future.result(), True
+
+        try:
+            response = send()
+        except BaseException as exc:
+            self.settle(key, future, exception=exc)
+            raise
+        self.settle(key, future, response)
+
+        return response, False
+
+    async def query_async(self, key, send):
+        """
+        Asyncio engine, same as query(). Use from one event loop only.
+        :param send: coroutine function sending the query
+        """
+        # Blocking engine runs without asyncio loaded
+        import asyncio
+
+        response = self._get_fresh(key)
+        if response is not None:
+            return response, True
+        task = self.in_flight.get(key)
+        if task is not None:
+            # Shielded, a caller giving up won't cancel the query of others
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(send())
+        self.in_flight[key] = task
+        task.add_done_callback(lambda done: self._done(key, done))
+
+        return await asyncio.shield(task), False
+
+    def _done(self, key, task):
+        del self.in_flight[key]
+        if not task.cancelled() and task.exception() is None:
+            self._put_fresh(key, task.result())
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import tempfile
+import threading
+
+
+class DelegationCache:
+    """
+    Authorities of zone cuts found so far.
+    Entries expire with the TTLs of the NS- and A-records they were built from.
+    Optionally the cache is kept in a file to speed up repeated runs.
+    Names found not to be zone cuts are remembered too, in memory only.
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        # False to save only when save() is called, eg. after looking up many zones at once
+        self.autosave = True
+        self.zones = {}
+        # Name to zone cut it belongs to, for names that are not zone cuts
+        self.members = {}
+        self.lock = threading.Lock()
+
+        if self.cache_file:
+            self.load()
+
+    def get(self, zone):
+        """
+        :param zone: zone cut, FQDN
+        :return: dict, authority name to list of IP-addresses. None if not cached or expired.
+        """
+        zone = self._zone_key(zone)
+        with self.lock:
+            entry = self.zones.get(zone)
+            if not entry:
+                return None
+            if entry['expires'] <= time.time():
+                del self.zones[zone]
+                return None
+
+            return entry['authorities']
+
+    def put(self, zone, authorities, ttl):
+        """
+        :param zone: zone cut, FQDN
+        :param authorities: dict, authority name to list of IP-addresses
+        :param ttl: int, seconds to keep the entry. Smallest TTL of the records involved.
+        :return:
+        """
+        zone = self._zone_key(zone)
+        with self.lock:
+            self.zones[zone] = {
+                'expires': time.time() + ttl,
+                'authorities': authorities
+            }
+
+        if self.cache_file and self.autosave:
+            self.save()
+
+    def put_member(self, name, zone, ttl):
+        """
+        :param name: FQDN, not a zone cut of its own
+        :param zone: zone cut the name belongs to
+        :param ttl: int, seconds to keep the entry. TTL of the negative answer.
+        """
+        with self.lock:
+            self.members[self._zone_key(name)] = {
+                'expires': time.time() + ttl,
+                'zone': self._zone_key(zone)
+            }
+
+    def zone_of(self, name):
+        """
+        :param name: FQDN
+        :return: str, zone cut the name was found to belong to. None if not known or expired.
+        """
+        name = self._zone_key(name)
+        with self.lock:
+            entry = self.members.get(name)
+            if not entry:
+                return None
+            if entry['expires'] <= time.time():
+                del self.members[name]
+                return None
+
+            return entry['zone']
+
+    def active_zones(self):
+        """
+        :return: dict, zone to authorities for every non-expired entry
+        """
+        now = time.time()
+        with self.lock:
+            return {zone: entry['authorities'] for zone, entry in self.zones.items() if entry['expires'] > now}
+
+    def entries(self):
+        """
+        :return: dict, zone to entry for every non-expired entry. Picklable, for merge() of another cache.
+        """
+        now = time.time()
+        with self.lock:
+            return {zone: dict(entry) for zone, entry in self.zones.items() if entry['expires'] > now}
+
+    def merge(self, entries):
+        """
+        Add entries of another cache. Entries of this one are kept if they expire later.
+        :param entries: dict, as returned by entries()
+        """
+        now = time.time()
+        with self.lock:
+            for zone, entry in entries.items():
+                current = self.zones.get(zone)
+                if entry['expires'] > now and (not current or current['expires'] < entry['expires']):
+                    self.zones[zone] = entry
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as cache:
+                zones = json.load(cache)
+        except ValueError:
+            # Broken cache is same as no cache
+            return
+
+        now = time.time()
+        for entry in zones.values():
+            # Older caches have a single address per authority
+            for authority, addresses in entry['authorities'].items():
+                if isinstance(addresses, str):
+                    entry['authorities'][authority] = [addresses]
+        with self.lock:
+            self.zones = {zone: entry for zone, entry in zones.items() if entry['expires'] > now}
+
+    def save(self):
+        # One writer at a time, through a temporary file of its own next to the cache
+        with self.lock:
+            fd, tmp_file = tempfile.mkstemp(prefix="%s." % os.path.basename(self.cache_file), suffix='.tmp',
+                                            dir=os.path.dirname(os.path.abspath(self.cache_file)))
+            try:
+                with os.fdopen(fd, 'w') as cache:
+                    json.dump(self.zones, cache, indent=2)
+                os.replace(tmp_file, self.cache_file)
+            except BaseException:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+
+    @staticmethod
+    def _zone_key(zone):
+        zone = zone.lower()
+        if not zone.endswith('.'):
+            zone += '.'
+
+        return zone
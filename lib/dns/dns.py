@@ -1,10 +1,36 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import dns.resolver  # from pip dnspython3
-
-
-class DNS:
+from .answer_set import AnswerSet
+from .errors import ResolveTimeoutError, NoSuchRecordError, NoAnswerError, UnknownRRTypeError, AuthorityError
+from .delegation_cache import DelegationCache
+from .transport import Transport
+from .result import ServerResult, Message
+from .stats import QueryStats
+from .iterative import IterativeResolver
+from .coalesce import QueryCoalescer
+from .rate_limit import RateLimiter
+
+
+class DNSBase:
+    """
+    Configuration, caches and result handling shared by the blocking and asyncio engines.
+    Engines differ only in how the queries are sent.
+    """
     DEFAULT_DNS_TIMEOUT = 5.0
+    DEFAULT_MAX_PARALLEL_QUERIES = 16
+
+    # Query every address of an authority, or race them and use the first answer
+    AUTHORITY_ADDRESSES_ALL = 'all'
+    AUTHORITY_ADDRESSES_RACE = 'race'
+    # Happy eyeballs: seconds to wait before trying next address, RFC 8305
+    CONNECTION_ATTEMPT_DELAY = 0.25
 
-    def __init__(self, default_resolver=None, query_timeout=DEFAULT_DNS_TIMEOUT):
+    def __init__(self, default_resolver=None, query_timeout=DEFAULT_DNS_TIMEOUT,
+                 max_parallel_queries=DEFAULT_MAX_PARALLEL_QUERIES, delegation_cache_file=None, use_tls=False,
+                 authority_addresses=AUTHORITY_ADDRESSES_RACE, resolver_pool=None, rate_limiter=None,
+                 query_freshness=QueryCoalescer.DEFAULT_FRESHNESS):
 
         # See what we want to use as default resolver
         if default_resolver:
@@ -18,193 +44,482 @@ class DNS:
         self.default_resolver.lifetime = query_timeout
         self.default_ns = self.default_resolver.nameservers[0]
         self.authorities = {}
+        # Zones looked up during this run
+        self.zone_authorities = {}
+        self.delegation_cache = DelegationCache(cache_file=delegation_cache_file)
+        self.max_parallel_queries = max_parallel_queries
+        self.use_tls = use_tls
+        self.authority_addresses = authority_addresses
+        # Resolvers swept as additional servers on every query
+        self.resolver_pool = resolver_pool
+        # Delays queries to keep rates of queries in limits
+        self.rate_limiter = rate_limiter
+        # Identical queries are sent once. None to send every query.
+        self.coalescer = QueryCoalescer(freshness=query_freshness) if query_freshness is not None else None
+
+        # Latencies, timeouts and errors per server
+        self.stats = QueryStats()
 
     def query(self, host, rr_type):
+        """
+        Resolve a record using local DNS.
+        :return: dns.resolver.Answer
+        :raises ResolveError: if local DNS couldn't resolve it
+        """
         try:
             answers = self.default_resolver.query(host, rr_type)
         except dns.resolver.NXDOMAIN:
-            print(
-                "Couldn't resolve %s-record for %s using %s. No such thing found!" % (rr_type, host, self.default_ns))
-            exit(2)
+            raise NoSuchRecordError(host, rr_type, self.default_ns)
         except dns.exception.Timeout:
-            print("Couldn't resolve %s-record for %s using %s. Timed out!" % (rr_type, host, self.default_ns))
-            exit(2)
+            raise ResolveTimeoutError(host, rr_type, self.default_ns)
         except dns.resolver.NoAnswer:
-            print("Couldn't resolve %s-record for %s using %s. No answer!" % (rr_type, host, self.default_ns))
-            exit(2)
+            raise NoAnswerError(host, rr_type, self.default_ns)
+        except dns.rdatatype.UnknownRdatatype:
+            raise UnknownRRTypeError(rr_type)
 
         return answers
 
-    def find_authoritative_nameservers(self, host, verbose=False):
-        self.authorities = {}
-        dns_query = dns.message.make_query(host, dns.rdatatype.A)
-        resp = dns.query.udp(dns_query, self.default_ns, timeout=self.query_timeout)
-        if resp.authority:
-            auths = resp.authority[0]
-        else:
-            resp = self._get_authoritative_nameserver(dns_query, self.default_resolver, verbose=verbose)
-            auths = resp.items
-        if auths:
-            for authority_rr in auths:
-                if authority_rr.rdtype == dns.rdatatype.SOA:
-                    authority = str(authority_rr.mname)
-                elif authority_rr.rdtype == dns.rdatatype.NS:
-                    authority = str(authority_rr.target)
-                else:
-                    raise Exception('Authority record type %s not implemented!' % authority_rr.__class__.__name__)
-
-                try:
-                    answers = self.default_resolver.query(authority, 'A')
-                except dns.resolver.NXDOMAIN:
-                    # Skip this
-                    continue
-
-                if answers:
-                    self.authorities[authority] = answers[0].address
-        if len(self.authorities) == 0:
-            print("Couldn't find any authorities for %s" % host)
-            exit(2)
+    @property
+    def timeouts(self):
+        """
+        :return: int, number of queries timed out so far
+        """
+        return self.stats.timeouts
+
+    def _make_query(self, host_to_query, rr_type_to_query, want_dnssec=False):
+        # Dynamically whip up a class from given string
+        try:
+            rr_type = dns.rdatatype.from_text(rr_type_to_query)
+        except dns.rdatatype.UnknownRdatatype:
+            rr_type = None
+        if not rr_type:
+            raise UnknownRRTypeError(rr_type_to_query)
+        query_request = dns.message.make_query(host_to_query, rr_type, want_dnssec=want_dnssec)
+
+        return query_request
+
+    def _set_authorities(self, host, authorities):
+        if len(authorities) == 0:
+            raise AuthorityError(host)
+        self.authorities = authorities
 
         return self.authorities
 
-    def _get_authoritative_nameserver(self, query_rr_in, resolver, verbose=False):
-        depth = len(query_rr_in.question[0].name)
-        nameserver = resolver.nameservers[0]
-        # dns_query = dns.message.make_query(args.host, dns.rdatatype.A)
-        query_rr = query_rr_in
+    def _set_zone_authorities(self, host, zone, authorities, verbose=False):
+        if verbose:
+            print("DEBUG: %s belongs to zone %s" % (host, zone))
+        self.zone_authorities[zone] = authorities
+        self.authorities = authorities
 
-        last = False
-        while not last:
-            query = query_rr.question[0].name
-            s = query.split(depth)
+        return self.authorities
 
-            last = s[0].to_unicode() == u'@'
-            sub = s[1]
+    def zone_of(self, host):
+        """
+        :param host: hostname
+        :return: str, closest zone looked up during this run the host belongs to. None if none.
+        """
+        name = dns.name.from_text(host)
+        zones = [zone for zone in self.zone_authorities if name.is_subdomain(dns.name.from_text(zone))]
+        if not zones:
+            return None
 
-            if verbose:
-                print('get_authoritative_nameserver() Looking up %s on %s' % (sub, nameserver))
-            query_rr = dns.message.make_query(sub, dns.rdatatype.NS)
-            response = dns.query.udp(query_rr, nameserver)
-
-            rcode = response.rcode()
-            if rcode != dns.rcode.NOERROR:
-                if rcode == dns.rcode.NXDOMAIN:
-                    raise Exception('%s does not exist.' % sub)
-                else:
-                    raise Exception('Error %s' % dns.rcode.to_text(rcode))
-
-            rrset = None
-            if len(response.authority) > 0:
-                rrset = response.authority[0]
-            else:
-                rrset = response.answer[0]
+        return max(zones, key=lambda zone: len(dns.name.from_text(zone)))
 
-            rr = rrset[0]
-            if rr.rdtype == dns.rdatatype.SOA:
-                if verbose:
-                    print('get_authoritative_nameserver() Same server is authoritative for %s' % sub)
-            else:
-                authority = rr.target
-                if verbose:
-                    print('get_authoritative_nameserver() %s is authoritative for %s' % (authority, sub))
-                nameserver = resolver.query(authority).rrset[0].to_text()
+    def _finish_query(self, result, resp, start):
+        """
+        Record statistics of a query and fill its ServerResult from the response.
+        :return: tuple, response or None on failure and ServerResult
+        """
+        result.latency = time.monotonic() - start
+        self.stats.record(result)
+        if self.resolver_pool:
+            self.resolver_pool.record(result)
+        if resp is None:
+            return None, result
+
+        result.rcode = dns.rcode.to_text(resp.rcode())
+        for rr in resp.answer:
+            if result.ttl is None or rr.ttl < result.ttl:
+                result.ttl = rr.ttl
 
-            depth += 1
+        return resp, result
 
-        return rrset
+    def _coalesced(self, response, shared, role, server):
+        """
+        :param response: tuple, response and ServerResult from QueryCoalescer
+        :param shared: bool, response was of an identical query
+        :return: tuple, response and ServerResult of the caller
+        """
+        resp, result = response
+        if shared:
+            self.stats.record_shared(result)
 
-    def _make_query(self, host_to_query, rr_type_to_query):
-        # Dynamically whip up a class from given string
-        rr_type = dns.rdatatype.from_text(rr_type_to_query)
-        if not rr_type:
-            raise Exception("Cannot query for unknown RR-type '%s'" % rr_type_to_query)
-        query_request = dns.message.make_query(host_to_query, rr_type)
+        return resp, result.copy(role, server)
 
-        return query_request
+    # When the rate limit is tight, local answers go first and additional DNS last
+    RATE_LIMIT_URGENCY = {
+        ServerResult.ROLE_LOCAL: RateLimiter.URGENT,
+        ServerResult.ROLE_AUTHORITY: RateLimiter.NORMAL,
+        ServerResult.ROLE_ADDITIONAL: RateLimiter.BULK,
+    }
 
-    def run_local_query(self, host_to_query, rr_type_to_query, verbose=False):
-        query_request = self._make_query(host_to_query, rr_type_to_query)
-        replies = []
-        local_answers = []
-        local_ttl = None
+    @staticmethod
+    def _address_attempts(addresses):
+        """
+        :return: list, addresses in order to try, alternating IPv6 and IPv4
+        """
+        ipv6 = [address for address in addresses if ':' in address]
+        ipv4 = [address for address in addresses if ':' not in address]
+        attempts = []
+        while ipv6 or ipv4:
+            if ipv6:
+                attempts.append(ipv6.pop(0))
+            if ipv4:
+                attempts.append(ipv4.pop(0))
+
+        return attempts
+
+    def _authority_targets(self, authorities):
+        """
+        :return: list of tuples, label to report, authority name and its addresses to query
+        """
+        targets = []
+        for authority, authority_addresses in authorities.items():
+            if isinstance(authority_addresses, str):
+                authority_addresses = [authority_addresses]
+            if self.authority_addresses == self.AUTHORITY_ADDRESSES_ALL and len(authority_addresses) > 1:
+                # Each address is a server of its own
+                targets.extend((sys.intern("%s (%s)" % (authority, address)), authority, [address])
+                               for address in authority_addresses)
+            else:
+                targets.append((authority, authority, authority_addresses))
 
-        try:
-            resp = dns.query.udp(query_request, self.default_ns)
-        except dns.exception.Timeout:
-            replies.append("Timed out on local server: %s" % self.default_ns)
-            return False, None, replies
+        return targets
+
+    def _local_answers(self, resp, result, results, verbose=False):
+        """
+        :return: tuple, AnswerSet and smallest TTL. Empty AnswerSet and None if query failed,
+                 its ServerResult tells why.
+        """
+        if results is not None:
+            results.append(result)
+        if result.error:
+            if verbose:
+                print("DEBUG: Local server %s failed: %s" % (self.default_ns, result.error))
+            return result.answers, None
+        local_ttl = None
         for rr in resp.answer:
             if not local_ttl or rr.ttl < local_ttl:
                 local_ttl = rr.ttl
-            answer_str = str(rr.items[0])
-            local_answers.append(answer_str)
-        sorted(local_answers)
+        local_answers = AnswerSet.from_rrsets(resp.answer)
+        result.answers = local_answers
         if verbose:
             print("DEBUG: Local answers: %s" % local_answers)
 
         return local_answers, local_ttl
 
-    def run_query(self, host_to_query, rr_type_to_query,
-                  additional_servers, wait_seconds, verbose=False):
+    def _collect_answers(self, authority_responses, additional_responses, results):
         """
-        :param host_to_query: hostname to query DNS for
-        :param rr_type_to_query: DNS RR-type to query for
-        :param additional_servers:
-        :param wait_seconds:
-        :param expected:
-        :param verbose:
-        :return: bool, True if all servers match local or expected
+        :param authority_responses: list of tuples, label and (response, ServerResult) of each authority
+        :param additional_responses: list of tuples, server and (response, ServerResult) of each additional server
+        :param results: list, a ServerResult per server is appended
+        :return: tuple, dicts of server name to AnswerSet for authorities and additional servers, and messages
         """
-        if additional_servers:
-            if not isinstance(additional_servers, list):
-                additional_servers = [additional_servers]
-        else:
-            additional_servers = []
-
         authority_answers = {}
         additional_answers = {}
         replies = []
-        query_request = self._make_query(host_to_query, rr_type_to_query)
 
         # Do authorities, if any
-        for authority in self.authorities:
-            authority_ip = self.authorities[authority]
-            if verbose:
-                print("DEBUG: Querying authority %s (%s) for %s" % (authority, authority_ip, query_request.question[0]))
-            try:
-                resp = dns.query.udp(query_request, authority_ip, timeout=wait_seconds)
-            except dns.exception.Timeout:
-                replies.append("Timed out on authority %s query" % authority)
+        for authority, (resp, result) in authority_responses:
+            result.label = authority
+            results.append(result)
+            if result.timed_out:
+                replies.append(Message("Timed out on authority %s query", authority))
                 continue
-            for answer in resp.answer:
-                for rr in resp.answer:
-                    if authority not in authority_answers:
-                        authority_answers[authority] = []
-                    answer_str = str(rr.items[0])
-                    authority_answers[authority].append(answer_str)
-
-                if authority in authority_answers:
-                    sorted(authority_answers[authority])
+            elif result.error:
+                replies.append(Message("Failed on authority %s query: %s", authority, result.error))
+                continue
+            if resp.answer:
+                authority_answers[authority] = AnswerSet.from_rrsets(resp.answer)
+                result.answers = authority_answers[authority]
 
         # Do additional servers, if any
+        for additional_server, (resp, result) in additional_responses:
+            results.append(result)
+            if result.timed_out:
+                replies.append(Message("Timed out on additional DNS %s query", additional_server))
+                if self.resolver_pool and self.resolver_pool.just_dropped(additional_server):
+                    replies.append(Message("Dropped additional DNS %s after %d timeouts in a row",
+                                           additional_server, self.resolver_pool.max_timeouts))
+                continue
+            elif result.error:
+                replies.append(Message("Failed on additional DNS %s query: %s", additional_server, result.error))
+                continue
+            if resp.answer:
+                additional_answers[additional_server] = AnswerSet.from_rrsets(resp.answer)
+                result.answers = additional_answers[additional_server]
+
+        if additional_responses and not additional_answers:
+            replies.append(Message("No additional DNS answers received!"))
+
+        return authority_answers, additional_answers, replies
+
+    def _collect_authority_answers(self, authority_responses):
+        """
+        :param authority_responses: list of tuples, label and (response, ServerResult) of each authority
+        :return: tuple, dict of authority name to AnswerSet, list of ServerResult and messages
+        """
+        results = []
+        authority_answers, _, replies = self._collect_answers(authority_responses, [], results)
+
+        return authority_answers, results, replies
+
+    def _additional_servers(self, additional_servers):
+        if not additional_servers:
+            additional_servers = []
+        elif not isinstance(additional_servers, list):
+            additional_servers = [additional_servers]
+        if self.resolver_pool:
+            additional_servers = additional_servers + self.resolver_pool.active()
+
+        return additional_servers
+
+
+class DNS(DNSBase):
+    """
+    Blocking engine. Queries are fanned out to a thread pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(DNS, self).__init__(*args, **kwargs)
+
+        # Sockets are kept open and reused between queries
+        self.transport = Transport(use_tls=self.use_tls)
+
+        # Bounded pool for fanning out queries to multiple servers at once.
+        # A pass will take roughly as long as the slowest single reply.
+        self.executor = ThreadPoolExecutor(max_workers=self.max_parallel_queries)
+        # Address attempts of racing queries. Separate pool, queries in above pool wait for these.
+        self.race_executor = ThreadPoolExecutor(max_workers=self.max_parallel_queries)
+
+        # Walks delegations to find authorities, starting from cached zone cuts
+        self.iterative_resolver = IterativeResolver(self)
+
+    def find_authoritative_nameservers(self, host, verbose=False):
+        zone, authorities = self.iterative_resolver.find_zone_cut(host, verbose=verbose)
+
+        return self._set_authorities(host, authorities)
+
+    def find_zone_authorities(self, host, verbose=False):
+        """
+        Find authorities of the zone given host belongs to.
+        Zone cuts are cached until the TTLs of NS- and A-records expire.
+        Monitoring multiple records of same zone will do the discovery only once.
+        :param host: hostname to find authorities for
+        :param verbose:
+        :return: dict, authority name to list of IP-addresses
+        """
+        zone, authorities = self.iterative_resolver.find_zone_cut(host, verbose=verbose)
+
+        return self._set_zone_authorities(host, zone, authorities, verbose=verbose)
+
+    def _acquire(self, role, address):
+        if self.rate_limiter:
+            self.rate_limiter.acquire(address, self.RATE_LIMIT_URGENCY[role])
+
+    def _submit_query(self, executor, query_request, role, server, address, timeout):
+        """
+        Submit a query to a pool, unless an identical query is in flight or was just answered.
+        Only queries to send take rate limit, before the FIFO queue of the pool:
+        they wait in the rate limiter in order of urgency, not in the pool behind less urgent ones.
+        :return: Future of tuple, response or None on failure and ServerResult
+        """
+        if not self.coalescer:
+            self._acquire(role, address)
+            return executor.submit(self._send_query, query_request, role, server, address, timeout, acquired=True)
+
+        key = self.coalescer.key(query_request, address)
+        shared, leading = self.coalescer.join(key)
+        if leading:
+            try:
+                self._acquire(role, address)
+                sending = executor.submit(self._send_query, query_request, role, server, address, timeout,
+                                          acquired=True)
+            except BaseException as exc:
+                self.coalescer.settle(key, shared, exception=exc)
+                raise
+            sending.add_done_callback(lambda done: self._settle(key, shared, done))
+        query_future = Future()
+        shared.add_done_callback(lambda done: self._follow(done, query_future, not leading, role, server))
+
+        return query_future
+
+    def _settle(self, key, shared, sending):
+        if sending.exception() is not None:
+            self.coalescer.settle(key, shared, exception=sending.exception())
+        else:
+            self.coalescer.settle(key, shared, sending.result())
+
+    def _follow(self, shared, query_future, is_shared, role, server):
+        """
+        Complete the Future of a caller from the query it was coalesced into.
+        """
+        if shared.exception() is not None:
+            query_future.set_exception(shared.exception())
+        else:
+            query_future.set_result(self._coalesced(shared.result(), is_shared, role, server))
+
+    def _query_server(self, query_request, role, server, address, timeout):
+        """
+        Query a single server, unless an identical query is in flight or was just answered.
+        :return: tuple, response or None on failure and ServerResult
+        """
+        if not self.coalescer:
+            return self._send_query(query_request, role, server, address, timeout)
+
+        response, shared = self.coalescer.query(self.coalescer.key(query_request, address),
+                                                lambda: self._send_query(query_request, role, server, address,
+                                                                         timeout))
+
+        return self._coalesced(response, shared, role, server)
+
+    def _send_query(self, query_request, role, server, address, timeout, acquired=False):
+        """
+        Query a single server and time it.
+        :param acquired: bool, rate limit was already taken for this query
+        :return: tuple, response or None on failure and ServerResult
+        """
+        if not acquired:
+            self._acquire(role, address)
+        result = ServerResult(role, server, address)
+        start = time.monotonic()
+        try:
+            resp = self.transport.query(query_request, address, timeout=timeout)
+        except dns.exception.Timeout:
+            resp = None
+            result.error = ServerResult.ERROR_TIMEOUT
+        except (dns.exception.DNSException, OSError) as exc:
+            resp = None
+            result.error = str(exc)
+
+        return self._finish_query(result, resp, start)
+
+    def _race_addresses(self, query_request, role, server, addresses, timeout):
+        """
+        Happy eyeballs. Query addresses of a server one by one, alternating IPv6 and IPv4.
+        Next address is tried after a short delay or right away if previous one fails.
+        :return: tuple, first response or None if none and ServerResult of it
+        """
+        attempts = self._address_attempts(addresses)
+        pending = set()
+        failed_result = None
+        while attempts or pending:
+            if attempts:
+                pending.add(self._submit_query(self.race_executor, query_request, role, server, attempts.pop(0),
+                                               timeout))
+            done, pending = wait(pending, timeout=self.CONNECTION_ATTEMPT_DELAY if attempts else None,
+                                 return_when=FIRST_COMPLETED)
+            for query_future in done:
+                resp, result = query_future.result()
+                if not result.error:
+                    # Slower attempts will finish on their own
+                    return resp, result
+                failed_result = result
+
+        return None, failed_result
+
+    def _submit_authority_query(self, query_request, authority, addresses, timeout):
+        """
+        :return: Future of tuple, response or None on failure and ServerResult
+        """
+        if len(addresses) == 1:
+            return self._submit_query(self.executor, query_request, ServerResult.ROLE_AUTHORITY, authority,
+                                      addresses[0], timeout)
+
+        return self.executor.submit(self._race_addresses, query_request, ServerResult.ROLE_AUTHORITY, authority,
+                                    addresses, timeout)
+
+    def run_local_query(self, host_to_query, rr_type_to_query, results=None, verbose=False):
+        """
+        :param host_to_query: hostname to query DNS for
+        :param rr_type_to_query: DNS RR-type to query for
+        :param results: list, if given a ServerResult is appended
+        :param verbose:
+        :return: tuple, AnswerSet and smallest TTL
+        """
+        query_request = self._make_query(host_to_query, rr_type_to_query)
+        resp, result = self._query_server(query_request, ServerResult.ROLE_LOCAL, self.default_ns, self.default_ns,
+                                          self.query_timeout)
+
+        return self._local_answers(resp, result, results, verbose=verbose)
+
+    def _submit_authority_queries(self, query_request, authorities, wait_seconds, verbose=False):
+        """
+        :return: list of tuples, label and future of each authority query
+        """
+        authority_queries = []
+        for label, authority, addresses in self._authority_targets(authorities):
+            if verbose:
+                print("DEBUG: Querying authority %s (%s) for %s" % (authority, ', '.join(addresses),
+                                                                    query_request.question[0]))
+            authority_queries.append((label, self._submit_authority_query(query_request, authority, addresses,
+                                                                          wait_seconds)))
+
+        return authority_queries
+
+    def run_query(self, host_to_query, rr_type_to_query,
+                  additional_servers, wait_seconds, authorities=None, results=None, verbose=False,
+                  want_dnssec=False):
+        """
+        :param host_to_query: hostname to query DNS for
+        :param rr_type_to_query: DNS RR-type to query for
+        :param additional_servers:
+        :param wait_seconds:
+        :param authorities: dict, authorities to query. Default is the last found ones.
+        :param results: list, if given a ServerResult per server is appended
+        :param verbose:
+        :param want_dnssec: bool, ask for RRSIGs too
+        :return: tuple, dicts of server name to AnswerSet for authorities and additional servers, and messages
+        """
+        if authorities is None:
+            authorities = self.authorities
+        additional_servers = self._additional_servers(additional_servers)
+        if results is None:
+            results = []
+        query_request = self._make_query(host_to_query, rr_type_to_query, want_dnssec=want_dnssec)
+
+        # Send all queries at once, authorities first, then additional servers.
+        # Results are collected in the same order to keep reporting stable.
+        authority_queries = self._submit_authority_queries(query_request, authorities, wait_seconds,
+                                                           verbose=verbose)
+        additional_queries = []
         for additional_server in additional_servers:
             if verbose:
                 print("Querying additional DNS: %s" % additional_server)
-            try:
-                resp = dns.query.udp(query_request, additional_server, timeout=wait_seconds)
-            except dns.exception.Timeout:
-                replies.append("Timed out on additional DNS %s query" % additional_server)
-                continue
-            for answer in resp.answer:
-                for rr in resp.answer:
-                    if additional_server not in additional_answers:
-                        additional_answers[additional_server] = []
-                    additional_answers[additional_server].append(rr.items[0].address)
+            additional_queries.append((additional_server, self._submit_query(self.executor, query_request,
+                                                                             ServerResult.ROLE_ADDITIONAL,
+                                                                             additional_server, additional_server,
+                                                                             wait_seconds)))
 
-                if additional_server in additional_answers:
-                    sorted(additional_answers[additional_server])
+        return self._collect_answers([(label, query_future.result()) for label, query_future in authority_queries],
+                                     [(server, query_future.result()) for server, query_future in additional_queries],
+                                     results)
 
-        if additional_servers and not additional_answers:
-            replies.append("No additional DNS answers received!")
-
-        return authority_answers, additional_answers, replies
+    def run_queries(self, queries, wait_seconds, want_dnssec=False, verbose=False):
+        """
+        Ask several questions from authorities at once, eg. DS from parent and DNSKEY from child.
+        :param queries: list of tuples, hostname, RR-type and dict of authorities to query
+        :param wait_seconds:
+        :param want_dnssec: bool, ask for RRSIGs too
+        :param verbose:
+        :return: list of tuples, one per query: dict of authority name to AnswerSet, list of ServerResult
+                 and messages
+        """
+        # Every question is sent before waiting for any answer
+        submitted = [self._submit_authority_queries(self._make_query(host, rr_type, want_dnssec=want_dnssec),
+                                                    authorities, wait_seconds, verbose=verbose)
+                     for host, rr_type, authorities in queries]
+
+        return [self._collect_authority_answers([(label, query_future.result())
+                                                 for label, query_future in authority_queries])
+                for authority_queries in submitted]
@@ -0,0 +1,170 @@
+import time
+import dns.name
+import dns.rrset
+import dns.dnssec
+import dns.rdatatype
+
+
+class KeyValidator:
+    """
+    DNSSEC checks of the keys of a zone: DS-records at parent matching DNSKEYs at child,
+    and RRSIGs made by the keys.
+    Verifying a signature is the expensive part. Outcomes are cached per zone and key tag,
+    keyed by the signed records and the signature. Later passes seeing same keys and signatures
+    do no crypto, they only compare validity windows to current time.
+    Verifying needs a crypto library dnspython can use, cryptography or for dnspython 1.x pycryptodome.
+    Without one, no signature is valid: each is reported as not verified.
+    """
+    # Signatures remembered per key, old ones drop out as the zone is re-signed
+    MAX_SIGNATURES_PER_KEY = 8
+    MAX_DS_MATCHES = 1000
+    # DS digest types make_ds() knows
+    DIGEST_TYPES = {1: 'SHA1', 2: 'SHA256', 4: 'SHA384'}
+
+    NO_CRYPTO = "no crypto library to verify signatures with, install python cryptography"
+
+    def __init__(self):
+        # (zone, key tag) to dict of (records, signature) to error or None if valid
+        self.signatures = {}
+        # (zone, DS, DNSKEY) to bool
+        self.ds_matches = {}
+        self.crypto_available = True
+        # Number of signatures verified, cache hits don't count
+        self.verifications = 0
+
+    @staticmethod
+    def key_tag(dnskey):
+        return dns.dnssec.key_id(dnskey)
+
+    @staticmethod
+    def is_ksk(dnskey):
+        """
+        :return: bool, key has SEP-flag, ie. is meant to be pointed to by DS at parent
+        """
+        return bool(dnskey.flags & 0x0001)
+
+    def ds_match(self, zone, ds, dnskey):
+        """
+        :param zone: str, zone of the key
+        :param ds: DS rdata from parent
+        :param dnskey: DNSKEY rdata from child
+        :return: bool, DS is digest of the key
+        """
+        if ds.key_tag != self.key_tag(dnskey) or ds.algorithm != dnskey.algorithm:
+            return False
+        cache_key = (zone, ds.to_digestable(), dnskey.to_digestable())
+        match = self.ds_matches.get(cache_key)
+        if match is None:
+            digest_type = self.DIGEST_TYPES.get(ds.digest_type)
+            match = False
+            if digest_type:
+                try:
+                    match = dns.dnssec.make_ds(zone, dnskey, digest_type).digest == ds.digest
+                except dns.dnssec.UnsupportedAlgorithm:
+                    pass
+            if len(self.ds_matches) >= self.MAX_DS_MATCHES:
+                self.ds_matches.clear()
+            self.ds_matches[cache_key] = match
+
+        return match
+
+    def verify(self, zone, rdatas, rrsig, dnskeys):
+        """
+        Verify a signature, cryptographically only if this exact signature wasn't seen before.
+        Validity window is not checked here, see window_error().
+        :param zone: str, zone of the records and keys
+        :param rdatas: list of rdata signed, all of type the RRSIG covers
+        :param rrsig: RRSIG rdata
+        :param dnskeys: list of DNSKEY rdata of the zone
+        :return: str, why the signature is not valid or couldn't be verified. None if it is valid.
+        """
+        signed = tuple(sorted(rdata.to_digestable() for rdata in rdatas))
+        cache_key = (signed, rrsig.to_digestable())
+        key_signatures = self.signatures.setdefault((zone, rrsig.key_tag), {})
+        if cache_key in key_signatures:
+            return key_signatures[cache_key]
+
+        keys = [dnskey for dnskey in dnskeys
+                if self.key_tag(dnskey) == rrsig.key_tag and dnskey.algorithm == rrsig.algorithm]
+        if not keys:
+            # Not cached, key may appear later
+            return "no DNSKEY with key tag %d" % rrsig.key_tag
+        if not self.crypto_available:
+            return self._unverified(rrsig)
+        error = None
+        name = dns.name.from_text(zone)
+        try:
+            # Validity window is checked separately, pretend it is the moment of signing
+            dns.dnssec.validate_rrsig(dns.rrset.from_rdata_list(name, rrsig.original_ttl, rdatas), rrsig,
+                                      {name: dns.rrset.from_rdata_list(name, rrsig.original_ttl, keys)},
+                                      now=rrsig.inception)
+            self.verifications += 1
+        except dns.dnssec.ValidationFailure as exc:
+            self.verifications += 1
+            error = "signature by key %d does not verify: %s" % (rrsig.key_tag, exc)
+        except (ImportError, NotImplementedError):
+            self.crypto_available = False
+            return self._unverified(rrsig)
+
+        if len(key_signatures) >= self.MAX_SIGNATURES_PER_KEY:
+            del key_signatures[next(iter(key_signatures))]
+        key_signatures[cache_key] = error
+
+        return error
+
+    @staticmethod
+    def _unverified(rrsig):
+        return "signature by key %d not verified: no crypto library" % rrsig.key_tag
+
+    @staticmethod
+    def window_error(rrsig, now, margin=0):
+        """
+        :param rrsig: RRSIG rdata
+        :param now: float, seconds since epoch
+        :param margin: seconds, signature expiring sooner than this is an error too
+        :return: str, why signature is not valid at given time. None if it is.
+        """
+        if rrsig.inception > now:
+            return "signature by key %d not valid until %s" % (rrsig.key_tag, _timestamp(rrsig.inception))
+        if rrsig.expiration < now:
+            return "signature by key %d expired at %s" % (rrsig.key_tag, _timestamp(rrsig.expiration))
+        if rrsig.expiration < now + margin:
+            return "signature by key %d expires in %.1f hours" % (rrsig.key_tag, (rrsig.expiration - now) / 3600.0)
+
+        return None
+
+    def signed_by(self, zone, rdatas, rrsigs, dnskeys, now, margin=0):
+        """
+        :param rdatas: list of rdata signed
+        :param rrsigs: list of RRSIG rdata covering them
+        :param dnskeys: list of DNSKEY rdata of the zone
+        :return: tuple, set of key tags with a valid signature and list of errors of other signatures
+        """
+        key_tags = set()
+        errors = []
+        for rrsig in rrsigs:
+            error = self.verify(zone, rdatas, rrsig, dnskeys) or self.window_error(rrsig, now, margin=margin)
+            if error:
+                errors.append(error)
+            else:
+                key_tags.add(rrsig.key_tag)
+
+        return key_tags, errors
+
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(seconds))
+
+
+def split_signed(answer_set, rr_type):
+    """
+    :param answer_set: AnswerSet of a response asked with DNSSEC
+    :param rr_type: DNS RR-type to pick
+    :return: tuple, list of rdata of given type and list of RRSIG rdata covering it
+    """
+    rdtype = dns.rdatatype.from_text(rr_type)
+    rdatas = [rdata for rdata in answer_set.rdatas if rdata.rdtype == rdtype]
+    rrsigs = [rdata for rdata in answer_set.rdatas
+              if rdata.rdtype == dns.rdatatype.RRSIG and rdata.type_covered == rdtype]
+
+    return rdatas, rrsigs
@@ -0,0 +1,61 @@
+class DNSMonitorError(Exception):
+    """
+    Base of errors raised by DNS and monitors. Embedding code can catch this one.
+    """
+
+
+class ResolveError(DNSMonitorError):
+    """
+    Local DNS couldn't resolve a record.
+    """
+    REASON = "Failed!"
+
+    def __init__(self, host, rr_type, server):
+        super(ResolveError, self).__init__("Couldn't resolve %s-record for %s using %s. %s" %
+                                           (rr_type, host, server, self.REASON))
+        self.host = host
+        self.rr_type = rr_type
+        self.server = server
+
+
+class NoSuchRecordError(ResolveError):
+    REASON = "No such thing found!"
+
+
+class ResolveTimeoutError(ResolveError):
+    REASON = "Timed out!"
+
+
+class NoAnswerError(ResolveError):
+    REASON = "No answer!"
+
+
+class UnknownRRTypeError(DNSMonitorError, ValueError):
+
+    def __init__(self, rr_type):
+        super(UnknownRRTypeError, self).__init__("Cannot query for unknown RR-type '%s'" % rr_type)
+        self.rr_type = rr_type
+
+
+class InvalidValueError(DNSMonitorError, ValueError):
+
+    def __init__(self, rr_type, value, reason):
+        super(InvalidValueError, self).__init__("'%s' is not a valid %s-record: %s" % (value, rr_type, reason))
+        self.rr_type = rr_type
+        self.value = value
+
+
+class AuthorityError(DNSMonitorError):
+    """
+    Authorities of a name couldn't be found.
+    """
+
+    def __init__(self, host, message=None):
+        super(AuthorityError, self).__init__(message or "Couldn't find any authorities for %s" % host)
+        self.host = host
+
+
+class NoSuchDomainError(AuthorityError):
+
+    def __init__(self, host):
+        super(NoSuchDomainError, self).__init__(host, '%s does not exist.' % host)
@@ -0,0 +1,232 @@
+from concurrent.futures import wait, FIRST_COMPLETED
+import dns.name
+import dns.rcode
+import dns.message
+import dns.resolver
+import dns.rdatatype
+import dns.exception
+from .result import ServerResult
+from .errors import AuthorityError, NoSuchDomainError
+
+
+class IterativeResolver:
+    """
+    Find the zone cut a name belongs to by walking down the delegation tree.
+    Walk starts from the closest zone cut already cached, or from local DNS if none is.
+    On every hop all nameservers of current zone are queried at once and the first valid
+    answer is used. Addresses of nameservers are taken from glue when available.
+    Every zone cut found on the way is cached, and so are names found not to be zone cuts.
+    """
+
+    def __init__(self, dns_engine):
+        """
+        :param dns_engine: DNS to send the queries with
+        """
+        self.dns = dns_engine
+
+    def find_zone_cut(self, host, verbose=False):
+        """
+        :param host: hostname to find zone cut for
+        :param verbose:
+        :return: tuple, zone name and dict of authority name to list of IP-addresses
+        :raises AuthorityError: if no zone cut was found below the root
+        """
+        name = dns.name.from_text(host)
+        zone, authorities, walked = self._start(name, verbose=verbose)
+        for sub in self._below(name, walked):
+            if verbose:
+                print("DEBUG: Looking up NS of %s on %s" % (sub, ', '.join(authorities.keys())))
+            response = self._race(dns.message.make_query(sub, dns.rdatatype.NS), authorities, verbose=verbose)
+            ns_rrset = self._delegation(zone, sub, response, verbose=verbose)
+            if not ns_rrset:
+                self._member(sub, zone, response)
+                continue
+
+            authorities, ttl = self._authority_addresses(ns_rrset, response)
+            zone = self._delegate(sub, authorities, ttl, verbose=verbose)
+
+        return self._found(name, zone, authorities)
+
+    def _start(self, name, verbose=False):
+        """
+        :return: tuple, zone to start from, its authorities and name the walk continues below
+        """
+        zone, authorities, walked = self._closest_cached(name)
+        if zone is None:
+            # Let local DNS answer for the top of the tree
+            return dns.name.root, {self.dns.default_ns: [self.dns.default_ns]}, dns.name.root
+        if verbose:
+            print("DEBUG: Starting from cached zone cut %s" % zone)
+
+        return zone, authorities, walked
+
+    @staticmethod
+    def _below(name, walked):
+        """
+        :return: generator of names between walked and name, walked excluded, name included
+        """
+        for depth in range(len(walked) + 1, len(name) + 1):
+            yield name.split(depth)[1]
+
+    def _closest_cached(self, name):
+        """
+        :return: tuple, closest cached zone cut, its authorities and name the walk continues below.
+                 Nones if nothing is cached.
+        """
+        while True:
+            authorities = self.dns.delegation_cache.get(name.to_text())
+            if authorities:
+                return name, authorities, name
+            zone = self.dns.delegation_cache.zone_of(name.to_text())
+            if zone:
+                # Names up to this one are known to be in zone
+                authorities = self.dns.delegation_cache.get(zone)
+                if authorities:
+                    return dns.name.from_text(zone), authorities, name
+            if name == dns.name.root:
+                return None, None, None
+            name = name.parent()
+
+    def _member(self, sub, zone, response):
+        """
+        Remember sub is not a zone cut, until the negative answer expires.
+        Local DNS answering for the top of the tree is not a zone.
+        """
+        if zone == dns.name.root:
+            return
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                self.dns.delegation_cache.put_member(sub.to_text(), zone.to_text(),
+                                                     min(rrset.ttl, rrset[0].minimum))
+                return
+
+    @staticmethod
+    def _found(name, zone, authorities):
+        """
+        :return: tuple, zone name and dict of authority name to list of IP-addresses
+        :raises AuthorityError: if walk never got past local DNS
+        """
+        if zone == dns.name.root:
+            raise AuthorityError(name.to_text(), "Couldn't find a zone cut for %s, local DNS answered for all of it" %
+                                 name)
+
+        return zone.to_text(), authorities
+
+    def _delegation(self, zone, sub, response, verbose=False):
+        """
+        :return: NS RRset of sub if it is a zone cut of its own, None if not
+        """
+        if response is None:
+            raise AuthorityError(sub.to_text(), "No nameserver of %s answered for %s" % (zone, sub))
+        if response.rcode() == dns.rcode.NXDOMAIN:
+            raise NoSuchDomainError(sub.to_text())
+
+        ns_rrset = self._find_ns_rrset(response, sub)
+        if not ns_rrset and verbose:
+            print("DEBUG: Same servers are authoritative for %s" % sub)
+
+        return ns_rrset
+
+    def _delegate(self, sub, authorities, ttl, verbose=False):
+        if not authorities:
+            raise AuthorityError(sub.to_text(), "Couldn't find addresses of any authorities for %s" % sub)
+        if verbose:
+            print("DEBUG: %s is delegated to %s" % (sub, ', '.join(authorities.keys())))
+        self.dns.delegation_cache.put(sub.to_text(), authorities, ttl)
+
+        return sub
+
+    def _race(self, query_request, authorities, verbose=False):
+        """
+        Query all given servers at once.
+        :return: first valid response, None if no server gave one within timeout
+        """
+        pending = {}
+        for authority, addresses in authorities.items():
+            for address in addresses:
+                query_future = self.dns._submit_query(self.dns.executor, query_request, ServerResult.ROLE_AUTHORITY,
+                                                      authority, address, self.dns.query_timeout)
+                pending[query_future] = authority
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for query_future in done:
+                authority = pending.pop(query_future)
+                response, result = query_future.result()
+                if self._valid(authority, response, result, verbose=verbose):
+                    # Rest of the queries will finish on their own
+                    return response
+
+        return None
+
+    @staticmethod
+    def _valid(authority, response, result, verbose=False):
+        if result.error:
+            if verbose:
+                print("DEBUG: %s failed: %s" % (authority, result.error))
+            return False
+        if response.rcode() in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+            return True
+        if verbose:
+            print("DEBUG: %s failed: %s" % (authority, result.rcode))
+
+        return False
+
+    @staticmethod
+    def _find_ns_rrset(response, sub):
+        # Referral is in authority section, authoritative answer in answer section
+        for rrset in response.answer + response.authority:
+            if rrset.rdtype == dns.rdatatype.NS and rrset.name == sub:
+                return rrset
+
+        return None
+
+    @staticmethod
+    def _glue_addresses(ns_rrset, response):
+        """
+        :return: tuple, dict of authority name to list of IP-addresses from glue, list of names without glue
+                 and smallest TTL involved
+        """
+        ttl = ns_rrset.ttl
+        glue = {}
+        for rrset in response.additional:
+            if rrset.rdtype in (dns.rdatatype.AAAA, dns.rdatatype.A):
+                glue.setdefault(rrset.name, []).append(rrset)
+
+        authorities = {}
+        missing = []
+        for ns in ns_rrset:
+            authority = ns.target.to_text()
+            if ns.target in glue:
+                # IPv6 first
+                for rrset in sorted(glue[ns.target], key=lambda glue_rrset: glue_rrset.rdtype != dns.rdatatype.AAAA):
+                    authorities.setdefault(authority, []).extend(rr.address for rr in rrset)
+                    ttl = min(ttl, rrset.ttl)
+            else:
+                missing.append(ns.target)
+
+        return authorities, missing, ttl
+
+    def _authority_addresses(self, ns_rrset, response):
+        """
+        All IPv6- and IPv4-addresses of delegated nameservers.
+        Glue is used if available, the rest are resolved.
+        :return: tuple, dict of authority name to list of IP-addresses and smallest TTL involved
+        """
+        authorities, missing, ttl = self._glue_addresses(ns_rrset, response)
+        lookups = []
+        for target in missing:
+            for rr_type in ('AAAA', 'A'):
+                lookups.append((target.to_text(), self.dns.executor.submit(self.dns.default_resolver.query,
+                                                                           target, rr_type)))
+
+        for authority, lookup in lookups:
+            try:
+                answers = lookup.result()
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.exception.Timeout):
+                # Skip this
+                continue
+            authorities.setdefault(authority, []).extend(rr.address for rr in answers)
+            ttl = min(ttl, answers.rrset.ttl)
+
+        return authorities, ttl
@@ -0,0 +1,95 @@
+import socket
+import threading
+import dns.flags
+import dns.rcode
+import dns.opcode
+import dns.message
+import dns.rdatatype
+import dns.exception
+
+
+class NotifyListener:
+    """
+    Receive DNS NOTIFY messages (RFC 1996) a primary sends when its zone changes.
+    Every NOTIFY is acknowledged, zones notified are kept until a waiting monitor picks them up.
+    Listening runs in a background thread.
+    """
+
+    def __init__(self, address='', port=53, allowed_sources=None):
+        """
+        :param address: IP-address to listen on, empty for all IPv4-addresses
+        :param port: UDP-port to listen on, 0 picks a free one
+        :param allowed_sources: list of IP-addresses to accept NOTIFY from, None for any
+        """
+        family = socket.AF_INET6 if ':' in address else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_DGRAM)
+        self.socket.bind((address, port))
+        self.port = self.socket.getsockname()[1]
+        self.allowed_sources = set(allowed_sources) if allowed_sources else None
+        # Zone name to serial announced, None if NOTIFY didn't tell
+        self.notified = {}
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                wire, source = self.socket.recvfrom(65535)
+            except OSError:
+                # Socket closed
+                return
+            try:
+                message = dns.message.from_wire(wire)
+            except dns.exception.DNSException:
+                continue
+            if message.opcode() != dns.opcode.NOTIFY or message.flags & dns.flags.QR or not message.question:
+                continue
+
+            response = dns.message.make_response(message)
+            response.flags |= dns.flags.AA
+            if self.allowed_sources is not None and source[0] not in self.allowed_sources:
+                response.set_rcode(dns.rcode.REFUSED)
+            else:
+                self._notified(message)
+            try:
+                self.socket.sendto(response.to_wire(), source)
+            except OSError:
+                pass
+
+    def _notified(self, message):
+        zone = message.question[0].name.to_text().lower()
+        serial = None
+        for rrset in message.answer:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                serial = rrset[0].serial
+        with self.condition:
+            self.notified[zone] = serial
+            self.condition.notify_all()
+
+    def wait(self, timeout, zones=None):
+        """
+        Wait for a NOTIFY.
+        :param timeout: seconds to wait at most
+        :param zones: list of zone names to wait for, None for any
+        :return: dict, zone names notified to serial announced. Empty on timeout.
+        """
+        if zones is not None:
+            zones = set(zone.lower() for zone in zones)
+
+        def matching():
+            return {zone: serial for zone, serial in self.notified.items() if zones is None or zone in zones}
+
+        with self.condition:
+            self.condition.wait_for(matching, timeout=timeout)
+            notified = matching()
+            # NOTIFY for other zones stays for their monitors
+            for zone in notified:
+                del self.notified[zone]
+
+        return notified
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,186 @@
+import time
+import heapq
+import itertools
+import threading
+
+
+class RateLimiter:
+    """
+    Spread queries over time: at most per_server queries a second to any one server
+    and at most total queries a second to all servers together.
+    Queries are never dropped, they are delayed. Bursts of up to a second's worth go through at once.
+    Both limits are token buckets holding a second's worth of tokens, kept as generic cell rate algorithm:
+    memory use is one timestamp per server.
+    When the total budget is used up, waiting queries get it in order of urgency, then in order of arrival.
+    """
+    # Urgency of queries, lower goes first. Queries to one server stay in order of arrival.
+    URGENT = 0
+    NORMAL = 1
+    BULK = 2
+
+    def __init__(self, per_server=None, total=None):
+        """
+        :param per_server: queries per second to a single server, None for no limit
+        :param total: queries per second to all servers, None for no limit
+        """
+        self.per_server = per_server
+        self.total = total
+        self.arrivals = {}
+        self.total_arrival = 0.0
+        # Reentrant: report() is called from a signal handler, maybe while the main thread holds it
+        self.lock = threading.RLock()
+        # Queries waiting for total budget: heap of [urgency, order, wake-up] lists
+        self.waiting = []
+        self.order = itertools.count()
+        self.condition = threading.Condition(self.lock)
+        # Queries waiting for either limit now
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        # Queries delayed and seconds they waited
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    @staticmethod
+    def _reserve(arrival, rate, now):
+        """
+        :return: tuple, new theoretical arrival time and seconds to wait
+        """
+        interval = 1.0 / rate
+        # A second's worth of queries may go without waiting
+        tolerance = max(1.0, rate) * interval
+        arrival = max(arrival, now) + interval
+
+        return arrival, max(0.0, arrival - tolerance - now)
+
+    def _reserve_server(self, server):
+        """
+        :return: float, seconds to wait for the per-server limit
+        """
+        if not self.per_server:
+            return 0.0
+        with self.lock:
+            self.arrivals[server], wait = self._reserve(self.arrivals.get(server, 0.0), self.per_server,
+                                                        time.monotonic())
+
+        return wait
+
+    def _take_total(self, entry):
+        """
+        Take total budget for the query, if it is the most urgent one waiting and budget is there.
+        Call with lock held.
+        :return: float, seconds until budget is there. 0 if taken, None if others are before this one.
+        """
+        if self.waiting[0] is not entry:
+            return None
+        now = time.monotonic()
+        arrival, wait = self._reserve(self.total_arrival, self.total, now)
+        if wait > 0:
+            return wait
+        self.total_arrival = arrival
+        heapq.heappop(self.waiting)
+
+        return 0.0
+
+    def _enter(self):
+        with self.lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def _leave(self, entry, start, delayed):
+        """
+        :return: float, seconds waited
+        """
+        waited = time.monotonic() - start if delayed else 0.0
+        with self.lock:
+            if entry is not None and entry in self.waiting:
+                # Interrupted while waiting
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+            self.queue_depth -= 1
+            if delayed:
+                self.throttled += 1
+                self.throttled_seconds += waited
+
+        return waited
+
+    def acquire(self, server, urgency=NORMAL):
+        """
+        Blocking: wait until the query may be sent.
+        :param server: IP-address of the server to query
+        :param urgency: URGENT, NORMAL or BULK
+        :return: float, seconds waited
+        """
+        start = time.monotonic()
+        entry = None
+        self._enter()
+        try:
+            wait = self._reserve_server(server)
+            delayed = wait > 0
+            if delayed:
+                time.sleep(wait)
+            if self.total:
+                with self.condition:
+                    entry = [urgency, next(self.order), None]
+                    heapq.heappush(self.waiting, entry)
+                    while True:
+                        wait = self._take_total(entry)
+                        if wait == 0.0:
+                            # Next one in line has to check again
+                            self.condition.notify_all()
+                            break
+                        delayed = True
+                        self.condition.wait(wait)
+        finally:
+            waited = self._leave(entry, start, delayed)
+
+        return waited
+
+    async def acquire_async(self, server, urgency=NORMAL):
+        """
+        Asyncio: same as acquire(). Use from one event loop only.
+        """
+        # Blocking engine runs without asyncio loaded
+        import asyncio
+
+        start = time.monotonic()
+        entry = None
+        self._enter()
+        try:
+            wait = self._reserve_server(server)
+            delayed = wait > 0
+            if delayed:
+                await asyncio.sleep(wait)
+            if self.total:
+                entry = [urgency, next(self.order), asyncio.Event()]
+                with self.lock:
+                    heapq.heappush(self.waiting, entry)
+                while True:
+                    with self.lock:
+                        wait = self._take_total(entry)
+                    if wait == 0.0:
+                        break
+                    delayed = True
+                    entry[2].clear()
+                    try:
+                        await asyncio.wait_for(entry[2].wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            waited = self._leave(entry, start, delayed)
+            # Next one in line has to check again
+            self._wake_head()
+
+        return waited
+
+    def _wake_head(self):
+        with self.lock:
+            if self.waiting and self.waiting[0][2] is not None:
+                self.waiting[0][2].set()
+
+    def report(self):
+        """
+        :return: str, queries waiting and delayed so far
+        """
+        with self.lock:
+            return "Rate limit: %d queries waiting, at most %d. %d queries delayed, %.1f seconds in total." % (
+                self.queue_depth, self.max_queue_depth, self.throttled, self.throttled_seconds)
@@ -0,0 +1,84 @@
+import threading
+import dns.inet
+from .result import ServerResult
+
+
+class ResolverPool:
+    """
+    Large list of resolvers to sweep, eg. public and ISP resolvers.
+    All of them are queried as additional servers on every pass.
+    A resolver timing out on too many queries in a row is dropped for the rest of the run.
+    """
+    DEFAULT_MAX_TIMEOUTS = 3
+
+    def __init__(self, resolvers, max_timeouts=DEFAULT_MAX_TIMEOUTS):
+        """
+        :param resolvers: list of IP-addresses
+        :param max_timeouts: drop a resolver after this many timeouts in a row
+        """
+        self.resolvers = list(resolvers)
+        self.members = set(self.resolvers)
+        self.max_timeouts = max_timeouts
+        self.timeouts_in_row = {}
+        self.dropped = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def read(cls, resolvers_file, max_timeouts=DEFAULT_MAX_TIMEOUTS):
+        """
+        One resolver per line: IP-address [region [name]]
+        Empty lines and lines starting with # are skipped. Same file works as regions of a history report.
+        :param resolvers_file: filename to read
+        :param max_timeouts: drop a resolver after this many timeouts in a row
+        :return: ResolverPool
+        """
+        resolvers = []
+        with open(resolvers_file, 'r') as stream:
+            for line_number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                address = line.split()[0]
+                try:
+                    dns.inet.af_for_address(address)
+                except ValueError:
+                    raise ValueError("%s:%d: %s is not an IP-address" % (resolvers_file, line_number, address))
+                if address not in resolvers:
+                    resolvers.append(address)
+
+        return cls(resolvers, max_timeouts=max_timeouts)
+
+    def active(self):
+        """
+        :return: list of IP-addresses of resolvers not dropped
+        """
+        with self.lock:
+            return [resolver for resolver in self.resolvers if resolver not in self.dropped]
+
+    def record(self, server_result):
+        """
+        Keep count of timeouts in a row.
+        :param server_result: ServerResult of a query to a resolver
+        :return: bool, True if the resolver was dropped now
+        """
+        if server_result.role != ServerResult.ROLE_ADDITIONAL or server_result.address not in self.members:
+            return False
+        with self.lock:
+            if not server_result.timed_out:
+                self.timeouts_in_row.pop(server_result.address, None)
+                return False
+            timeouts = self.timeouts_in_row.get(server_result.address, 0) + 1
+            self.timeouts_in_row[server_result.address] = timeouts
+            if timeouts < self.max_timeouts or server_result.address in self.dropped:
+                return False
+            self.dropped.add(server_result.address)
+
+        return True
+
+    def just_dropped(self, address):
+        """
+        :param address: IP-address of a resolver
+        :return: bool, True if the last timeout of the resolver got it dropped
+        """
+        with self.lock:
+            return address in self.dropped and self.timeouts_in_row.get(address) == self.max_timeouts
@@ -0,0 +1,94 @@
+from .answer_set import AnswerSet
+
+
+class ServerResult:
+    """
+    Outcome of a single query to a single DNS-server.
+    """
+    __slots__ = ('role', 'server', 'address', 'label', 'answers', 'ttl', 'rcode', 'latency', 'error', 'success')
+
+    ROLE_LOCAL = 'local'
+    ROLE_AUTHORITY = 'authority'
+    ROLE_ADDITIONAL = 'additional'
+
+    ERROR_TIMEOUT = 'timeout'
+
+    def __init__(self, role, server, address):
+        """
+        :param role: how the server is used, one of ROLE_LOCAL, ROLE_AUTHORITY or ROLE_ADDITIONAL
+        :param server: name of the server
+        :param address: IP-address queried
+        """
+        self.role = role
+        self.server = server
+        self.address = address
+        # Name of the result in reports, differs from server when each address is reported separately
+        self.label = server
+        self.answers = AnswerSet.EMPTY
+        self.ttl = None
+        self.rcode = None
+        self.latency = None
+        self.error = None
+        # Decided by monitor when comparing answers
+        self.success = None
+
+    @property
+    def timed_out(self):
+        return self.error == self.ERROR_TIMEOUT
+
+    def copy(self, role, server):
+        """
+        :return: ServerResult of same query for another caller
+        """
+        result = ServerResult(role, server, self.address)
+        result.answers = self.answers
+        result.ttl = self.ttl
+        result.rcode = self.rcode
+        result.latency = self.latency
+        result.error = self.error
+
+        return result
+
+    def to_dict(self):
+        return {
+            'role': self.role,
+            'server': self.label,
+            'address': self.address,
+            'answers': self.answers.texts,
+            'ttl': self.ttl,
+            'rcode': self.rcode,
+            'latency': round(self.latency, 6) if self.latency is not None else None,
+            'error': self.error,
+            'success': self.success
+        }
+
+
+class Message:
+    """
+    Message about a pass, formatted only when shown.
+    Most are never shown, eg. when only failing records of a watchlist are printed.
+    """
+    __slots__ = ('template', 'args')
+
+    def __init__(self, template, *args):
+        """
+        :param template: %-format string
+        :param args: values for the template, AnswerSets are shown comma separated
+        """
+        self.template = template
+        self.args = args
+
+    def __str__(self):
+        if not self.args:
+            return self.template
+
+        return self.template % self.args
+
+    def __repr__(self):
+        return "Message(%r)" % str(self)
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
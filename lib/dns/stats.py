@@ -0,0 +1,163 @@
+import math
+import threading
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory histogram of latencies.
+    Buckets grow logarithmically, each bucket is SUB_BUCKETS per power of two wide.
+    Recorded values are accurate to about 100 / SUB_BUCKETS percent.
+    """
+    MIN_LATENCY = 0.0001
+    MAX_LATENCY = 120.0
+    SUB_BUCKETS = 16
+
+    def __init__(self):
+        self.bucket_count = int(math.ceil(math.log2(self.MAX_LATENCY / self.MIN_LATENCY) * self.SUB_BUCKETS)) + 1
+        self.buckets = [0] * self.bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, latency):
+        if latency <= self.MIN_LATENCY:
+            return 0
+        bucket = int(math.log2(latency / self.MIN_LATENCY) * self.SUB_BUCKETS)
+
+        return min(bucket, self.bucket_count - 1)
+
+    def _bucket_value(self, bucket):
+        # Upper edge of the bucket
+        return self.MIN_LATENCY * 2 ** ((bucket + 1) / self.SUB_BUCKETS)
+
+    def record(self, latency):
+        self.buckets[self._bucket(latency)] += 1
+        self.count += 1
+        self.total += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+
+    def percentile(self, percent):
+        """
+        :param percent: 0 - 100
+        :return: float, seconds. None if nothing recorded.
+        """
+        if not self.count:
+            return None
+        threshold = max(1, int(math.ceil(self.count * percent / 100.0)))
+        seen = 0
+        for bucket, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= threshold:
+                return min(self._bucket_value(bucket), self.max)
+
+        return self.max
+
+    def cumulative_buckets(self, bounds):
+        """
+        :param bounds: list of upper bounds, seconds, ascending
+        :return: list of counts of latencies up to each bound
+        """
+        counts = []
+        bucket = 0
+        seen = 0
+        for bound in bounds:
+            while bucket < self.bucket_count and self._bucket_value(bucket) <= bound:
+                seen += self.buckets[bucket]
+                bucket += 1
+            counts.append(seen)
+
+        return counts
+
+
+class ServerStats:
+    """
+    Latencies, timeouts and errors of queries sent to one DNS-server.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.latency = LatencyHistogram()
+        self.timeouts = 0
+        self.errors = 0
+        # Answered by an identical query, not sent
+        self.shared = 0
+
+    @property
+    def queries(self):
+        return self.latency.count + self.timeouts + self.errors
+
+
+class QueryStats:
+    """
+    Per-server statistics of all queries sent.
+    Memory use is fixed per server, it won't grow during long runs.
+    """
+
+    def __init__(self):
+        self.servers = {}
+        # Reentrant: report() is called from a signal handler, maybe while the main thread holds it
+        self.lock = threading.RLock()
+
+    def record(self, server_result):
+        """
+        :param server_result: ServerResult of a query
+        :return:
+        """
+        with self.lock:
+            stats = self.servers.get(server_result.address)
+            if not stats:
+                stats = ServerStats(server_result.server)
+                self.servers[server_result.address] = stats
+            if server_result.timed_out:
+                stats.timeouts += 1
+            elif server_result.error:
+                stats.errors += 1
+            else:
+                stats.latency.record(server_result.latency)
+
+    def record_shared(self, server_result):
+        """
+        :param server_result: ServerResult of a query answered by an identical one
+        """
+        with self.lock:
+            stats = self.servers.get(server_result.address)
+            if not stats:
+                stats = ServerStats(server_result.server)
+                self.servers[server_result.address] = stats
+            stats.shared += 1
+
+    @property
+    def queries(self):
+        with self.lock:
+            return sum(stats.queries for stats in self.servers.values())
+
+    @property
+    def timeouts(self):
+        with self.lock:
+            return sum(stats.timeouts for stats in self.servers.values())
+
+    def report(self):
+        """
+        :return: str, table of latency percentiles, timeouts, errors and shared answers per server
+        """
+        lines = ["%-40s %8s %8s %8s %8s %8s %8s %8s" % ('Server', 'Queries', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                        'Timeouts', 'Errors', 'Shared')]
+        with self.lock:
+            for address, stats in sorted(self.servers.items()):
+                if stats.server != address:
+                    server = "%s (%s)" % (stats.server, address)
+                else:
+                    server = address
+                percentiles = []
+                for percent in (50, 95, 99):
+                    latency = stats.latency.percentile(percent)
+                    percentiles.append("%.1f" % (latency * 1000) if latency is not None else '-')
+                lines.append("%-40s %8d %8s %8s %8s %8d %8d %8d" % (server, stats.queries,
+                                                                    percentiles[0], percentiles[1], percentiles[2],
+                                                                    stats.timeouts, stats.errors, stats.shared))
+
+        return "\n".join(lines)
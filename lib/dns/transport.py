@@ -0,0 +1,198 @@
+import ssl
+import time
+import socket
+import struct
+import threading
+import dns.inet
+import dns.flags
+import dns.message
+import dns.exception
+
+
+class Transport:
+    """
+    Long-lived sockets for repeated queries.
+    UDP-sockets are pooled per nameserver and replies are matched by query ID,
+    late replies to earlier queries are skipped. TCP- and TLS-connections are kept open
+    and reused across passes.
+    """
+    DNS_PORT = 53
+    DNS_OVER_TLS_PORT = 853
+    MAX_IDLE_SOCKETS_PER_SERVER = 4
+    MAX_MESSAGE_SIZE = 65535
+
+    def __init__(self, use_tls=False, max_idle_sockets=MAX_IDLE_SOCKETS_PER_SERVER):
+        """
+        :param use_tls: bool, send all queries using DNS-over-TLS
+        :param max_idle_sockets: max number of open sockets to keep per nameserver and protocol
+        """
+        self.use_tls = use_tls
+        self.max_idle_sockets = max_idle_sockets
+        self.idle_sockets = {}
+        self.lock = threading.Lock()
+        self.tls_context = ssl.create_default_context() if use_tls else None
+
+    def query(self, query_request, where, timeout=None, port=None):
+        """
+        Send query and wait for its response.
+        Truncated UDP-responses are retried over TCP.
+        :param query_request: dns.message.Message
+        :param where: IP-address of nameserver
+        :param timeout: seconds to wait for the response, None is forever
+        :param port: port of nameserver, defaults to protocol default
+        :return: dns.message.Message
+        """
+        if self.use_tls:
+            return self._query_stream('tls', query_request, where, port or self.DNS_OVER_TLS_PORT, timeout)
+
+        response = self._query_udp(query_request, where, port or self.DNS_PORT, timeout)
+        if response.flags & dns.flags.TC:
+            response = self._query_stream('tcp', query_request, where, port or self.DNS_PORT, timeout)
+
+        return response
+
+    def close(self):
+        with self.lock:
+            idle_sockets = self.idle_sockets
+            self.idle_sockets = {}
+        for sockets in idle_sockets.values():
+            for sock in sockets:
+                sock.close()
+
+    def _checkout(self, key):
+        with self.lock:
+            sockets = self.idle_sockets.get(key)
+            if sockets:
+                return sockets.pop()
+
+        return None
+
+    def _checkin(self, key, sock):
+        with self.lock:
+            sockets = self.idle_sockets.setdefault(key, [])
+            if len(sockets) < self.max_idle_sockets:
+                sockets.append(sock)
+                return
+        sock.close()
+
+    def _connect(self, protocol, where, port, timeout):
+        af = dns.inet.af_for_address(where)
+        if protocol == 'udp':
+            sock = socket.socket(af, socket.SOCK_DGRAM)
+        else:
+            sock = socket.socket(af, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            if protocol == 'tls':
+                sock = self.tls_context.wrap_socket(sock, server_hostname=where)
+            sock.connect((where, port))
+        except socket.timeout:
+            sock.close()
+            raise dns.exception.Timeout
+        except OSError:
+            sock.close()
+            raise
+
+        return sock
+
+    @staticmethod
+    def _expiration(timeout):
+        if timeout is None:
+            return None
+
+        return time.monotonic() + timeout
+
+    @staticmethod
+    def _time_left(expiration):
+        if expiration is None:
+            return None
+        time_left = expiration - time.monotonic()
+        if time_left <= 0:
+            raise dns.exception.Timeout
+
+        return time_left
+
+    def _query_udp(self, query_request, where, port, timeout):
+        key = ('udp', where, port)
+        expiration = self._expiration(timeout)
+        sock = self._checkout(key) or self._connect('udp', where, port, timeout)
+        query_wire = query_request.to_wire()
+        try:
+            try:
+                sock.send(query_wire)
+            except ConnectionRefusedError:
+                # Pending error from an earlier query, socket is fine otherwise
+                sock.send(query_wire)
+            while True:
+                sock.settimeout(self._time_left(expiration))
+                try:
+                    wire = sock.recv(self.MAX_MESSAGE_SIZE)
+                except socket.timeout:
+                    raise dns.exception.Timeout
+                except ConnectionRefusedError:
+                    # Nobody listening. Like an unconnected socket would, keep waiting until timeout.
+                    continue
+                try:
+                    response = dns.message.from_wire(wire)
+                except dns.exception.DNSException:
+                    # Garbage, keep waiting
+                    continue
+                if query_request.is_response(response):
+                    break
+        except (OSError, dns.exception.Timeout):
+            # Socket is still usable after a timeout, a late reply will be skipped by its ID
+            self._checkin(key, sock)
+            raise
+        self._checkin(key, sock)
+
+        return response
+
+    def _query_stream(self, protocol, query_request, where, port, timeout):
+        key = (protocol, where, port)
+        expiration = self._expiration(timeout)
+        wire = query_request.to_wire()
+        message = struct.pack('!H', len(wire)) + wire
+
+        sock = self._checkout(key)
+        if sock:
+            # Server may have closed a kept connection while it was idle. Retry once with a new one.
+            try:
+                return self._exchange_stream(key, sock, query_request, message, expiration)
+            except (OSError, EOFError):
+                pass
+        sock = self._connect(protocol, where, port, self._time_left(expiration))
+        try:
+            return self._exchange_stream(key, sock, query_request, message, expiration)
+        except EOFError:
+            raise dns.exception.DNSException("Connection closed by %s" % where)
+
+    def _exchange_stream(self, key, sock, query_request, message, expiration):
+        try:
+            sock.settimeout(self._time_left(expiration))
+            sock.sendall(message)
+            while True:
+                (length,) = struct.unpack('!H', self._receive_exactly(sock, 2, expiration))
+                response = dns.message.from_wire(self._receive_exactly(sock, length, expiration))
+                if query_request.is_response(response):
+                    break
+        except socket.timeout:
+            sock.close()
+            raise dns.exception.Timeout
+        except BaseException:
+            # State of the stream is unknown, don't reuse
+            sock.close()
+            raise
+        self._checkin(key, sock)
+
+        return response
+
+    def _receive_exactly(self, sock, count, expiration):
+        data = b''
+        while len(data) < count:
+            sock.settimeout(self._time_left(expiration))
+            chunk = sock.recv(count - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+
+        return data
@@ -0,0 +1,191 @@
+import time
+import hashlib
+import itertools
+import dns.name
+import dns.zone
+import dns.query
+import dns.rdatatype
+import dns.exception
+from .result import ServerResult
+
+
+class ZoneTransfer:
+    """
+    Copy of a zone streamed from one authority, AXFR for all of it or IXFR for changes since a serial.
+    Records are handed on message by message as they arrive, the zone is never held in memory.
+    IXFR-records are marked deleted or added. A server answering IXFR with the full zone is handled as AXFR.
+    """
+    ADDED = '+'
+    DELETED = '-'
+    # Seconds a whole transfer may take
+    DEFAULT_LIFETIME = 600
+
+    def __init__(self, zone, authority, address, serial=None, timeout=None, lifetime=DEFAULT_LIFETIME):
+        """
+        :param zone: str, name of the zone
+        :param authority: name of the server
+        :param address: IP-address to transfer from
+        :param serial: int, ask IXFR for changes since this serial. None for AXFR.
+        :param timeout: seconds to wait for each message
+        :param lifetime: seconds to wait for whole transfer
+        """
+        self.zone = zone
+        self.result = ServerResult(ServerResult.ROLE_AUTHORITY, authority, address)
+        self.serial = serial
+        self.timeout = timeout
+        self.lifetime = lifetime
+        # SOA of the copy transferred
+        self.soa_name = None
+        self.soa = None
+        # Records transferred
+        self.records = 0
+
+    def _rdatas(self):
+        """
+        :return: generator of lists of (name, rdata), records of a message
+        """
+        rdtype = dns.rdatatype.AXFR if self.serial is None else dns.rdatatype.IXFR
+        for message in dns.query.xfr(self.result.address, self.zone, rdtype=rdtype, timeout=self.timeout,
+                                     lifetime=self.lifetime, relativize=False, serial=self.serial or 0):
+            yield [(rrset.name, rdata) for rrset in message.answer for rdata in rrset]
+
+    def batches(self):
+        """
+        Transfer errors end the stream, result tells what went wrong.
+        :return: generator of lists of tuples, operation, name and rdata of records of each message
+        """
+        start = time.monotonic()
+        # Opening SOA is followed by another one in an incremental transfer
+        incremental = None
+        operation = self.ADDED
+        try:
+            for records in self._rdatas():
+                batch = []
+                for name, rdata in records:
+                    if self.soa is None:
+                        self.soa_name = name
+                        self.soa = rdata
+                        continue
+                    if incremental is None:
+                        incremental = self.serial is not None and rdata.rdtype == dns.rdatatype.SOA
+                        if not incremental:
+                            batch.append((self.ADDED, self.soa_name, self.soa))
+                    if rdata.rdtype == dns.rdatatype.SOA:
+                        if rdata == self.soa and (not incremental or operation == self.ADDED):
+                            # Closing SOA, same as the opening one
+                            continue
+                        if incremental:
+                            # SOA starts deletions from an old serial or additions up to a newer one
+                            operation = self.DELETED if operation == self.ADDED else self.ADDED
+                    batch.append((operation, name, rdata))
+                self.records += len(records)
+                yield batch
+            if incremental is None and self.soa is not None:
+                # Up to date, IXFR had the SOA only
+                yield [(self.ADDED, self.soa_name, self.soa)]
+        except dns.exception.Timeout:
+            self.result.error = ServerResult.ERROR_TIMEOUT
+        except (dns.exception.DNSException, OSError, EOFError) as exc:
+            self.result.error = str(exc) or exc.__class__.__name__
+        self.result.latency = time.monotonic() - start
+
+
+class ZoneFile:
+    """
+    Expected copy of a zone read from a zone file, for comparing transfers against.
+    """
+    # Records handed on at a time, about what a transfer message has
+    BATCH_SIZE = 100
+
+    def __init__(self, zone, zone_file):
+        """
+        :param zone: str, origin of the zone
+        :param zone_file: path of a file in zone file format
+        """
+        self.zone = dns.zone.from_file(zone_file, origin=zone, relativize=False)
+
+    def batches(self):
+        """
+        :return: generator of lists of tuples, operation, name and rdata
+        """
+        batch = []
+        for name, ttl, rdata in self.zone.iterate_rdatas():
+            batch.append((ZoneTransfer.ADDED, name, rdata))
+            if len(batch) >= self.BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class ZoneDiff:
+    """
+    Per-name differences between copies of a zone, found while the copies stream in.
+    First copy sending records is the reference the others are compared to. A record of the reference adds
+    its hash to its name and type for every other copy, a record of a copy subtracts it.
+    Entries cancelling out are dropped right away. Copies are read in turns, message by message.
+    Servers of a zone mostly send records in same order, so only records in flight and real differences
+    are kept in memory.
+    """
+    MODULUS = 1 << 128
+
+    def __init__(self, sources):
+        """
+        :param sources: list of ZoneFile or ZoneTransfer
+        """
+        self.sources = sources
+        self.reference = None
+        # Per copy: (name, RR-type) to sum of hashes and difference of record counts
+        self.differences = {}
+
+    @staticmethod
+    def _hash(operation, name, rdata):
+        record = hashlib.blake2b(digest_size=16)
+        record.update(operation.encode())
+        record.update(name.canonicalize().to_wire())
+        record.update(rdata.rdtype.to_bytes(2, 'big'))
+        record.update(rdata.to_digestable())
+
+        return int.from_bytes(record.digest(), 'big')
+
+    def _apply(self, differences, batch, sign):
+        for operation, name, rdata in batch:
+            key = (name, rdata.rdtype)
+            total, count = differences.pop(key, (0, 0))
+            total = (total + sign * self._hash(operation, name, rdata)) % self.MODULUS
+            count += sign
+            if total or count:
+                differences[key] = (total, count)
+
+    def run(self):
+        """
+        Stream all sources in turns. Sources failing before sending anything are left out.
+        :return: dict, per source compared to reference: (name, RR-type) to number of records more
+                 in reference than in the source, 0 if same number but records differ
+        """
+        streams = []
+        for source in self.sources:
+            batches = source.batches()
+            batch = next(batches, None)
+            if batch is None:
+                continue
+            if self.reference is None:
+                self.reference = source
+            else:
+                self.differences[source] = {}
+            streams.append((source, itertools.chain([batch], batches)))
+
+        while streams:
+            for stream in list(streams):
+                source, batches = stream
+                batch = next(batches, None)
+                if batch is None:
+                    streams.remove(stream)
+                elif source is self.reference:
+                    for differences in self.differences.values():
+                        self._apply(differences, batch, 1)
+                else:
+                    self._apply(self.differences[source], batch, -1)
+
+        return {source: {key: count for key, (total, count) in differences.items()}
+                for source, differences in self.differences.items()}
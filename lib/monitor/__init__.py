@@ -1,6 +1,45 @@
-from .monitor import *
-from .monitor_authoritative_compare_local import *
-from .monitor_authoritative_expected import *
-from .monitor_local_expected import *
-from .monitor_local_change import *
-from .monitor_parent_authoritative_compare_local import *
\ No newline at end of file
+import importlib
+
+# Names are imported from their modules on first use. Only the selected mode is loaded,
+# HTTP-server of metrics and multiprocessing only when asked for.
+_MODULES = {
+    'Monitor': 'monitor',
+    'MonitorAuthoritativeCompareLocal': 'monitor_authoritative_compare_local',
+    'MonitorAuthoritativeExpected': 'monitor_authoritative_expected',
+    'MonitorLocalExpected': 'monitor_local_expected',
+    'MonitorLocalChange': 'monitor_local_change',
+    'MonitorAuthoritativeChange': 'monitor_authoritative_change',
+    'MonitorParentAuthoritativeCompareLocal': 'monitor_parent_authoritative_compare_local',
+    'MonitorDnssecRollover': 'monitor_dnssec_rollover',
+    'MonitorZoneTransfer': 'monitor_zone_transfer',
+    'WatchlistRecord': 'watchlist',
+    'Watchlist': 'watchlist',
+    'QueueOutput': 'sharded',
+    'ShardedWatchlist': 'sharded',
+    'PollScheduler': 'scheduler',
+    'PassResult': 'pass_result',
+    'ConsoleOutput': 'output',
+    'JsonLinesOutput': 'output',
+    'TeeOutput': 'output',
+    'HistoryOutput': 'history',
+    'ServerTimeline': 'history',
+    'PropagationHistory': 'history',
+    'MetricsOutput': 'metrics',
+    'MetricsServer': 'metrics',
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
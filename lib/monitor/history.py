@@ -0,0 +1,286 @@
+import os
+import json
+import math
+import atexit
+import datetime
+import threading
+
+
+class HistoryOutput:
+    """
+    Append-only history of how answers of every server change over time.
+    A line is written only when answer, success or error of a server differs from its previous pass.
+    Servers and answer sets are written once per run and referred to by number afterwards,
+    so multi-day runs against many servers stay small.
+
+    Lines are compact JSON-objects:
+    {"r": time} starts a run, numbering of servers and answer sets starts over
+    {"s": id, "host": .., "rr_type": .., "role": .., "server": .., "address": ..} defines a server of a record
+    {"a": id, "answers": [..]} defines an answer set
+    {"t": time, "s": server id, "a": answer set id, "ok": success, "e": error} is a change of state
+    """
+
+    def __init__(self, history_file):
+        """
+        :param history_file: filename to append to
+        """
+        torn = self._ends_mid_line(history_file)
+        self.stream = open(history_file, 'a', encoding='utf-8')
+        if torn:
+            # Last line of a killed run stays alone, the new run starts on a line of its own
+            self.stream.write('\n')
+        self.servers = {}
+        self.answer_sets = {}
+        self.states = {}
+        self.lock = threading.Lock()
+        self._write({'r': round(datetime.datetime.now().timestamp(), 3)})
+
+        # Buffered lines must not get lost on exit
+        atexit.register(self.close)
+
+    @staticmethod
+    def _ends_mid_line(history_file):
+        if not os.path.exists(history_file) or not os.path.getsize(history_file):
+            return False
+        with open(history_file, 'rb') as stream:
+            stream.seek(-1, os.SEEK_END)
+
+            return stream.read(1) != b'\n'
+
+    def _write(self, line):
+        self.stream.write(json.dumps(line, separators=(',', ':')))
+        self.stream.write('\n')
+
+    def _server_id(self, pass_result, server_result):
+        key = (pass_result.host, pass_result.rr_type, server_result.role, server_result.label,
+               server_result.address)
+        server_id = self.servers.get(key)
+        if server_id is None:
+            server_id = len(self.servers)
+            self.servers[key] = server_id
+            self._write({'s': server_id, 'host': pass_result.host, 'rr_type': pass_result.rr_type,
+                         'role': server_result.role, 'server': server_result.label,
+                         'address': server_result.address})
+
+        return server_id
+
+    def _answer_set_id(self, answers):
+        answer_set_id = self.answer_sets.get(answers.digest)
+        if answer_set_id is None:
+            answer_set_id = len(self.answer_sets)
+            self.answer_sets[answers.digest] = answer_set_id
+            self._write({'a': answer_set_id, 'answers': answers.texts})
+
+        return answer_set_id
+
+    def report(self, pass_result, **kwargs):
+        timestamp = round(pass_result.timestamp.timestamp(), 3)
+        with self.lock:
+            for server_result in pass_result.server_results:
+                server_id = self._server_id(pass_result, server_result)
+                state = (self._answer_set_id(server_result.answers), server_result.success, server_result.error)
+                if self.states.get(server_id) == state:
+                    continue
+                self.states[server_id] = state
+                line = {'t': timestamp, 's': server_id, 'a': state[0], 'ok': state[1]}
+                if state[2]:
+                    line['e'] = state[2]
+                self._write(line)
+
+    def report_record(self, pass_result, **kwargs):
+        self.report(pass_result)
+
+    def summary(self, successes, records):
+        pass
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream.closed:
+            return
+        self.flush()
+        self.stream.close()
+
+
+class ServerTimeline:
+    """
+    Changes of state of one server of one record during a run.
+    """
+
+    def __init__(self, host, rr_type, role, server, address):
+        self.host = host
+        self.rr_type = rr_type
+        self.role = role
+        self.server = server
+        self.address = address
+        # List of tuples: time, answers, success, error
+        self.changes = []
+
+    @property
+    def first_ok(self):
+        """
+        :return: float, time of first successful pass. None if never.
+        """
+        for timestamp, answers, success, error in self.changes:
+            if success:
+                return timestamp
+
+        return None
+
+    @property
+    def judged(self):
+        """
+        :return: bool, False if the mode never decided success of this server, eg. local DNS being compared to
+        """
+        return any(success is not None for timestamp, answers, success, error in self.changes)
+
+    @property
+    def flaps(self):
+        """
+        :return: int, number of times success was lost after reaching it
+        """
+        flaps = 0
+        ok = False
+        for timestamp, answers, success, error in self.changes:
+            if ok and not success:
+                flaps += 1
+            ok = bool(success)
+
+        return flaps
+
+
+class PropagationHistory:
+    """
+    Read a history written by HistoryOutput and compute time-to-propagate of every server.
+    Time-to-propagate is measured from the first pass of the record in a run to the first
+    successful pass of the server. Servers already ok on the first pass took no time.
+    """
+
+    def __init__(self):
+        # List of tuples: start time of run and list of ServerTimeline
+        self.runs = []
+
+    @classmethod
+    def read(cls, history_file):
+        """
+        :param history_file: filename to read
+        :return: PropagationHistory
+        """
+        history = cls()
+        timelines = None
+        answer_sets = {}
+        with open(history_file, 'r', encoding='utf-8') as stream:
+            for line in stream:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line of a killed run
+                    continue
+                if 't' in entry:
+                    timelines[entry['s']].changes.append((entry['t'], answer_sets.get(entry['a']),
+                                                          entry['ok'], entry.get('e')))
+                elif 'r' in entry:
+                    timelines = {}
+                    answer_sets = {}
+                    history.runs.append((entry['r'], timelines))
+                elif 's' in entry:
+                    timelines[entry['s']] = ServerTimeline(entry['host'], entry['rr_type'], entry['role'],
+                                                           entry['server'], entry['address'])
+                elif 'a' in entry:
+                    answer_sets[entry['a']] = entry['answers']
+
+        history.runs = [(started, list(timelines.values())) for started, timelines in history.runs]
+
+        return history
+
+    @staticmethod
+    def _record_starts(timelines):
+        starts = {}
+        for timeline in timelines:
+            if not timeline.changes:
+                continue
+            record = (timeline.host, timeline.rr_type)
+            first_pass = timeline.changes[0][0]
+            if record not in starts or first_pass < starts[record]:
+                starts[record] = first_pass
+
+        return starts
+
+    @staticmethod
+    def _percentile(values, percent):
+        values = sorted(values)
+
+        return values[max(0, int(math.ceil(len(values) * percent / 100.0)) - 1)]
+
+    def report(self, regions=None):
+        """
+        :param regions: dict, server name or address to region. Servers without one are grouped by role.
+        :return: str, time-to-propagate per server and per region of every record in every run
+        """
+        regions = regions or {}
+        lines = []
+        for started, timelines in self.runs:
+            if not timelines:
+                continue
+            starts = self._record_starts(timelines)
+            lines.append("Run started %s" % datetime.datetime.fromtimestamp(started).strftime('%Y-%m-%d %H:%M:%S'))
+            lines.append("%-40s %-12s %12s %6s  %s" % ('Server', 'Region', 'Propagated s', 'Flaps', 'Answers now'))
+            groups = {}
+            record = None
+            for timeline in sorted(timelines, key=lambda timeline: (timeline.host, timeline.rr_type, timeline.role,
+                                                                    timeline.server)):
+                if not timeline.changes:
+                    continue
+                if (timeline.host, timeline.rr_type) != record:
+                    record = (timeline.host, timeline.rr_type)
+                    lines.append("%s %s" % record)
+                region = regions.get(timeline.server) or regions.get(timeline.address) or timeline.role
+                first_ok = timeline.first_ok
+                if not timeline.judged:
+                    # Not counted, eg. local DNS in compare modes
+                    region = '-'
+                    propagated = '-'
+                elif first_ok is None:
+                    groups.setdefault(region, [0, []])[0] += 1
+                    propagated = 'never'
+                else:
+                    took = first_ok - starts[record]
+                    group = groups.setdefault(region, [0, []])
+                    group[0] += 1
+                    group[1].append(took)
+                    propagated = "%.1f" % took
+                timestamp, answers, success, error = timeline.changes[-1]
+                now = error if error else ', '.join(answers or [])
+                lines.append("  %-38s %-12s %12s %6d  %s" % (timeline.server, region, propagated, timeline.flaps,
+                                                             now))
+
+            lines.append("%-40s %12s %12s %12s %12s" % ('Region', 'Propagated', 'p50 s', 'p95 s', 'Max s'))
+            for region, (servers, took) in sorted(groups.items()):
+                if took:
+                    times = ["%.1f" % value for value in (self._percentile(took, 50), self._percentile(took, 95),
+                                                          max(took))]
+                else:
+                    times = ['-', '-', '-']
+                lines.append("%-40s %12s %12s %12s %12s" % (region, "%d/%d" % (len(took), servers),
+                                                            times[0], times[1], times[2]))
+            lines.append('')
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def read_regions(regions_file):
+        """
+        One server per line: name or IP-address and region.
+        :param regions_file: filename to read
+        :return: dict, server to region
+        """
+        regions = {}
+        with open(regions_file, 'r') as stream:
+            for line in stream:
+                fields = line.split()
+                if len(fields) >= 2 and not fields[0].startswith('#'):
+                    regions[fields[0]] = fields[1]
+
+        return regions
@@ -0,0 +1,214 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsOutput:
+    """
+    Keep latest results of every record and server for Prometheus to scrape.
+    Metrics are rendered only when scraped after something has changed, a scrape
+    without new passes in between is served from cache.
+    """
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, dns):
+        """
+        :param dns: DNS, for query statistics
+        """
+        self.dns = dns
+        self.records = {}
+        self.servers = {}
+        self.generation = 0
+        self.rendered_generation = -1
+        self.rendered = b''
+        self.lock = threading.Lock()
+
+    def report(self, pass_result, **kwargs):
+        timestamp = pass_result.timestamp.timestamp()
+        with self.lock:
+            record_key = (pass_result.host, pass_result.rr_type)
+            self.records[record_key] = 1 if pass_result.success else 0
+            for server_result in pass_result.server_results:
+                key = record_key + (server_result.role, server_result.label)
+                server = self.servers.get(key)
+                if not server:
+                    server = {'last_success': None}
+                    self.servers[key] = server
+                # Never judged, eg. local DNS when comparing authorities: no match gauge
+                server['match'] = None if server_result.success is None else int(server_result.success)
+                server['ttl'] = server_result.ttl
+                if server_result.success:
+                    server['last_success'] = timestamp
+            self.generation += 1
+
+    def report_record(self, pass_result, **kwargs):
+        self.report(pass_result)
+
+    def summary(self, successes, records):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def render(self):
+        """
+        :return: bytes, metrics in Prometheus text format
+        """
+        with self.lock:
+            if self.rendered_generation == self.generation:
+                return self.rendered
+            generation = self.generation
+            records = dict(self.records)
+            servers = {key: dict(server) for key, server in self.servers.items()}
+
+        lines = [
+            '# HELP dns_monitor_record_success Did last pass of the record reach success.',
+            '# TYPE dns_monitor_record_success gauge'
+        ]
+        for (host, rr_type), success in sorted(records.items()):
+            lines.append('dns_monitor_record_success{host="%s",rr_type="%s"} %d' % (
+                self._escape(host), self._escape(rr_type), success))
+
+        match_lines = []
+        last_success_lines = []
+        ttl_lines = []
+        for (host, rr_type, role, server_name), server in sorted(servers.items()):
+            labels = 'host="%s",rr_type="%s",role="%s",server="%s"' % (
+                self._escape(host), self._escape(rr_type), self._escape(role), self._escape(server_name))
+            if server['match'] is not None:
+                match_lines.append('dns_monitor_answer_match{%s} %d' % (labels, server['match']))
+            if server['last_success'] is not None:
+                last_success_lines.append('dns_monitor_last_success_timestamp_seconds{%s} %.3f' % (
+                    labels, server['last_success']))
+            if server['ttl'] is not None:
+                ttl_lines.append('dns_monitor_answer_ttl_seconds{%s} %d' % (labels, server['ttl']))
+        lines.append('# HELP dns_monitor_answer_match Did the server answer match in last pass.')
+        lines.append('# TYPE dns_monitor_answer_match gauge')
+        lines.extend(match_lines)
+        lines.append('# HELP dns_monitor_last_success_timestamp_seconds When did the server answer match last time.')
+        lines.append('# TYPE dns_monitor_last_success_timestamp_seconds gauge')
+        lines.extend(last_success_lines)
+        lines.append('# HELP dns_monitor_answer_ttl_seconds TTL of the answer in last pass.')
+        lines.append('# TYPE dns_monitor_answer_ttl_seconds gauge')
+        lines.extend(ttl_lines)
+
+        lines.extend(self._render_query_stats())
+        lines.append('')
+        rendered = '\n'.join(lines).encode('utf-8')
+
+        with self.lock:
+            if generation >= self.rendered_generation:
+                self.rendered = rendered
+                self.rendered_generation = generation
+
+        return rendered
+
+    def _render_query_stats(self):
+        latency_lines = []
+        timeout_lines = []
+        error_lines = []
+        shared_lines = []
+        with self.dns.stats.lock:
+            for address, stats in sorted(self.dns.stats.servers.items()):
+                labels = 'server="%s",address="%s"' % (self._escape(stats.server), self._escape(address))
+                histogram = stats.latency
+                for bound, count in zip(self.LATENCY_BUCKETS, histogram.cumulative_buckets(self.LATENCY_BUCKETS)):
+                    latency_lines.append('dns_monitor_query_latency_seconds_bucket{%s,le="%s"} %d' % (
+                        labels, bound, count))
+                latency_lines.append('dns_monitor_query_latency_seconds_bucket{%s,le="+Inf"} %d' % (
+                    labels, histogram.count))
+                latency_lines.append('dns_monitor_query_latency_seconds_sum{%s} %f' % (labels, histogram.total))
+                latency_lines.append('dns_monitor_query_latency_seconds_count{%s} %d' % (labels, histogram.count))
+                timeout_lines.append('dns_monitor_query_timeouts_total{%s} %d' % (labels, stats.timeouts))
+                error_lines.append('dns_monitor_query_errors_total{%s} %d' % (labels, stats.errors))
+                shared_lines.append('dns_monitor_query_shared_total{%s} %d' % (labels, stats.shared))
+
+        lines = ['# HELP dns_monitor_query_latency_seconds Latency of answered queries.',
+                 '# TYPE dns_monitor_query_latency_seconds histogram']
+        lines.extend(latency_lines)
+        lines.append('# HELP dns_monitor_query_timeouts_total Number of queries timed out.')
+        lines.append('# TYPE dns_monitor_query_timeouts_total counter')
+        lines.extend(timeout_lines)
+        lines.append('# HELP dns_monitor_query_errors_total Number of queries failed.')
+        lines.append('# TYPE dns_monitor_query_errors_total counter')
+        lines.extend(error_lines)
+        lines.append('# HELP dns_monitor_query_shared_total Number of queries answered by an identical one, not sent.')
+        lines.append('# TYPE dns_monitor_query_shared_total counter')
+        lines.extend(shared_lines)
+        if self.dns.rate_limiter:
+            lines.extend(self._render_rate_limit())
+
+        return lines
+
+    def _render_rate_limit(self):
+        rate_limiter = self.dns.rate_limiter
+        with rate_limiter.lock:
+            queue_depth = rate_limiter.queue_depth
+            max_queue_depth = rate_limiter.max_queue_depth
+            throttled = rate_limiter.throttled
+            throttled_seconds = rate_limiter.throttled_seconds
+
+        return ['# HELP dns_monitor_rate_limit_queue_depth Number of queries waiting for the rate limit.',
+                '# TYPE dns_monitor_rate_limit_queue_depth gauge',
+                'dns_monitor_rate_limit_queue_depth %d' % queue_depth,
+                '# HELP dns_monitor_rate_limit_max_queue_depth Most queries waiting for the rate limit at once.',
+                '# TYPE dns_monitor_rate_limit_max_queue_depth gauge',
+                'dns_monitor_rate_limit_max_queue_depth %d' % max_queue_depth,
+                '# HELP dns_monitor_rate_limit_throttled_total Number of queries delayed by the rate limit.',
+                '# TYPE dns_monitor_rate_limit_throttled_total counter',
+                'dns_monitor_rate_limit_throttled_total %d' % throttled,
+                '# HELP dns_monitor_rate_limit_throttled_seconds_total Seconds queries waited for the rate limit.',
+                '# TYPE dns_monitor_rate_limit_throttled_seconds_total counter',
+                'dns_monitor_rate_limit_throttled_seconds_total %f' % throttled_seconds]
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsServer:
+    """
+    Serve metrics over HTTP at /metrics in a background thread.
+    """
+
+    def __init__(self, metrics_output, address='', port=9153):
+        """
+        :param metrics_output: MetricsOutput to serve
+        :param address: address to listen, empty for all
+        :param port: port to listen
+        """
+        self.metrics_output = metrics_output
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] != '/metrics':
+                    handler.send_error(404)
+                    return
+                body = metrics_output.render()
+                handler.send_response(200)
+                handler.send_header('Content-Type', MetricsOutput.CONTENT_TYPE)
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                # Scrapes are too frequent to be logged
+                pass
+
+        self.httpd = ThreadingHTTPServer((address, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
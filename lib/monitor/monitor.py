@@ -1,5 +1,9 @@
 import time
 import signal
+from .scheduler import PollScheduler
+from .output import ConsoleOutput
+from ..dns.result import ServerResult, Message
+from ..dns.errors import AuthorityError
 
 
 class Monitor:
@@ -7,6 +11,24 @@ class Monitor:
     def __init__(self, dns, additional_dns=None):
         self.dns = dns
         self.additional_dns = additional_dns
+        self.authorities = {}
+        # Zone the authorities serve
+        self.zone = None
+        # Query authorities for full records only when serial of their zone has moved
+        self.soa_precheck = False
+        # Serials and results of authorities on last full query
+        self.authority_serials = None
+        self.authority_answers = None
+        self.authority_results = None
+        # Wake up on NOTIFY instead of waiting full interval
+        self.notify_listener = None
+        # Console output is silenced when driven by a watchlist
+        self.quiet = False
+        # Embedding code leaves signals to itself
+        self.handle_signals = True
+        # Where results of passes go
+        self.output = ConsoleOutput()
+        self.last_pass = None
 
     def init_monitor(self, host_to_query, rr_type_to_query, verbose=False):
         pass
@@ -23,35 +45,103 @@ class Monitor:
         print("\nQuit.")
         exit(0)
 
+    def print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def report(self, pass_result, only_fail=False, stop_on_success=True, verbose=False):
+        self.last_pass = pass_result
+        if self.output:
+            self.output.report(pass_result, only_fail=only_fail, stop_on_success=stop_on_success, verbose=verbose)
+
     def get_authorities(self, host, verbose=False):
-        authorities = self.dns.find_authoritative_nameservers(host, verbose=verbose)
+        authorities = self.dns.find_zone_authorities(host, verbose=verbose)
+        self.authorities = authorities
+        self.zone = self.dns.zone_of(host)
 
-        print("Found following authorities for %s:\n%s" % (
+        self.print("Found following authorities for %s:\n%s" % (
             host,
-            '\n'.join("{!s} = {!s}".format(key, val) for (key, val) in authorities.items()))
+            '\n'.join("{!s} = {!s}".format(key, ', '.join(val)) for (key, val) in authorities.items()))
               )
         if self.additional_dns:
-            print("Also using following DNS: %s" % (
+            self.print("Also using following DNS: %s" % (
                 ', '.join(val for val in self.additional_dns))
                   )
 
     def get_parents_of_authority(self, host_in, verbose=False):
         host = host_in.split('.')
         if len(host) < 2:
-            raise Exception("get_parents_of_authority() will fail for host '%s'. Doesn't have a parent!" % host_in)
+            raise AuthorityError(host_in, "get_parents_of_authority() will fail for host '%s'. Doesn't have a parent!" %
+                                 host_in)
 
         host = '.'.join(host[1:])
-        authorities = self.dns.find_authoritative_nameservers(host, verbose=verbose)
+        authorities = self.dns.find_zone_authorities(host, verbose=verbose)
+        self.authorities = authorities
+        self.zone = self.dns.zone_of(host)
 
-        print("Found following authorities for %s:\n%s" % (
+        self.print("Found following authorities for %s:\n%s" % (
             host,
-            '\n'.join("{!s} = {!s}".format(key, val) for (key, val) in authorities.items()))
+            '\n'.join("{!s} = {!s}".format(key, ', '.join(val)) for (key, val) in authorities.items()))
               )
         if self.additional_dns:
-            print("Also using following DNS: %s" % (
+            self.print("Also using following DNS: %s" % (
                 ', '.join(val for val in self.additional_dns))
                   )
 
+    def query_authorities(self, host, rr_type, timeout, results, verbose=False):
+        """
+        Query authorities and additional DNS-servers for a record.
+        With SOA pre-check, authorities are first asked for serial of their zone only. If no serial has moved
+        since last full query, authority answers of that query are used again.
+        :param results: list, a ServerResult per server is appended
+        :return: tuple, dicts of server name to AnswerSet for authorities and additional servers, and messages
+        """
+        if not self.soa_precheck or not self.zone or not self.authorities:
+            return self.dns.run_query(host, rr_type, self.additional_dns, timeout, authorities=self.authorities,
+                                      results=results, verbose=verbose)
+
+        soa_answers, _, _ = self.dns.run_query(self.zone, 'SOA', None, timeout, authorities=self.authorities,
+                                               verbose=verbose)
+        serials = {authority: answer.soa_serial for authority, answer in soa_answers.items()}
+        # Every authority answering the last full query, empty answers and NXDOMAIN included
+        answered = set(result.label for result in self.authority_results or [] if not result.error)
+        if (serials and self.authority_serials == serials and None not in serials.values() and
+                set(serials) == answered):
+            if verbose:
+                self.print("DEBUG: Serials of %s not changed, skipping authorities" % self.zone)
+            authority_answers = dict(self.authority_answers)
+            results.extend(self.authority_results)
+            _, additional_answers, replies = self.dns.run_query(host, rr_type, self.additional_dns, timeout,
+                                                                authorities={}, results=results, verbose=verbose)
+
+            return authority_answers, additional_answers, replies
+
+        if verbose:
+            self.print("DEBUG: Serials of %s: %s" % (self.zone, ', '.join(
+                "%s %s" % (authority, serial) for authority, serial in serials.items())))
+        first_result = len(results)
+        authority_answers, additional_answers, replies = self.dns.run_query(host, rr_type, self.additional_dns,
+                                                                            timeout, authorities=self.authorities,
+                                                                            results=results, verbose=verbose)
+        self.authority_serials = serials
+        self.authority_answers = authority_answers
+        self.authority_results = [result for result in results[first_result:]
+                                  if result.role == ServerResult.ROLE_AUTHORITY]
+
+        return authority_answers, additional_answers, replies
+
+    def wait(self, seconds):
+        """
+        Wait until next pass. A NOTIFY for the zone ends the wait early.
+        """
+        if not self.notify_listener:
+            time.sleep(seconds)
+            return
+
+        notified = self.notify_listener.wait(seconds, zones=[self.zone] if self.zone else None)
+        if notified:
+            self.print("\nNOTIFY received for %s" % ', '.join(sorted(notified)))
+
     def local_query(self, host, rr_type):
         answers = self.dns.query(host, rr_type)
 
@@ -62,7 +152,7 @@ class Monitor:
                 answer = '%s %s' % (rdata.__class__.__name__, str(rdata))
             else:
                 answer = '%s %s' % (rdata.__class__.__name__, str(rdata))
-            print('Local server result for %s: %s' % (host, answer))
+            self.print('Local server result for %s: %s' % (host, answer))
 
         return answers
 
@@ -72,46 +162,77 @@ class Monitor:
         for authority, answer in authority_answers.items():
             if answer != local_answers:
                 statuses[authority] = False
-                replies.append("Authority %s not returning local result! returned: %s, expected %s" %
-                               (authority, ', '.join(answer), ', '.join(local_answers))
-                               )
+                replies.append(Message("Authority %s not returning local result! returned: %s, expected %s",
+                                       authority, answer, local_answers))
             else:
                 statuses[authority] = True
                 if verbose:
-                    print("Authority %s ok. returned: %s" % (authority, ', '.join(answer)))
-        if self.dns.authorities and not authority_answers:
-            replies.append("No authority answers received!")
+                    self.print("Authority %s ok. returned: %s" % (authority, ', '.join(answer)))
+        if self.authorities and not authority_answers:
+            replies.append(Message("No authority answers received!"))
         for additional_server, answer in additional_answers.items():
             if answer != local_answers:
                 statuses[additional_server] = False
-                statuses = False
-                replies.append("Additional DNS %s fail! returned: %s" % (additional_server, ', '.join(answer)))
+                replies.append(Message("Additional DNS %s fail! returned: %s", additional_server, answer))
             else:
                 statuses[additional_server] = True
                 if verbose:
-                    print("Additional DNS %s ok. returned: %s" % (additional_server, ', '.join(answer)))
+                    self.print("Additional DNS %s ok. returned: %s" % (additional_server, ', '.join(answer)))
 
         return statuses, replies
 
+    def local_failure(self, server_results):
+        """
+        :param server_results: list of ServerResult of a pass
+        :return: list of messages about local DNS query failing
+        """
+        return [Message("Local server %s failed: %s", server_result.server, server_result.error)
+                for server_result in server_results
+                if server_result.role == ServerResult.ROLE_LOCAL and server_result.error]
+
+    def check(self, host, rr_type, timeout=None, verbose=False):
+        """
+        Do a single pass for embedding code. Set output to None and quiet to True to keep it silent.
+        :param host: hostname to query
+        :param rr_type: DNS RR-type to query
+        :param timeout: seconds to wait for responses. Default is query timeout of DNS.
+        :param verbose:
+        :return: PassResult
+        """
+        if timeout is None:
+            timeout = self.dns.query_timeout
+        last_ok = self.last_pass.last_ok if self.last_pass else None
+        self.monitor(host, rr_type, timeout=timeout, last_ok=last_ok, verbose=verbose)
+
+        return self.last_pass
+
     def single_pass(self, *args, **kwargs):
         self.monitor(*args, **kwargs)
-        print('')
+        self.print('')
 
-    def continuous(self, host, rr_type, interval=0, only_fail=False, stop_on_success=True, **kwargs):
+    def continuous(self, host, rr_type, interval=0, only_fail=False, stop_on_success=True,
+                   min_interval=None, max_interval=None, adaptive=False, **kwargs):
         # Keep looping
-        signal.signal(signal.SIGINT, Monitor.exit_gracefully)
-        signal.signal(signal.SIGTERM, Monitor.exit_gracefully)
+        if self.handle_signals:
+            signal.signal(signal.SIGINT, Monitor.exit_gracefully)
+            signal.signal(signal.SIGTERM, Monitor.exit_gracefully)
 
-        interval_to_use = int(interval)
+        scheduler = PollScheduler(interval, min_interval=min_interval, max_interval=max_interval,
+                                  adaptive=adaptive)
         last_ok = 'never'
         while True:
-            (stat, messages, last_ok, local_ttl) = self.monitor(host, rr_type, **kwargs)
+            timeouts = self.dns.timeouts
+            (stat, messages, last_ok, local_ttl) = self.monitor(host, rr_type, only_fail=only_fail,
+                                                                stop_on_success=stop_on_success,
+                                                                last_ok=last_ok, **kwargs)
 
             if stop_on_success and stat:
-                print('')
+                self.print('')
                 break
 
-            time.sleep(interval_to_use)
+            if self.output:
+                self.output.flush()
+            self.wait(scheduler.next_interval(local_ttl=local_ttl, timeouts=self.dns.timeouts - timeouts))
 
 #    def monitor(self):
 #        raise Exception("Internal: Not implemented in base class!")
@@ -0,0 +1,100 @@
+import math
+import datetime
+from .monitor import Monitor
+from .pass_result import PassResult
+from ..dns.result import ServerResult, Message
+
+
+class MonitorAuthoritativeChange(Monitor):
+    """
+    Find authoritative DNS for given record.
+    Monitor for its value to change from what every authority and additional DNS answered at start.
+    """
+    DEFAULT_CHANGE_SHARE = 1.0
+
+    def __init__(self, dns, additional_dns=None, change_share=DEFAULT_CHANGE_SHARE):
+        """
+        :param change_share: float, share of servers to change for success, 1.0 for all
+        """
+        super(MonitorAuthoritativeChange, self).__init__(dns, additional_dns=additional_dns)
+
+        self.change_share = change_share
+        # Server name to AnswerSet it answered first
+        self.baselines = {}
+        # Server name to time it was first seen changed
+        self.changed = {}
+
+    def init_monitor(self, host_to_query, rr_type_to_query, verbose=False):
+        self.get_authorities(host_to_query, verbose=verbose)
+
+        server_results = []
+        self.query_authorities(host_to_query, rr_type_to_query, self.dns.query_timeout, server_results,
+                               verbose=verbose)
+        for server_result in server_results:
+            self._set_baseline(server_result)
+        for server, answers in self.baselines.items():
+            self.print("Initial result of %s: %s" % (server, ', '.join(answers)))
+
+    def _set_baseline(self, server_result):
+        """
+        Servers not answering at start get their first answer as baseline.
+        :return: bool, True if baseline was set now
+        """
+        if server_result.error or server_result.label in self.baselines:
+            return False
+        self.baselines[server_result.label] = server_result.answers
+
+        return True
+
+    def compare(self, server_results, now, verbose=False):
+        """
+        :param server_results: list of ServerResult, success of every one is set
+        :param now: formatted time of the pass
+        :return: tuple, number of servers changed and messages
+        """
+        replies = []
+        changes = 0
+        for server_result in server_results:
+            name = "Authority" if server_result.role == ServerResult.ROLE_AUTHORITY else "Additional DNS"
+            if server_result.error or self._set_baseline(server_result):
+                server_result.success = False
+                continue
+
+            baseline = self.baselines[server_result.label]
+            server_result.success = server_result.answers != baseline
+            if not server_result.success:
+                replies.append(Message("%s %s still returning initial result: %s", name, server_result.label, baseline))
+                continue
+
+            changes += 1
+            if server_result.label not in self.changed:
+                self.changed[server_result.label] = now
+                replies.append(Message("%s %s changed! returned: %s, initial %s", name, server_result.label,
+                                       server_result.answers, baseline))
+            elif verbose:
+                self.print("%s %s changed at %s. returned: %s" % (name, server_result.label,
+                                                                  self.changed[server_result.label],
+                                                                  ', '.join(server_result.answers)))
+
+        return changes, replies
+
+    def monitor(self, host, rr_type, timeout=None,
+                only_fail=False, stop_on_success=True, last_ok=None, verbose=False):
+        server_results = []
+        self.query_authorities(host, rr_type, timeout, server_results, verbose=verbose)
+        timestamp = datetime.datetime.now()
+        changes, messages = self.compare(server_results, timestamp.strftime('%Y-%m-%d %H:%M:%S'), verbose=verbose)
+
+        # Interpret the results
+        required = max(1, int(math.ceil(round(self.change_share * len(self.baselines), 6))))
+        success = bool(self.baselines) and changes >= required
+
+        pass_result = PassResult(host, rr_type, success,
+                                 successes=changes, servers_queried=len(self.baselines),
+                                 messages=messages, server_results=server_results, timestamp=timestamp)
+        if success:
+            last_ok = pass_result.now
+        pass_result.last_ok = last_ok
+        self.report(pass_result, only_fail=only_fail, stop_on_success=stop_on_success, verbose=verbose)
+
+        return success, messages, last_ok, None
@@ -1,5 +1,6 @@
-import datetime
 from .monitor import Monitor
+from .pass_result import PassResult
+from ..dns.result import ServerResult
 
 
 class MonitorAuthoritativeCompareLocal(Monitor):
@@ -17,48 +18,42 @@ class MonitorAuthoritativeCompareLocal(Monitor):
         # Do local first
         self.initial_local_answers, local_ttl = self.dns.run_local_query(host_to_query, rr_type_to_query,
                                                                          verbose=verbose)
-        print("Comparing against your local nameserver: %s" % self.dns.default_ns)
+        self.print("Comparing against your local nameserver: %s" % self.dns.default_ns)
 
         self.get_authorities(host_to_query, verbose=verbose)
 
     def monitor(self, host, rr_type, timeout=None,
                 only_fail=False, stop_on_success=True, last_ok=None, verbose=False):
+        server_results = []
 
         # Get local opinion
-        local_answers, local_ttl = self.dns.run_local_query(host, rr_type, verbose)
+        local_answers, local_ttl = self.dns.run_local_query(host, rr_type, results=server_results,
+                                                            verbose=verbose)
 
         # Get remote opinion
-        authority_answers, additional_answers, replies = self.dns.run_query(host, rr_type,
-                                                                            self.additional_dns,
-                                                                            timeout,
-                                                                            verbose=verbose)
+        authority_answers, additional_answers, replies = self.query_authorities(host, rr_type, timeout,
+                                                                                server_results, verbose=verbose)
         # Compare local to remote
         statuses, messages = self.compare_local_and_remote(local_answers,
                                                            authority_answers, additional_answers,
                                                            verbose=verbose)
+        local_failure = self.local_failure(server_results)
+        messages = local_failure + messages
+        for server_result in server_results:
+            if server_result.role != ServerResult.ROLE_LOCAL:
+                server_result.success = statuses.get(server_result.label, False)
 
         # Interpret the results
         servers_queried = len(authority_answers) + len(additional_answers)
         successes = len(list(filter(lambda x: x == True, statuses.values())))
-        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        success = successes == servers_queried
+        success = successes == servers_queried and not local_failure
 
+        pass_result = PassResult(host, rr_type, success,
+                                 successes=successes, servers_queried=servers_queried, local_ttl=local_ttl,
+                                 messages=messages, server_results=server_results)
         if success:
-            last_ok = now
-            output = "%s - queries ok. Local DNS TTL %d seconds" % (now, local_ttl)
-        else:
-            output = "%s - Fail! %d out of %d ok. Local DNS TTL %d seconds. Last ok: %s" % \
-                     (now, successes, servers_queried, local_ttl, last_ok)
+            last_ok = pass_result.now
+        pass_result.last_ok = last_ok
+        self.report(pass_result, only_fail=only_fail, stop_on_success=stop_on_success, verbose=verbose)
 
-        if success:
-            if not only_fail or stop_on_success:
-                print(output, end="\r", flush=True)
-        else:
-            if only_fail:
-                print("\n%s", output, flush=True)
-                if verbose:
-                    print("\n".join(messages), end='')
-            else:
-                print(output, flush=True)
-
-        return success, messages, last_ok, None
+        return success, messages, last_ok, local_ttl
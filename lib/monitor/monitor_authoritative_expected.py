@@ -1,14 +1,20 @@
-import datetime
 from .monitor import Monitor
+from .pass_result import PassResult
+from ..dns.answer_set import AnswerSet
+from ..dns.result import Message
 
 
 class MonitorAuthoritativeExpected(Monitor):
 
-    def __init__(self, dns, additional_dns=None):
+    def __init__(self, dns, expected=None, additional_dns=None):
         super(MonitorAuthoritativeExpected, self).__init__(dns, additional_dns=additional_dns)
-        pass
+
+        self.expected = expected
+        self.expected_answers = None
 
     def init_monitor(self, host_to_query, rr_type_to_query, verbose=False):
+        if self.expected is not None:
+            self.expected_answers = AnswerSet.from_text(rr_type_to_query, self.expected)
         self.get_authorities(host_to_query, verbose=verbose)
 
     def compare(self, expected, authority_answers, additional_answers, verbose=False):
@@ -17,49 +23,45 @@ class MonitorAuthoritativeExpected(Monitor):
         for authority, answer in authority_answers.items():
             if answer != expected:
                 stat = False
-                replies.append("Authority %s not returning expected result! returned: %s, expected %s" %
-                               (authority, ', '.join(answer), ', '.join(expected))
-                               )
+                replies.append(Message("Authority %s not returning expected result! returned: %s, expected %s",
+                                       authority, answer, expected))
             elif verbose:
-                print("Authority %s ok. returned: %s" % (authority, ', '.join(answer)))
-        if self.dns.authorities and not authority_answers:
-            replies.append("No authority answers received!")
+                self.print("Authority %s ok. returned: %s" % (authority, ', '.join(answer)))
+        if self.authorities and not authority_answers:
+            replies.append(Message("No authority answers received!"))
             stat = False
         for additional_server, answer in additional_answers.items():
             if answer != expected:
                 stat = False
-                replies.append("Additional DNS %s fail! returned: %s" % (additional_server, ', '.join(answer)))
+                replies.append(Message("Additional DNS %s fail! returned: %s", additional_server, answer))
             elif verbose:
-                print("Additional DNS %s ok. returned: %s" % (additional_server, ', '.join(answer)))
+                self.print("Additional DNS %s ok. returned: %s" % (additional_server, ', '.join(answer)))
 
         return stat, replies
 
     def monitor(self, host, rr_type, expected=None,
                 timeout=None,
                 only_fail=False, stop_on_success=True, last_ok=None, verbose=False):
-        if not isinstance(expected, list):
-            expected = [expected]
+        if expected is None:
+            expected = self.expected_answers
+        elif not isinstance(expected, AnswerSet):
+            expected = AnswerSet.from_text(rr_type, expected)
 
-        authority_answers, additional_answers, replies = self.dns.run_query(host, rr_type,
-                                                                            self.additional_dns,
-                                                                            timeout,
-                                                                            verbose=verbose)
+        server_results = []
+        authority_answers, additional_answers, replies = self.query_authorities(host, rr_type, timeout,
+                                                                                server_results, verbose=verbose)
         stat, messages = self.compare(expected, authority_answers, additional_answers,
                                       verbose=verbose)
-        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        if only_fail:
-            if stat:
-                last_ok = now
-                if stop_on_success:
-                    print("%s - queries ok.                               " % now, end="\r", flush=True)
-            else:
-                print("%s - Fail! Last ok: %s" % (now, last_ok), flush=True)
-        else:
-            if stat:
-                print("%s - queries ok.                                                 " %
-                      (now), end="\r", flush=True)
-            else:
-                print("\n%s - Fail! Last ok: %s" % (now, last_ok), flush=True)
-                print("\n".join(messages), end='')
+        for server_result in server_results:
+            server_result.success = not server_result.error and server_result.answers == expected
+
+        pass_result = PassResult(host, rr_type, stat,
+                                 successes=len([result for result in server_results if result.success]),
+                                 servers_queried=len(server_results),
+                                 messages=messages, server_results=server_results)
+        if stat:
+            last_ok = pass_result.now
+        pass_result.last_ok = last_ok
+        self.report(pass_result, only_fail=only_fail, stop_on_success=stop_on_success, verbose=verbose)
 
         return stat, messages, last_ok, None
@@ -0,0 +1,181 @@
+import time
+from .monitor import Monitor
+from .pass_result import PassResult
+from ..dns.result import Message
+from ..dns.dnssec import KeyValidator, split_signed
+
+
+class MonitorDnssecRollover(Monitor):
+    """
+    Find authorities of a zone and of its parent.
+    Monitor a KSK or ZSK rollover: DS at every parent authority must match a DNSKEY at every child authority,
+    DNSKEY-set must be signed by such a key and SOA by a key of the zone, with signatures in their validity window.
+    With a key tag, wait for that key to be in use: DS at parent and signing DNSKEY-set for a KSK,
+    signing SOA for a ZSK.
+    DS, DNSKEY and SOA are asked from all authorities at once. Signature of DS by the parent is not checked.
+    """
+    # Signatures expiring sooner than this are failures
+    DEFAULT_EXPIRY_MARGIN = 3600
+
+    def __init__(self, dns, key_tag=None, expiry_margin=DEFAULT_EXPIRY_MARGIN):
+        """
+        :param key_tag: int, key to wait for. None to wait for a valid chain only.
+        :param expiry_margin: seconds
+        """
+        super(MonitorDnssecRollover, self).__init__(dns)
+
+        self.key_tag = key_tag
+        self.expiry_margin = expiry_margin
+        self.parent_authorities = {}
+        # Valid signatures are remembered by key tag between passes
+        self.validator = KeyValidator()
+
+    def init_monitor(self, host_to_query, rr_type_to_query, verbose=False):
+        self.get_authorities(host_to_query, verbose=verbose)
+        child_authorities = self.authorities
+        zone = self.zone
+        self.get_parents_of_authority(zone, verbose=verbose)
+        self.parent_authorities = self.authorities
+        self.authorities = child_authorities
+        self.zone = zone
+        if self.key_tag is not None:
+            self.print("Waiting for key %d to be in use in %s" % (self.key_tag, zone))
+
+    def query(self, timeout, verbose=False):
+        """
+        :return: tuple, (answers, ServerResults, messages) of DS at parent, DNSKEY at child and SOA at child
+        """
+        return self.dns.run_queries([(self.zone, 'DS', self.parent_authorities),
+                                     (self.zone, 'DNSKEY', self.authorities),
+                                     (self.zone, 'SOA', self.authorities)],
+                                    timeout, want_dnssec=True, verbose=verbose)
+
+    def check_child(self, authority, dnskey_answers, soa_answers, ds_rdatas, now):
+        """
+        :param dnskey_answers: AnswerSet of DNSKEY with RRSIGs
+        :param soa_answers: AnswerSet of SOA with RRSIGs, None if authority didn't answer it
+        :param ds_rdatas: list of DS rdata of all parent authorities
+        :return: tuple, list of DNSKEY rdata and messages of failures
+        """
+        dnskeys, dnskey_rrsigs = split_signed(dnskey_answers, 'DNSKEY')
+        if not dnskeys:
+            return dnskeys, [Message("Authority %s has no DNSKEY for %s", authority, self.zone)]
+
+        messages = []
+        entry_tags = set(KeyValidator.key_tag(dnskey) for dnskey in dnskeys
+                         if any(self.validator.ds_match(self.zone, ds, dnskey) for ds in ds_rdatas))
+        if not entry_tags:
+            messages.append(Message("Authority %s has no DNSKEY matching DS at parent. DS: %s, DNSKEY: %s",
+                                    authority, _tags(ds.key_tag for ds in ds_rdatas),
+                                    _tags(KeyValidator.key_tag(dnskey) for dnskey in dnskeys)))
+        dnskey_signers, errors = self.validator.signed_by(self.zone, dnskeys, dnskey_rrsigs, dnskeys, now,
+                                                          margin=self.expiry_margin)
+        if entry_tags and not entry_tags & dnskey_signers:
+            messages.append(Message("Authority %s: DNSKEY not signed by a key DS points to: %s", authority,
+                                    '; '.join(errors) or "no signatures"))
+
+        soa_signers = set()
+        if soa_answers is None:
+            messages.append(Message("Authority %s: no SOA received", authority))
+        else:
+            soa, soa_rrsigs = split_signed(soa_answers, 'SOA')
+            soa_signers, errors = self.validator.signed_by(self.zone, soa, soa_rrsigs, dnskeys, now,
+                                                           margin=self.expiry_margin)
+            if not soa_signers:
+                messages.append(Message("Authority %s: SOA not signed by a key of the zone: %s", authority,
+                                        '; '.join(errors) or "no signatures"))
+
+        if self.key_tag is not None:
+            key = [dnskey for dnskey in dnskeys if KeyValidator.key_tag(dnskey) == self.key_tag]
+            if not key:
+                messages.append(Message("Authority %s: key %d not published yet", authority, self.key_tag))
+            elif KeyValidator.is_ksk(key[0]) and self.key_tag not in dnskey_signers:
+                messages.append(Message("Authority %s: key %d not signing DNSKEY yet", authority, self.key_tag))
+            elif not KeyValidator.is_ksk(key[0]) and self.key_tag not in soa_signers:
+                messages.append(Message("Authority %s: key %d not signing SOA yet", authority, self.key_tag))
+
+        return dnskeys, messages
+
+    def check_parent(self, authority, ds_answers, child_dnskeys):
+        """
+        :param ds_answers: AnswerSet of DS
+        :param child_dnskeys: list of lists of DNSKEY rdata, one list per child authority
+        :return: list of messages of failures
+        """
+        ds_rdatas, _ = split_signed(ds_answers, 'DS')
+        if not ds_rdatas:
+            return [Message("Parent authority %s has no DS for %s", authority, self.zone)]
+
+        messages = []
+        # Some DS has to point to a key every child authority has
+        if child_dnskeys and not any(all(any(self.validator.ds_match(self.zone, ds, dnskey) for dnskey in dnskeys)
+                                         for dnskeys in child_dnskeys)
+                                     for ds in ds_rdatas):
+            messages.append(Message("Parent authority %s: DS %s match no DNSKEY at every authority of %s",
+                                    authority, _tags(ds.key_tag for ds in ds_rdatas), self.zone))
+        if self.key_tag is not None:
+            ksk = any(KeyValidator.key_tag(dnskey) == self.key_tag and KeyValidator.is_ksk(dnskey)
+                      for dnskeys in child_dnskeys for dnskey in dnskeys)
+            if ksk and self.key_tag not in [ds.key_tag for ds in ds_rdatas]:
+                messages.append(Message("Parent authority %s: no DS for key %d yet", authority, self.key_tag))
+
+        return messages
+
+    def monitor(self, host, rr_type, timeout=None,
+                only_fail=False, stop_on_success=True, last_ok=None, verbose=False):
+        ds_query, dnskey_query, soa_query = self.query(timeout, verbose=verbose)
+        ds_answers, ds_results, ds_replies = ds_query
+        dnskey_answers, dnskey_results, dnskey_replies = dnskey_query
+        soa_answers, soa_results, soa_replies = soa_query
+        now = time.time()
+        messages = ds_replies + dnskey_replies + soa_replies
+        if not ds_answers:
+            messages.append(Message("No parent authority answers received!"))
+        if not dnskey_answers:
+            messages.append(Message("No authority answers received!"))
+
+        statuses = {}
+        ds_rdatas = [ds for answers in ds_answers.values() for ds in split_signed(answers, 'DS')[0]]
+        child_dnskeys = []
+        for authority, answers in dnskey_answers.items():
+            dnskeys, failures = self.check_child(authority, answers, soa_answers.get(authority), ds_rdatas, now)
+            child_dnskeys.append(dnskeys)
+            statuses[authority] = not failures
+            messages.extend(failures)
+            if verbose and not failures:
+                self.print("Authority %s ok. DNSKEY: %s" % (authority, ', '.join(
+                    "%d %s" % (KeyValidator.key_tag(dnskey), 'KSK' if KeyValidator.is_ksk(dnskey) else 'ZSK')
+                    for dnskey in dnskeys)))
+        for authority, answers in ds_answers.items():
+            failures = self.check_parent(authority, answers, child_dnskeys)
+            statuses['parent ' + authority] = not failures
+            messages.extend(failures)
+            if verbose and not failures:
+                self.print("Parent authority %s ok. DS: %s" % (
+                    authority, _tags(ds.key_tag for ds in split_signed(answers, 'DS')[0])))
+        if not self.validator.crypto_available:
+            messages.insert(0, Message("Cannot check DNSSEC: %s", KeyValidator.NO_CRYPTO))
+
+        for server_result in ds_results:
+            server_result.success = statuses.get('parent ' + server_result.label, False)
+        for server_result in dnskey_results + soa_results:
+            server_result.success = statuses.get(server_result.label, False)
+
+        # Interpret the results
+        servers_queried = len(statuses)
+        successes = list(statuses.values()).count(True)
+        success = bool(ds_answers) and bool(dnskey_answers) and successes == servers_queried
+
+        pass_result = PassResult(host, rr_type, success,
+                                 successes=successes, servers_queried=servers_queried,
+                                 messages=messages, server_results=ds_results + dnskey_results + soa_results)
+        if success:
+            last_ok = pass_result.now
+        pass_result.last_ok = last_ok
+        self.report(pass_result, only_fail=only_fail, stop_on_success=stop_on_success, verbose=verbose)
+
+        return success, messages, last_ok, None
+
+
+def _tags(key_tags):
+    return ', '.join(str(key_tag) for key_tag in sorted(set(key_tags))) or '-'
@@ -1,6 +1,6 @@
-import sys
-import datetime
 from .monitor_local_expected import MonitorLocalExpected
+from ..dns.answer_set import AnswerSet
+from ..dns.result import Message
 
 
 class MonitorLocalChange(MonitorLocalExpected):
@@ -10,23 +10,19 @@ class MonitorLocalChange(MonitorLocalExpected):
 
     def init_monitor(self, host_to_query, rr_type_to_query, verbose=False):
         initial_result = self.local_query(host_to_query, rr_type_to_query)
-        # self.expected = list(map(lambda x: str(x), initial_result))
-        self.expected = str(initial_result[0])
+        self.expected_answers = AnswerSet.from_rrsets(initial_result.response.answer)
 
-    def monitor(self, host, rr_type,
-                timeout=None,
-                only_fail=False, stop_on_success=True, last_ok=None, verbose=False):
-        # Don't bring anything own here.
-        # Just call the parent's method with alternate host and RR-type
-        success, messages, last_ok, local_ttl = super(MonitorLocalChange, self).monitor(host, rr_type,
-                                                                                        timeout=timeout,
-                                                                                        only_fail=only_fail,
-                                                                                        stop_on_success=stop_on_success,
-                                                                                        last_ok=last_ok,
-                                                                                        verbose=verbose)
+    def compare(self, local_answers, verbose=False):
+        if not local_answers:
+            # Failed query isn't a change
+            return False, [Message("No local answers received!")]
+        stat, replies = super(MonitorLocalChange, self).compare(local_answers, verbose=False)
 
         # This is our twist: If value matches the expected, that's a fail!
         # We wait the value to CHANGE from initial.
-        success = not success
+        if stat:
+            return False, [Message("Local still returning initial result: %s", local_answers)]
+        if verbose:
+            self.print("Local changed. returned: %s" % ', '.join(local_answers))
 
-        return success, messages, last_ok, local_ttl
+        return True, []
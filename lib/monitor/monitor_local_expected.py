@@ -1,6 +1,7 @@
-import sys
-import datetime
 from .monitor import Monitor
+from .pass_result import PassResult
+from ..dns.answer_set import AnswerSet
+from ..dns.result import Message
 
 
 class MonitorLocalExpected(Monitor):
@@ -9,21 +10,23 @@ class MonitorLocalExpected(Monitor):
         super(MonitorLocalExpected, self).__init__(dns, additional_dns=None)
 
         self.expected = expected
+        self.expected_answers = None
         #print("Resolver: %s" % dns.default_resolver.nameservers)
 
+    def init_monitor(self, host_to_query, rr_type_to_query, verbose=False):
+        self.expected_answers = AnswerSet.from_text(rr_type_to_query, self.expected)
+
     def compare(self, local_answers, verbose=False):
         replies = []
         stat = True
-        for answer in local_answers:
-            if answer != self.expected:
-                stat = False
-                replies.append("Local not returning expected result! returned: %s, expected %s" %
-                               (', '.join(answer), ', '.join(self.expected))
-                               )
-            elif verbose:
-                print("Local ok. returned: %s" % answer)
+        if local_answers != self.expected_answers:
+            stat = False
+            replies.append(Message("Local not returning expected result! returned: %s, expected %s",
+                                   local_answers, self.expected_answers))
+        elif verbose:
+            self.print("Local ok. returned: %s" % ', '.join(local_answers))
         if not local_answers:
-            replies.append("No local answers received!")
+            replies.append(Message("No local answers received!"))
             stat = False
 
         return stat, replies
@@ -31,27 +34,22 @@ class MonitorLocalExpected(Monitor):
     def monitor(self, host, rr_type,
                 timeout=None,
                 only_fail=False, stop_on_success=True, last_ok=None, verbose=False):
-        answers, local_ttl = self.dns.run_local_query(host, rr_type,
+        server_results = []
+        answers, local_ttl = self.dns.run_local_query(host, rr_type, results=server_results,
                                                        verbose=verbose)
         success, messages = self.compare(answers, verbose=verbose)
-        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
+        failures = self.local_failure(server_results)
+        if failures:
+            success = False
+        messages = failures + messages
+        for server_result in server_results:
+            server_result.success = success
+
+        pass_result = PassResult(host, rr_type, success, local_ttl=local_ttl,
+                                 messages=messages, server_results=server_results)
         if success:
-            last_ok = now
-            output = "%s - queries ok. Local DNS TTL %d seconds" % (now, local_ttl)
-        else:
-            output = "%s - Fail! Local DNS TTL %d seconds. Last ok: %s" % \
-                     (now, local_ttl, last_ok)
+            last_ok = pass_result.now
+        pass_result.last_ok = last_ok
+        self.report(pass_result, only_fail=only_fail, stop_on_success=stop_on_success, verbose=verbose)
 
-        if success:
-            if not only_fail or stop_on_success:
-                print(output, end="\r", flush=True)
-        else:
-            if only_fail:
-                print("\n%s", output, flush=True)
-                if verbose:
-                    print("\n".join(messages), end='')
-            else:
-                print(output, flush=True)
-
-        return success, messages, last_ok, local_ttl
\ No newline at end of file
+        return success, messages, last_ok, local_ttl
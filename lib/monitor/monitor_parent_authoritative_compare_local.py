@@ -18,6 +18,6 @@ class MonitorParentAuthoritativeCompareLocal(MonitorAuthoritativeCompareLocal):
         # Do local first
         self.initial_local_answers, local_ttl = self.dns.run_local_query(host_to_query, rr_type_to_query,
                                                                          verbose=verbose)
-        print("Comparing against your local nameserver: %s" % self.dns.default_ns)
+        self.print("Comparing against your local nameserver: %s" % self.dns.default_ns)
 
         self.get_parents_of_authority(host_to_query, verbose=verbose)
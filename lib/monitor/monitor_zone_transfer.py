@@ -0,0 +1,114 @@
+import dns.rdatatype
+from .monitor import Monitor
+from .pass_result import PassResult
+from ..dns.answer_set import AnswerSet
+from ..dns.result import Message
+from ..dns.zone_transfer import ZoneTransfer, ZoneFile, ZoneDiff
+
+
+class MonitorZoneTransfer(Monitor):
+    """
+    Find authorities of a zone.
+    Transfer the zone from first address of every authority and monitor for the copies to be the same,
+    or same as an expected zone file. One transfer per server replaces a query per record per server.
+    With a serial, changes since it are transferred with IXFR and compared instead.
+    Servers refusing the transfer fail.
+    """
+    # Differences listed per server, rest are counted only
+    DEFAULT_MAX_LISTED = 20
+
+    def __init__(self, dns, expected_zone_file=None, serial=None, max_listed=DEFAULT_MAX_LISTED):
+        """
+        :param expected_zone_file: path of a zone file to compare copies to. None to compare them to each other.
+        :param serial: int, transfer changes since this serial only
+        :param max_listed: int, differences listed per server
+        """
+        super(MonitorZoneTransfer, self).__init__(dns)
+
+        self.expected_zone_file = expected_zone_file
+        self.expected = None
+        self.serial = serial
+        self.max_listed = max_listed
+
+    def init_monitor(self, host_to_query, rr_type_to_query, verbose=False):
+        self.get_authorities(host_to_query, verbose=verbose)
+        if self.expected_zone_file:
+            self.expected = ZoneFile(self.zone, self.expected_zone_file)
+            self.print("Comparing against zone file %s" % self.expected_zone_file)
+
+    def describe(self, server, differences, reference):
+        """
+        :param server: name of the server compared
+        :param differences: dict, (name, RR-type) to number of records more in reference
+        :param reference: name of what server was compared to
+        :return: list of messages, one per name and RR-type differing
+        """
+        messages = []
+        for (name, rdtype), count in sorted(differences.items())[:self.max_listed]:
+            if count > 0:
+                difference = "%d records missing" % count
+            elif count < 0:
+                difference = "%d records extra" % -count
+            else:
+                difference = "records differ"
+            messages.append(Message("%s %s: %s at %s compared to %s", name, dns.rdatatype.to_text(rdtype),
+                                    difference, server, reference))
+        if len(differences) > self.max_listed:
+            messages.append(Message("%s: %d more differences", server, len(differences) - self.max_listed))
+
+        return messages
+
+    def monitor(self, host, rr_type, timeout=None,
+                only_fail=False, stop_on_success=True, last_ok=None, verbose=False):
+        transfers = [ZoneTransfer(self.zone, authority, addresses[0], serial=self.serial, timeout=timeout)
+                     for authority, addresses in self.authorities.items()]
+        if verbose:
+            self.print("DEBUG: Transferring %s from %s" % (self.zone, ', '.join(
+                transfer.result.server for transfer in transfers)))
+        zone_diff = ZoneDiff(([self.expected] if self.expected else []) + transfers)
+        differences = zone_diff.run()
+        reference = zone_diff.reference
+        reference_failed = False
+        if reference is self.expected:
+            reference_name = self.expected_zone_file
+        else:
+            reference_name = reference.result.server if reference else None
+            reference_failed = reference is not None and reference.result.error
+
+        messages = []
+        if reference_failed:
+            messages.append(Message("Transfer from %s broke off, cannot compare to it", reference_name))
+        server_results = []
+        for transfer in transfers:
+            server_result = transfer.result
+            server_results.append(server_result)
+            if transfer.soa is not None:
+                server_result.answers = AnswerSet([transfer.soa]).shared()
+                server_result.rcode = 'NOERROR'
+            if server_result.error:
+                server_result.success = False
+                messages.append(Message("Transfer from %s failed: %s", server_result.server, server_result.error))
+                continue
+            if transfer is reference:
+                server_result.success = True
+            else:
+                server_result.success = not reference_failed and not differences[transfer]
+                messages.extend(self.describe(server_result.server, differences[transfer], reference_name))
+            if verbose and server_result.success:
+                self.print("Authority %s ok. serial %d, %d records in %.1f s" % (
+                    server_result.server, transfer.soa.serial, transfer.records, server_result.latency))
+
+        # Interpret the results
+        servers_queried = len(transfers)
+        successes = [server_result.success for server_result in server_results].count(True)
+        success = servers_queried > 0 and successes == servers_queried
+
+        pass_result = PassResult(host, 'AXFR' if self.serial is None else 'IXFR', success,
+                                 successes=successes, servers_queried=servers_queried,
+                                 messages=messages, server_results=server_results)
+        if success:
+            last_ok = pass_result.now
+        pass_result.last_ok = last_ok
+        self.report(pass_result, only_fail=only_fail, stop_on_success=stop_on_success, verbose=verbose)
+
+        return success, messages, last_ok, None
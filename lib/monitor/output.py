@@ -0,0 +1,180 @@
+import sys
+import json
+import time
+import atexit
+import threading
+
+
+class ConsoleOutput:
+    """
+    Human-readable output of monitoring passes.
+    Successful passes overwrite each other on a single line.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.line_length = 0
+
+    def _print(self, *args, **kwargs):
+        print(*args, file=self.stream, **kwargs)
+
+    def report(self, pass_result, only_fail=False, stop_on_success=True, verbose=False):
+        """
+        Output a pass of single record monitoring.
+        :param pass_result: PassResult
+        :param only_fail: keep output terse, print only failures
+        :param stop_on_success: monitoring will stop on success
+        :param verbose:
+        :return:
+        """
+        if pass_result.success:
+            output = "%s - queries ok." % pass_result.now
+            if pass_result.local_ttl is not None:
+                output += " Local DNS TTL %d seconds" % pass_result.local_ttl
+            if not only_fail or stop_on_success:
+                # Pad to wipe out leftovers of previous line
+                self._print(output.ljust(self.line_length), end="\r", flush=True)
+                self.line_length = len(output)
+            return
+
+        output = "%s - Fail!" % pass_result.now
+        if pass_result.successes is not None:
+            output += " %d out of %d ok (%.1f%% propagated)." % (pass_result.successes, pass_result.servers_queried,
+                                                                  pass_result.propagated)
+        if pass_result.local_ttl is not None:
+            output += " Local DNS TTL %d seconds." % pass_result.local_ttl
+        output += " Last ok: %s" % pass_result.last_ok
+        if only_fail:
+            self._print("\n%s" % output, flush=True)
+        else:
+            self._print(output.ljust(self.line_length), flush=True)
+        self.line_length = 0
+        if pass_result.messages and (verbose or not only_fail):
+            self._print("\n".join(str(message) for message in pass_result.messages), flush=True)
+
+    def report_record(self, pass_result, only_fail=False, verbose=False):
+        """
+        Output a pass of a record among many being monitored.
+        :param pass_result: PassResult
+        :param only_fail: keep output terse, print only failures
+        :param verbose:
+        :return:
+        """
+        record = "%s %s" % (pass_result.host, pass_result.rr_type)
+        if pass_result.success:
+            if not only_fail:
+                self._print("%s - %s: ok" % (pass_result.now, record))
+        else:
+            output = "%s - %s: Fail!" % (pass_result.now, record)
+            if pass_result.successes is not None:
+                output += " %.1f%% propagated." % pass_result.propagated
+            self._print("%s Last ok: %s" % (output, pass_result.last_ok))
+            if verbose and pass_result.messages:
+                self._print("\n".join(str(message) for message in pass_result.messages))
+
+    def summary(self, successes, records):
+        self._print("%d out of %d records ok" % (successes, records), flush=True)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonLinesOutput:
+    """
+    Machine-readable output of monitoring passes.
+    One compact JSON-object per server per pass. Lines are buffered and written in batches.
+    """
+    DEFAULT_BATCH_SIZE = 500
+    DEFAULT_FLUSH_INTERVAL = 1.0
+
+    def __init__(self, output_file, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        :param output_file: filename to write to, - for stdout
+        :param batch_size: write after this many lines are buffered
+        :param flush_interval: seconds, write at least this often
+        """
+        if output_file == '-':
+            self.stream = sys.stdout
+        else:
+            self.stream = open(output_file, 'a')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        # Buffered lines must not get lost on exit
+        atexit.register(self.close)
+
+    def report(self, pass_result, **kwargs):
+        timestamp = pass_result.timestamp.isoformat()
+        lines = []
+        for server_result in pass_result.server_results:
+            line = server_result.to_dict()
+            line['time'] = timestamp
+            line['host'] = pass_result.host
+            line['rr_type'] = pass_result.rr_type
+            lines.append(json.dumps(line, separators=(',', ':')))
+
+        with self.lock:
+            self.buffer.extend(lines)
+            if len(self.buffer) < self.batch_size and time.monotonic() - self.last_flush < self.flush_interval:
+                return
+            self._flush()
+
+    def report_record(self, pass_result, **kwargs):
+        self.report(pass_result)
+
+    def summary(self, successes, records):
+        pass
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.buffer.append('')
+            self.stream.write('\n'.join(self.buffer))
+            self.buffer = []
+        self.stream.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.stream.closed:
+            return
+        self.flush()
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+class TeeOutput:
+    """
+    Send results of passes to multiple outputs.
+    """
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def report(self, pass_result, **kwargs):
+        for output in self.outputs:
+            output.report(pass_result, **kwargs)
+
+    def report_record(self, pass_result, **kwargs):
+        for output in self.outputs:
+            output.report_record(pass_result, **kwargs)
+
+    def summary(self, successes, records):
+        for output in self.outputs:
+            output.summary(successes, records)
+
+    def flush(self):
+        for output in self.outputs:
+            output.flush()
+
+    def close(self):
+        for output in self.outputs:
+            output.close()
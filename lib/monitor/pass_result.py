@@ -0,0 +1,51 @@
+import datetime
+
+
+class PassResult:
+    """
+    Outcome of one monitoring pass of a single record.
+    Outputs render these.
+    """
+    __slots__ = ('host', 'rr_type', 'timestamp', 'success', 'successes', 'servers_queried',
+                 'local_ttl', 'last_ok', 'messages', 'server_results')
+
+    def __init__(self, host, rr_type, success, successes=None, servers_queried=None, local_ttl=None,
+                 last_ok=None, messages=None, server_results=None, timestamp=None):
+        """
+        :param host: hostname queried
+        :param rr_type: DNS RR-type queried
+        :param success: bool, did this pass reach success condition of the mode
+        :param successes: int, number of servers ok. None if mode doesn't count servers.
+        :param servers_queried: int, number of servers answering
+        :param local_ttl: int, TTL of local DNS answer. None if not known.
+        :param last_ok: formatted time of last successful pass
+        :param messages: list of failure messages, str or Message
+        :param server_results: list of ServerResult
+        :param timestamp: datetime of the pass. Default is now.
+        """
+        self.host = host
+        self.rr_type = rr_type
+        self.timestamp = timestamp or datetime.datetime.now()
+        self.success = success
+        self.successes = successes
+        self.servers_queried = servers_queried
+        self.local_ttl = local_ttl
+        self.last_ok = last_ok
+        self.messages = messages or []
+        self.server_results = server_results or []
+
+    @property
+    def now(self):
+        return self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+
+    @property
+    def propagated(self):
+        """
+        :return: float, percentage of servers queried being ok. None if mode doesn't count servers.
+        """
+        if self.successes is None:
+            return None
+        if not self.servers_queried:
+            return 0.0
+
+        return 100.0 * self.successes / self.servers_queried
@@ -0,0 +1,52 @@
+import random
+
+
+class PollScheduler:
+    """
+    Decide how long to wait between passes of continuous monitoring.
+    Nothing can change in local DNS until its cached TTL runs out. While it is counting down,
+    poll rarely and speed up as the expiry gets close, down to min_interval. Without a TTL, poll every interval.
+    When servers time out, back off exponentially with jitter.
+    """
+    DEFAULT_MAX_INTERVAL = 900
+    MAX_BACKOFF_STEPS = 16
+
+    def __init__(self, interval, min_interval=None, max_interval=None, adaptive=True):
+        """
+        :param interval: seconds, base interval between passes
+        :param min_interval: seconds, never wait less than this, eg. close to expiry of TTL. Default is interval.
+        :param max_interval: seconds, never wait more than this. Default is DEFAULT_MAX_INTERVAL.
+        :param adaptive: bool, False will use fixed interval
+        """
+        self.interval = float(interval)
+        self.min_interval = float(min_interval) if min_interval is not None else self.interval
+        if max_interval is not None:
+            self.max_interval = float(max_interval)
+        else:
+            self.max_interval = max(self.interval, self.DEFAULT_MAX_INTERVAL)
+        self.adaptive = adaptive
+        self.failed_passes = 0
+
+    def next_interval(self, local_ttl=None, timeouts=0):
+        """
+        :param local_ttl: seconds, TTL of the answer cached in local DNS. None if not known.
+        :param timeouts: int, number of queries timed out during last pass
+        :return: float, seconds to wait until next pass
+        """
+        if not self.adaptive:
+            return self.interval
+
+        interval = self.interval
+        if local_ttl:
+            # Wait for half of remaining TTL. Closer to expiry, the shorter the wait.
+            interval = local_ttl / 2
+
+        if timeouts:
+            self.failed_passes = min(self.failed_passes + 1, self.MAX_BACKOFF_STEPS)
+            # Exponential backoff with equal jitter
+            backoff = min(self.interval * 2 ** self.failed_passes, self.max_interval)
+            interval = max(interval, backoff / 2 + random.uniform(0, backoff / 2))
+        else:
+            self.failed_passes = 0
+
+        return min(max(interval, self.min_interval), self.max_interval)
@@ -0,0 +1,249 @@
+import sys
+import zlib
+import queue
+import signal
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from .monitor import Monitor
+from .watchlist import Watchlist
+from .output import ConsoleOutput
+from ..dns.errors import DNSMonitorError
+
+
+class QueueOutput:
+    """
+    Send results of a worker process to the coordinator.
+    Pass results are pickled, answers go as text and digest only.
+    """
+    RECORD = 'record'
+    PASS = 'pass'
+    ERROR = 'error'
+    DONE = 'done'
+
+    def __init__(self, results_queue, shard):
+        self.results_queue = results_queue
+        self.shard = shard
+
+    def put(self, kind, payload=None):
+        self.results_queue.put((kind, self.shard, payload))
+
+    def report(self, pass_result, **kwargs):
+        self.put(self.RECORD, pass_result)
+
+    def report_record(self, pass_result, **kwargs):
+        self.put(self.RECORD, pass_result)
+
+    def summary(self, successes, records):
+        self.put(self.PASS)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _run_shard(shard, workers, records, dns_factory, monitor_factory, zone_cuts, results_queue,
+               max_parallel_records, single_pass, kwargs):
+    """
+    Worker process: monitor records of one shard with a DNS of its own.
+    Zone cuts found by the coordinator are not looked up again.
+    """
+    # Coordinator decides when to quit
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    output = QueueOutput(results_queue, shard)
+    try:
+        dns = dns_factory(workers)
+        # Coordinator keeps the cache file, workers only read it
+        dns.delegation_cache.cache_file = None
+        dns.delegation_cache.merge(zone_cuts)
+        watchlist = Watchlist(dns, functools.partial(monitor_factory, dns), records,
+                              max_parallel_records=max_parallel_records, output=output)
+        watchlist.quiet = True
+        watchlist.handle_signals = False
+        watchlist.init_monitor(verbose=kwargs.get('verbose', False))
+        if single_pass:
+            watchlist.single_pass(**kwargs)
+        else:
+            watchlist.continuous(**kwargs)
+    except Exception as exc:
+        output.put(QueueOutput.ERROR, "%s: %s" % (exc.__class__.__name__, exc))
+    finally:
+        output.put(QueueOutput.DONE)
+
+
+class ShardedWatchlist:
+    """
+    Monitor a large watchlist in multiple worker processes.
+    Coordinator looks up zone cuts of the records and splits records into shards by their zone.
+    Records of a zone land in the same shard and are monitored by one worker only.
+    Every worker has a DNS and a Watchlist of its own and streams results of its passes to
+    the coordinator. Coordinator does all output and keeps the overall status of records.
+    """
+
+    def __init__(self, dns_factory, monitor_factory, records, processes, max_parallel_records=16, output=None,
+                 dns=None):
+        """
+        :param dns_factory: callable, returns a new DNS for given number of workers sharing the rate limits.
+                            Called in each worker process, must be picklable.
+        :param monitor_factory: callable, returns a new Monitor for given DNS and expected value. Must be picklable.
+        :param records: list of WatchlistRecord
+        :param processes: number of worker processes
+        :param max_parallel_records: max number of records to monitor at once in each worker
+        :param output: where results of passes go. Default is console.
+        :param dns: DNS of the coordinator to look up zone cuts with. None to split by last two labels only.
+        """
+        self.dns = dns
+        self.dns_factory = dns_factory
+        self.monitor_factory = monitor_factory
+        self.records = records
+        self.processes = processes
+        self.max_parallel_records = max_parallel_records
+        self.output = output or ConsoleOutput()
+        self.quiet = False
+        # Latest success of each record, as reported by the workers
+        self.status = {}
+        # Zone cut of each host, found by init_monitor()
+        self.zones = {}
+
+    def init_monitor(self, verbose=False):
+        """
+        Look up zone cuts of all records at once, before starting workers.
+        Hosts whose zone can't be found are split by their last two labels.
+        Cache file is written once, after all lookups.
+        """
+        if not self.dns:
+            return
+        delegation_cache = self.dns.delegation_cache
+        hosts = sorted(set(record.host for record in self.records))
+        delegation_cache.autosave = False
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_parallel_records) as executor:
+                lookups = [(host, executor.submit(self.dns.find_zone_authorities, host, verbose=verbose))
+                           for host in hosts]
+        finally:
+            delegation_cache.autosave = True
+        if delegation_cache.cache_file:
+            delegation_cache.save()
+        for host, lookup in lookups:
+            try:
+                lookup.result()
+            except DNSMonitorError as exc:
+                if verbose:
+                    print("DEBUG: No zone for %s: %s" % (host, exc))
+                continue
+            # Closest cut of the host among all found
+            self.zones[host] = self.dns.zone_of(host)
+
+        if not self.quiet:
+            print("Watching %d records in %d zones" % (len(self.records), len(set(self.zones.values()))))
+
+    def domain_of(self, host):
+        """
+        :param host: hostname
+        :return: str, zone cut of the host. Last two labels if not known.
+        """
+        zone = self.zones.get(host)
+        if zone:
+            return zone.lower()
+
+        return '.'.join(host.lower().rstrip('.').split('.')[-2:]) + '.'
+
+    @staticmethod
+    def shard_of(domain, shards):
+        """
+        :param domain: zone, FQDN
+        :param shards: number of shards
+        :return: int, shard of the zone
+        """
+        # Stable across processes and runs, unlike hash()
+        return zlib.crc32(domain.encode('utf-8')) % shards
+
+    def shards(self):
+        """
+        :return: list of non-empty lists of WatchlistRecord
+        """
+        shards = [[] for _ in range(self.processes)]
+        for record in self.records:
+            shards[self.shard_of(self.domain_of(record.host), self.processes)].append(record)
+
+        return [shard for shard in shards if shard]
+
+    def single_pass(self, timeout=None, verbose=False):
+        return self._run(True, only_fail=False, verbose=verbose, kwargs={'timeout': timeout, 'verbose': verbose})
+
+    def continuous(self, only_fail=False, verbose=False, **kwargs):
+        kwargs.update(only_fail=only_fail, verbose=verbose)
+
+        return self._run(False, only_fail=only_fail, verbose=verbose, kwargs=kwargs)
+
+    def _run(self, single_pass, only_fail, verbose, kwargs):
+        """
+        Start workers and handle their results until all of them are done.
+        :return: bool, True if all records were ok on their last pass
+        """
+        signal.signal(signal.SIGINT, Monitor.exit_gracefully)
+        signal.signal(signal.SIGTERM, Monitor.exit_gracefully)
+        results_queue = multiprocessing.Queue()
+        shards = self.shards()
+        zone_cuts = self.dns.delegation_cache.entries() if self.dns else {}
+        workers = [multiprocessing.Process(target=_run_shard,
+                                           args=(shard, len(shards), records, self.dns_factory,
+                                                 self.monitor_factory, zone_cuts, results_queue,
+                                                 self.max_parallel_records, single_pass, kwargs),
+                                           daemon=True)
+                   for shard, records in enumerate(shards)]
+        for worker in workers:
+            worker.start()
+        if not self.quiet:
+            print("Watching %d records using %d processes" % (len(self.records), len(workers)))
+
+        passes = [0] * len(workers)
+        summaries = 0
+        running = set(range(len(workers)))
+        failed = False
+        try:
+            while running:
+                try:
+                    kind, shard, payload = results_queue.get(timeout=1)
+                except queue.Empty:
+                    if not any(workers[shard].is_alive() for shard in running):
+                        # Died without saying goodbye
+                        print("Worker processes exited unexpectedly.", file=sys.stderr)
+                        failed = True
+                        break
+                    continue
+
+                if kind == QueueOutput.RECORD:
+                    self.status[(payload.host, payload.rr_type)] = payload.success
+                    self.output.report_record(payload, only_fail=only_fail, verbose=verbose)
+                elif kind == QueueOutput.PASS:
+                    passes[shard] += 1
+                elif kind == QueueOutput.ERROR:
+                    print("Worker %d failed: %s" % (shard, payload), file=sys.stderr)
+                    failed = True
+                elif kind == QueueOutput.DONE:
+                    running.discard(shard)
+
+                # Overall summary once every running worker has finished its pass
+                if kind in (QueueOutput.PASS, QueueOutput.DONE):
+                    completed = min(passes[shard] for shard in running) if running else max(passes)
+                    if completed > summaries:
+                        summaries = completed
+                        self.output.summary(self.successes, len(self.records))
+                        self.output.flush()
+        finally:
+            for shard, worker in enumerate(workers):
+                # Finished workers may still be flushing their results
+                worker.join(timeout=0 if shard in running else 1)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+
+        return not failed and self.successes == len(self.records)
+
+    @property
+    def successes(self):
+        return len([success for success in self.status.values() if success])
@@ -0,0 +1,178 @@
+import sys
+import time
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from .monitor import Monitor
+from .scheduler import PollScheduler
+from .output import ConsoleOutput
+
+
+class WatchlistRecord:
+    """
+    Single (host, RR-type) pair being watched and the monitor doing the watching.
+    """
+
+    def __init__(self, host, rr_type, expected=None):
+        self.host = host
+        self.rr_type = rr_type
+        self.expected = expected
+        self.monitor = None
+        self.success = False
+        self.last_ok = 'never'
+        self.messages = []
+        self.local_ttl = None
+
+    def __str__(self):
+        return "%s %s" % (self.host, self.rr_type)
+
+
+class Watchlist:
+    """
+    Monitor multiple records in one process.
+    Authorities are looked up once per zone and all records are queried together on every pass.
+    """
+
+    def __init__(self, dns, monitor_factory, records, max_parallel_records=16, output=None):
+        """
+        :param dns: DNS shared by all monitors
+        :param monitor_factory: callable, returns a new Monitor for given expected value
+        :param records: list of WatchlistRecord
+        :param max_parallel_records: max number of records to monitor at once
+        :param output: where results of passes go. Default is console.
+        """
+        self.dns = dns
+        self.monitor_factory = monitor_factory
+        self.records = records
+        self.output = output or ConsoleOutput()
+        self.quiet = False
+        # Worker processes leave signals to their coordinator
+        self.handle_signals = True
+        # Wake up on NOTIFY instead of waiting full interval
+        self.notify_listener = None
+        self.executor = ThreadPoolExecutor(max_workers=max_parallel_records)
+
+    @staticmethod
+    def read(watchlist_file, default_rr_type='A', default_expected=None):
+        """
+        Read records to watch.
+        One record per line: host [RR-type [expected value[,value...]]]
+        Empty lines and lines starting with # are skipped.
+        :param watchlist_file: filename to read, - for stdin
+        :param default_rr_type: RR-type to use if not given on a line
+        :param default_expected: expected value to use if not given on a line
+        :return: list of WatchlistRecord
+        """
+        if watchlist_file == '-':
+            lines = sys.stdin.readlines()
+        else:
+            with open(watchlist_file, 'r') as watchlist:
+                lines = watchlist.readlines()
+
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(None, 2)
+            host = fields[0]
+            rr_type = fields[1].upper() if len(fields) > 1 else default_rr_type
+            expected = fields[2] if len(fields) > 2 else default_expected
+            records.append(WatchlistRecord(host, rr_type, expected=expected))
+
+        return records
+
+    def init_monitor(self, verbose=False):
+        for record in self.records:
+            record.monitor = self.monitor_factory(record.expected)
+            record.monitor.quiet = True
+            # Passes are reported by the watchlist in order of records
+            record.monitor.output = None
+            record.monitor.init_monitor(record.host, record.rr_type, verbose=verbose)
+
+        if self.quiet:
+            return
+        zones = self.dns.zone_authorities
+        if zones:
+            print("Watching %d records in %d zones" % (len(self.records), len(zones)))
+        else:
+            print("Watching %d records" % len(self.records))
+        if verbose:
+            for zone, authorities in zones.items():
+                print("Authorities for %s: %s" % (zone, ', '.join(authorities.keys())))
+
+    def _monitor_record(self, record, **kwargs):
+        (stat, messages, last_ok, local_ttl) = record.monitor.monitor(record.host, record.rr_type,
+                                                                      last_ok=record.last_ok, **kwargs)
+        record.success = stat
+        record.messages = messages
+        record.last_ok = last_ok
+        record.local_ttl = local_ttl
+
+        return record
+
+    def monitor(self, records, only_fail=False, verbose=False, **kwargs):
+        """
+        Do one pass over given records. All of them are queried at once.
+        :param records: list of WatchlistRecord
+        :param only_fail: print only failing records
+        :param verbose:
+        :return: int, number of successful records
+        """
+        record_passes = [self.executor.submit(self._monitor_record, record, verbose=verbose, **kwargs)
+                         for record in records]
+        successes = 0
+        for record_pass in record_passes:
+            record = record_pass.result()
+            if record.success:
+                successes += 1
+            self.output.report_record(record.monitor.last_pass, only_fail=only_fail, verbose=verbose)
+
+        return successes
+
+    def single_pass(self, timeout=None, verbose=False):
+        successes = self.monitor(self.records, timeout=timeout, verbose=verbose)
+        self.output.summary(successes, len(self.records))
+        self.output.flush()
+
+        return successes == len(self.records)
+
+    def continuous(self, interval=0, only_fail=False, stop_on_success=True,
+                   min_interval=None, max_interval=None, adaptive=False, **kwargs):
+        # Keep looping
+        if self.handle_signals:
+            signal.signal(signal.SIGINT, Monitor.exit_gracefully)
+            signal.signal(signal.SIGTERM, Monitor.exit_gracefully)
+
+        scheduler = PollScheduler(interval, min_interval=min_interval, max_interval=max_interval,
+                                  adaptive=adaptive)
+        records = self.records
+        while True:
+            timeouts = self.dns.timeouts
+            self.monitor(records, only_fail=only_fail, stop_on_success=stop_on_success, **kwargs)
+            successes = len([record for record in self.records if record.success])
+            self.output.summary(successes, len(self.records))
+
+            if stop_on_success:
+                # Records reaching success are done, keep polling the rest
+                records = [record for record in records if not record.success]
+                if not records:
+                    break
+
+            # Soonest expiring local TTL decides
+            local_ttls = [record.local_ttl for record in records if record.local_ttl]
+            local_ttl = min(local_ttls) if local_ttls else None
+            self.output.flush()
+            self.wait(records, scheduler.next_interval(local_ttl=local_ttl, timeouts=self.dns.timeouts - timeouts))
+
+    def wait(self, records, seconds):
+        """
+        Wait until next pass. A NOTIFY for a zone of given records ends the wait early.
+        """
+        if not self.notify_listener:
+            time.sleep(seconds)
+            return
+
+        zones = set(record.monitor.zone for record in records if record.monitor.zone)
+        notified = self.notify_listener.wait(seconds, zones=zones)
+        if notified and not self.quiet:
+            print("NOTIFY received for %s" % ', '.join(sorted(notified)))
@@ -0,0 +1,17 @@
+import pytest
+from lib.bench import FarmLayout, StubFarm
+
+
+@pytest.fixture(scope='session')
+def stub_farm():
+    """
+    Stub local DNS and authorities of the benchmark on port 53 of loopback addresses.
+    Skipped where port 53 can't be bound.
+    """
+    farm = StubFarm(FarmLayout(records=4, records_per_zone=2, servers=2))
+    try:
+        farm.start()
+    except OSError as exc:
+        pytest.skip(str(exc))
+    yield farm
+    farm.stop()
@@ -0,0 +1,54 @@
+import pickle
+import pytest
+import dns.rrset
+from lib.dns import AnswerSet, InvalidValueError, UnknownRRTypeError
+
+
+def test_order_and_case_do_not_matter():
+    first = AnswerSet.from_rrsets([dns.rrset.from_text('www.example.com.', 300, 'IN', 'MX',
+                                                       '10 MX1.example.com.', '20 mx2.example.com.')])
+    second = AnswerSet.from_rrsets([dns.rrset.from_text('www.example.com.', 60, 'IN', 'MX',
+                                                        '20 mx2.example.com.', '10 mx1.example.com.')])
+
+    assert first == second
+    assert first.digest == second.digest
+    assert first is second
+
+
+def test_every_record_counts():
+    assert AnswerSet.from_text('A', '1.2.3.4') != AnswerSet.from_text('A', '1.2.3.4,1.2.3.5')
+    assert len(AnswerSet.from_text('A', '1.2.3.4,1.2.3.5')) == 2
+    assert AnswerSet.from_text('A', []) is AnswerSet.EMPTY
+
+
+def test_from_text_splits_on_commas():
+    assert AnswerSet.from_text('A', '1.2.3.5, 1.2.3.4') == AnswerSet.from_text('A', ['1.2.3.4', '1.2.3.5'])
+    assert sorted(AnswerSet.from_text('TXT', '"a,b","c"').texts) == ['"a,b"', '"c"']
+    assert AnswerSet.from_text('MX', '10 mx.example.com.').texts == ('10 mx.example.com.',)
+
+
+def test_from_text_names_without_trailing_dot():
+    assert AnswerSet.from_text('CNAME', 'target.example.com') == AnswerSet.from_text('CNAME', 'target.example.com.')
+    assert AnswerSet.from_text('MX', '10 mx.example.com').texts == ('10 mx.example.com.',)
+
+
+def test_from_text_invalid_value():
+    with pytest.raises(InvalidValueError) as exc_info:
+        AnswerSet.from_text('A', 'not-an-address')
+    assert 'not-an-address' in str(exc_info.value)
+
+    with pytest.raises(UnknownRRTypeError):
+        AnswerSet.from_text('NOPE', '1.2.3.4')
+
+
+def test_pickled_set_keeps_digest_and_text():
+    answer_set = AnswerSet.from_text('A', '192.0.2.1,192.0.2.2')
+    restored = pickle.loads(pickle.dumps(answer_set))
+
+    assert restored == answer_set
+    assert restored.texts == answer_set.texts
+
+
+def test_soa_serial():
+    assert AnswerSet.from_text('SOA', 'ns.example.com. h.example.com. 42 1 2 3 4').soa_serial == 42
+    assert AnswerSet.from_text('A', '192.0.2.1').soa_serial is None
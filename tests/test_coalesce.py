@@ -0,0 +1,85 @@
+import time
+import asyncio
+import threading
+from lib.dns import QueryCoalescer, ServerResult
+
+
+def _response(ttl=300, error=None):
+    result = ServerResult(ServerResult.ROLE_AUTHORITY, 'ns1.example.com.', '192.0.2.1')
+    result.ttl = ttl
+    result.error = error
+
+    return object(), result
+
+
+def test_in_flight_queries_are_sent_once():
+    coalescer = QueryCoalescer()
+    release = threading.Event()
+    sent = []
+
+    def send():
+        sent.append(1)
+        release.wait(5)
+        return _response()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(coalescer.query('key', send))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(sent) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert len(set(id(response) for response, _ in results)) == 1
+
+
+def test_completed_responses_are_not_reused_by_default():
+    coalescer = QueryCoalescer()
+    sent = []
+
+    def send():
+        sent.append(1)
+        return _response()
+
+    coalescer.query('key', send)
+    _, shared = coalescer.query('key', send)
+
+    assert not shared
+    assert len(sent) == 2
+
+
+def test_fresh_responses_are_reused_within_ttl():
+    coalescer = QueryCoalescer(freshness=60)
+    coalescer.query('key', lambda: _response(ttl=300))
+    _, shared = coalescer.query('key', lambda: _response())
+    assert shared
+
+    coalescer.query('short', lambda: _response(ttl=0))
+    _, shared = coalescer.query('short', lambda: _response())
+    assert not shared
+
+    coalescer.query('failed', lambda: _response(error=ServerResult.ERROR_TIMEOUT))
+    _, shared = coalescer.query('failed', lambda: _response())
+    assert not shared
+
+
+def test_async_in_flight_queries_are_sent_once():
+    coalescer = QueryCoalescer()
+    sent = []
+
+    async def send():
+        sent.append(1)
+        await asyncio.sleep(0.05)
+        return _response()
+
+    async def run():
+        return await asyncio.gather(*[coalescer.query_async('key', send) for _ in range(3)])
+
+    results = asyncio.run(run())
+
+    assert len(sent) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert not coalescer.in_flight
@@ -0,0 +1,47 @@
+import json
+import threading
+from lib.dns import DelegationCache
+
+
+def test_concurrent_puts_save_a_valid_file(tmp_path):
+    cache_file = tmp_path / 'authorities.json'
+    cache = DelegationCache(cache_file=str(cache_file))
+    errors = []
+
+    def put(number):
+        try:
+            cache.put('zone%d.example.' % number, {'ns1.example.': ['192.0.2.1']}, 300)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=put, args=(number,)) for number in range(200)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(json.loads(cache_file.read_text())) == 200
+    assert [path.name for path in tmp_path.iterdir()] == ['authorities.json']
+    assert len(DelegationCache(cache_file=str(cache_file)).active_zones()) == 200
+
+
+def test_no_autosave_writes_only_on_save(tmp_path):
+    cache_file = tmp_path / 'authorities.json'
+    cache = DelegationCache(cache_file=str(cache_file))
+    cache.autosave = False
+    cache.put('example.com.', {'ns1.example.com.': ['192.0.2.1']}, 300)
+    assert not cache_file.exists()
+
+    cache.save()
+    assert DelegationCache(cache_file=str(cache_file)).get('example.com') == {'ns1.example.com.': ['192.0.2.1']}
+
+
+def test_members_expire_with_their_ttl():
+    cache = DelegationCache()
+    cache.put_member('www.example.com', 'example.com.', 300)
+    cache.put_member('old.example.com', 'example.com.', 0)
+
+    assert cache.zone_of('WWW.example.com.') == 'example.com.'
+    assert cache.zone_of('old.example.com') is None
+    assert cache.zone_of('other.example.com') is None
@@ -0,0 +1,69 @@
+import time
+import dns.rdata
+import dns.dnssec
+import dns.rdatatype
+import dns.rdataclass
+from lib.dns import KeyValidator
+
+ZONE = 'example.com.'
+KSK = dns.rdata.from_text(dns.rdataclass.IN, dns.rdatatype.DNSKEY,
+                          '257 3 13 mdsswUyr3DPW132mOi8V9xESWE8jTo0dxCjjnopKl+GqJxpVXckHAeF+KkxLbxILfDLUT0rAK9iUzy1L53eKGQ==')
+SOA = dns.rdata.from_text(dns.rdataclass.IN, dns.rdatatype.SOA, 'ns1.example.com. h.example.com. 1 2 3 4 5')
+
+
+def _rrsig(key_tag, inception, expiration):
+    return dns.rdata.from_text(dns.rdataclass.IN, dns.rdatatype.RRSIG,
+                               'SOA 13 2 300 %s %s %d %s AAAA' % (
+                                   time.strftime('%Y%m%d%H%M%S', time.gmtime(expiration)),
+                                   time.strftime('%Y%m%d%H%M%S', time.gmtime(inception)), key_tag, ZONE))
+
+
+def test_ds_match():
+    validator = KeyValidator()
+    ds = dns.dnssec.make_ds(ZONE, KSK, 'SHA256')
+    other_ds = dns.dnssec.make_ds('example.org.', KSK, 'SHA256')
+
+    assert validator.ds_match(ZONE, ds, KSK)
+    assert not validator.ds_match(ZONE, other_ds, KSK)
+    assert KeyValidator.is_ksk(KSK)
+
+
+def test_signature_without_crypto_is_not_valid():
+    validator = KeyValidator()
+    validator.crypto_available = False
+    now = time.time()
+    rrsig = _rrsig(KeyValidator.key_tag(KSK), now - 3600, now + 86400)
+
+    key_tags, errors = validator.signed_by(ZONE, [SOA], [rrsig], [KSK], now)
+
+    assert key_tags == set()
+    assert errors == ["signature by key %d not verified: no crypto library" % KeyValidator.key_tag(KSK)]
+
+
+def test_bad_signature_is_not_valid():
+    # Either fails to verify, or can't be verified without a crypto library
+    validator = KeyValidator()
+    now = time.time()
+    rrsig = _rrsig(KeyValidator.key_tag(KSK), now - 3600, now + 86400)
+
+    key_tags, errors = validator.signed_by(ZONE, [SOA], [rrsig], [KSK], now)
+
+    assert key_tags == set()
+    assert len(errors) == 1
+
+
+def test_signature_by_unknown_key():
+    validator = KeyValidator()
+    now = time.time()
+    rrsig = _rrsig((KeyValidator.key_tag(KSK) + 1) % 65536, now - 3600, now + 86400)
+
+    assert 'no DNSKEY' in validator.verify(ZONE, [SOA], rrsig, [KSK])
+
+
+def test_window_error():
+    now = time.time()
+
+    assert KeyValidator.window_error(_rrsig(1, now - 3600, now + 86400), now) is None
+    assert 'expired' in KeyValidator.window_error(_rrsig(1, now - 7200, now - 3600), now)
+    assert 'not valid until' in KeyValidator.window_error(_rrsig(1, now + 3600, now + 7200), now)
+    assert 'expires in' in KeyValidator.window_error(_rrsig(1, now - 3600, now + 600), now, margin=3600)
@@ -0,0 +1,99 @@
+import json
+import datetime
+from lib.dns import AnswerSet, ServerResult
+from lib.monitor import HistoryOutput, PassResult, PropagationHistory
+
+START = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _pass(seconds, states, host='www.example.com'):
+    """
+    :param states: list of tuples, server, answer and success
+    """
+    server_results = []
+    for server, answer, success in states:
+        role = ServerResult.ROLE_LOCAL if success is None else ServerResult.ROLE_AUTHORITY
+        result = ServerResult(role, server, server)
+        result.answers = AnswerSet.from_text('A', answer) if answer else AnswerSet.EMPTY
+        result.success = success
+        if not answer:
+            result.error = 'timeout'
+        server_results.append(result)
+
+    return PassResult(host, 'A', all(success is not False for _, _, success in states),
+                      server_results=server_results, timestamp=START + datetime.timedelta(seconds=seconds))
+
+
+def _write(path, passes):
+    history = HistoryOutput(str(path))
+    for pass_result in passes:
+        history.report(pass_result)
+    history.close()
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_only_changes_of_state_are_written(tmp_path):
+    path = tmp_path / 'history.jsonl'
+    _write(path, [_pass(0, [('192.0.2.1', '10.0.0.1', False)]),
+                  _pass(10, [('192.0.2.1', '10.0.0.1', False)]),
+                  _pass(20, [('192.0.2.1', '10.0.0.2', True)]),
+                  _pass(30, [('192.0.2.1', '10.0.0.2', True)])])
+
+    changes = [line for line in _lines(path) if 't' in line]
+    assert [(line['a'], line['ok']) for line in changes] == [(0, False), (1, True)]
+    # Server and answer sets are defined once
+    assert len([line for line in _lines(path) if 's' in line and 'host' in line]) == 1
+    assert len([line for line in _lines(path) if 'answers' in line]) == 2
+
+
+def test_time_to_propagate_per_server_and_region(tmp_path):
+    path = tmp_path / 'history.jsonl'
+    _write(path, [_pass(0, [('192.0.2.1', '10.0.0.1', False), ('192.0.2.2', '10.0.0.2', True),
+                            ('192.0.2.3', '10.0.0.1', False), ('127.0.0.1', '10.0.0.1', None)]),
+                  _pass(30, [('192.0.2.1', '10.0.0.2', True), ('192.0.2.2', '10.0.0.2', True),
+                             ('192.0.2.3', '10.0.0.1', False), ('127.0.0.1', '10.0.0.2', None)])])
+
+    history = PropagationHistory.read(str(path))
+    assert len(history.runs) == 1
+    timelines = {timeline.address: timeline for timeline in history.runs[0][1]}
+    assert timelines['192.0.2.1'].first_ok - timelines['192.0.2.1'].changes[0][0] == 30
+    assert timelines['192.0.2.3'].first_ok is None
+    assert not timelines['127.0.0.1'].judged
+
+    report = history.report({'192.0.2.1': 'eu', '192.0.2.2': 'eu', '192.0.2.3': 'us'})
+    lines = [line.split() for line in report.splitlines()]
+    assert ['192.0.2.1', 'eu', '30.0', '0', '10.0.0.2'] in lines
+    assert ['192.0.2.2', 'eu', '0.0', '0', '10.0.0.2'] in lines
+    assert ['192.0.2.3', 'us', 'never', '0', '10.0.0.1'] in lines
+    assert ['127.0.0.1', '-', '-', '0', '10.0.0.2'] in lines
+    # Per region: servers propagated out of servers, p50, p95 and max
+    assert ['eu', '2/2', '0.0', '30.0', '30.0'] in lines
+    assert ['us', '0/1', '-', '-', '-'] in lines
+
+
+def test_flaps_are_counted(tmp_path):
+    path = tmp_path / 'history.jsonl'
+    _write(path, [_pass(0, [('192.0.2.1', '10.0.0.2', True)]),
+                  _pass(10, [('192.0.2.1', None, False)]),
+                  _pass(20, [('192.0.2.1', '10.0.0.2', True)])])
+
+    timeline = PropagationHistory.read(str(path)).runs[0][1][0]
+    assert timeline.flaps == 1
+    assert timeline.changes[1][3] == 'timeout'
+
+
+def test_torn_lines_are_skipped_and_next_run_is_kept(tmp_path):
+    path = tmp_path / 'history.jsonl'
+    _write(path, [_pass(0, [('192.0.2.1', '10.0.0.1', False)])])
+    # Run killed in the middle of a line
+    with open(str(path), 'a') as stream:
+        stream.write('{"t":1704103210.0,"s":0,"a"')
+    _write(path, [_pass(60, [('192.0.2.1', '10.0.0.2', True)], host='mail.example.com')])
+
+    history = PropagationHistory.read(str(path))
+    assert len(history.runs) == 2
+    assert [len(timeline.changes) for timeline in history.runs[0][1]] == [1]
+    assert [timeline.host for timeline in history.runs[1][1]] == ['mail.example.com']
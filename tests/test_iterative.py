@@ -0,0 +1,44 @@
+import pytest
+from lib.dns import DNS, EventLoopDNS, AuthorityError
+
+
+def _engine(layout, engine):
+    resolver = engine(default_resolver=[layout.LOCAL_ADDRESS], query_timeout=2, query_freshness=None)
+    sent = []
+    transport = resolver.engine.transport if engine is EventLoopDNS else resolver.transport
+    query = transport.query
+
+    def counting_query(query_request, address, *args, **kwargs):
+        sent.append((query_request.question[0].name.to_text(), address))
+        return query(query_request, address, *args, **kwargs)
+
+    transport.query = counting_query
+
+    return resolver, sent
+
+
+@pytest.mark.parametrize('engine', [DNS, EventLoopDNS])
+def test_hosts_that_are_not_zone_cuts_are_looked_up_once(stub_farm, engine):
+    layout = stub_farm.layout
+    resolver, sent = _engine(layout, engine)
+    authorities = resolver.find_zone_authorities(layout.host_name(0))
+    assert resolver.zone_of(layout.host_name(0)) == layout.zone_name(0)
+    assert layout.host_name(0) in [name for name, _ in sent]
+
+    del sent[:]
+    assert resolver.find_zone_authorities(layout.host_name(0)) == authorities
+    assert sent == []
+
+    # Zone cut is cached, only NS of the host is asked
+    resolver.find_zone_authorities(layout.host_name(1))
+    assert sent and all(name == layout.host_name(1) for name, _ in sent)
+
+
+@pytest.mark.parametrize('engine', [DNS, EventLoopDNS])
+def test_local_dns_is_not_an_authority(stub_farm, engine):
+    layout = stub_farm.layout
+    resolver, sent = _engine(layout, engine)
+
+    with pytest.raises(AuthorityError):
+        resolver.find_zone_authorities(layout.DOMAIN)
+    assert all(address == layout.LOCAL_ADDRESS for _, address in sent)
@@ -0,0 +1,44 @@
+from lib.dns import DNS, AnswerSet
+from lib.monitor import MonitorLocalChange, MonitorLocalExpected
+
+
+def _unreachable():
+    # Nothing listens on this loopback address
+    return DNS(default_resolver=['127.0.0.9'], query_timeout=0.3)
+
+
+def test_failed_local_query_is_not_a_change():
+    monitor = MonitorLocalChange(_unreachable())
+    monitor.quiet = True
+    monitor.output = None
+    monitor.expected_answers = AnswerSet.from_text('A', '192.0.2.1')
+
+    success, messages, last_ok, _ = monitor.monitor('www.example.com', 'A', timeout=0.3, last_ok='never')
+
+    assert success is False
+    assert last_ok == 'never'
+    assert any('failed' in str(message) for message in messages)
+
+
+def test_failed_local_query_fails_expected():
+    monitor = MonitorLocalExpected(_unreachable(), '192.0.2.1')
+    monitor.quiet = True
+    monitor.output = None
+    monitor.init_monitor('www.example.com', 'A')
+
+    success, messages, _, _ = monitor.monitor('www.example.com', 'A', timeout=0.3)
+
+    assert success is False
+    assert monitor.last_pass.server_results[0].success is False
+
+
+def test_local_change_from_initial(stub_farm):
+    layout = stub_farm.layout
+    monitor = MonitorLocalChange(DNS(default_resolver=[layout.LOCAL_ADDRESS], query_timeout=2))
+    monitor.quiet = True
+    monitor.output = None
+    monitor.expected_answers = AnswerSet.from_text('A', '192.0.2.1')
+
+    success, _, _, _ = monitor.monitor(layout.host_name(0), 'A', timeout=2)
+
+    assert success is True
@@ -0,0 +1,44 @@
+import urllib.request
+from lib.dns import DNS
+from lib.monitor import MetricsOutput, MetricsServer, MonitorAuthoritativeCompareLocal, MonitorAuthoritativeExpected
+
+
+def _scrape(metrics_output):
+    metrics_server = MetricsServer(metrics_output, address='127.0.0.1', port=0)
+    metrics_server.start()
+    try:
+        with urllib.request.urlopen('http://127.0.0.1:%d/metrics' % metrics_server.port, timeout=5) as response:
+            return response.read().decode('utf-8').splitlines()
+    finally:
+        metrics_server.stop()
+
+
+def _check(monitor, host):
+    monitor.output = MetricsOutput(monitor.dns)
+    monitor.quiet = True
+    monitor.init_monitor(host, 'A')
+    monitor.check(host, 'A', timeout=2)
+
+    return _scrape(monitor.output)
+
+
+def test_local_dns_has_no_match_gauge(stub_farm):
+    layout = stub_farm.layout
+    dns = DNS(default_resolver=[layout.LOCAL_ADDRESS], query_timeout=2)
+    lines = _check(MonitorAuthoritativeCompareLocal(dns), layout.host_name(0))
+
+    match_lines = [line for line in lines if line.startswith('dns_monitor_answer_match{')]
+    assert match_lines
+    assert all('role="authority"' in line and line.endswith(' 1') for line in match_lines)
+    assert 'dns_monitor_record_success{host="%s",rr_type="A"} 1' % layout.host_name(0) in lines
+
+
+def test_mismatch_is_zero(stub_farm):
+    layout = stub_farm.layout
+    dns = DNS(default_resolver=[layout.LOCAL_ADDRESS], query_timeout=2)
+    lines = _check(MonitorAuthoritativeExpected(dns, '192.0.2.1'), layout.host_name(1))
+
+    match_lines = [line for line in lines if line.startswith('dns_monitor_answer_match{')]
+    assert match_lines
+    assert all(line.endswith(' 0') for line in match_lines)
+    assert not [line for line in lines if line.startswith('dns_monitor_last_success_timestamp_seconds{')]
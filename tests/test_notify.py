@@ -0,0 +1,60 @@
+import time
+import threading
+import dns.flags
+import dns.rcode
+import dns.opcode
+import pytest
+from lib.dns import NotifyListener
+from lib.bench import send_notify
+from lib.monitor import Monitor
+
+
+@pytest.fixture
+def listener():
+    notify_listener = NotifyListener(address='127.0.0.1', port=0)
+    notify_listener.start()
+    yield notify_listener
+    notify_listener.close()
+
+
+def test_notify_is_acknowledged(listener):
+    response = send_notify('example.com.', '127.0.0.1', port=listener.port, serial=7)
+
+    assert response.opcode() == dns.opcode.NOTIFY
+    assert response.flags & dns.flags.QR
+    assert response.rcode() == dns.rcode.NOERROR
+    assert listener.wait(1, zones=['example.com.']) == {'example.com.': 7}
+
+
+def test_notify_from_other_source_is_refused():
+    notify_listener = NotifyListener(address='127.0.0.1', port=0, allowed_sources=['192.0.2.1'])
+    notify_listener.start()
+    try:
+        response = send_notify('example.com.', '127.0.0.1', port=notify_listener.port)
+        assert response.rcode() == dns.rcode.REFUSED
+        assert notify_listener.wait(0.1) == {}
+    finally:
+        notify_listener.close()
+
+
+def test_notify_for_other_zone_is_kept(listener):
+    send_notify('example.org.', '127.0.0.1', port=listener.port, serial=2)
+    send_notify('example.com.', '127.0.0.1', port=listener.port, serial=1)
+
+    assert listener.wait(1, zones=['example.com.']) == {'example.com.': 1}
+    assert listener.wait(0.1, zones=['example.org.']) == {'example.org.': 2}
+
+
+def test_notify_wakes_monitor_early(listener):
+    monitor = Monitor(None)
+    monitor.quiet = True
+    monitor.zone = 'example.com.'
+    monitor.notify_listener = listener
+    sender = threading.Timer(0.2, send_notify, args=('example.com.', '127.0.0.1'), kwargs={'port': listener.port})
+
+    started = time.monotonic()
+    sender.start()
+    monitor.wait(10)
+    sender.join()
+
+    assert time.monotonic() - started < 5
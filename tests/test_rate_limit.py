@@ -0,0 +1,132 @@
+import time
+import asyncio
+import threading
+import dns.exception
+from lib.dns import DNS, RateLimiter
+
+
+def test_burst_goes_through_then_queries_are_spaced():
+    limiter = RateLimiter(per_server=10)
+    start = time.monotonic()
+    for _ in range(10):
+        limiter.acquire('192.0.2.1')
+    assert time.monotonic() - start < 0.05
+    assert limiter.throttled == 0
+
+    limiter.acquire('192.0.2.1')
+    limiter.acquire('192.0.2.1')
+    assert time.monotonic() - start >= 0.15
+    assert limiter.throttled == 2
+
+
+def test_servers_have_separate_budgets():
+    limiter = RateLimiter(per_server=2)
+    start = time.monotonic()
+    for server in ('192.0.2.1', '192.0.2.2', '192.0.2.3'):
+        limiter.acquire(server)
+        limiter.acquire(server)
+
+    assert time.monotonic() - start < 0.05
+    assert limiter.throttled == 0
+
+
+def test_waiting_queries_get_total_budget_in_order_of_urgency():
+    limiter = RateLimiter(total=5)
+    for _ in range(5):
+        limiter.acquire('192.0.2.1')
+    order = []
+
+    def acquire(urgency):
+        limiter.acquire('192.0.2.1', urgency)
+        order.append(urgency)
+
+    threads = []
+    for urgency in (RateLimiter.BULK, RateLimiter.BULK, RateLimiter.NORMAL, RateLimiter.URGENT):
+        threads.append(threading.Thread(target=acquire, args=(urgency,)))
+        threads[-1].start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert order == [RateLimiter.URGENT, RateLimiter.NORMAL, RateLimiter.BULK, RateLimiter.BULK]
+    assert limiter.queue_depth == 0
+    assert limiter.max_queue_depth == 4
+
+
+def test_waiting_coroutines_get_total_budget_in_order_of_urgency():
+    limiter = RateLimiter(total=5)
+    order = []
+
+    async def acquire(urgency):
+        await limiter.acquire_async('192.0.2.1', urgency)
+        order.append(urgency)
+
+    async def main():
+        for _ in range(5):
+            await limiter.acquire_async('192.0.2.1')
+        tasks = []
+        for urgency in (RateLimiter.BULK, RateLimiter.BULK, RateLimiter.NORMAL, RateLimiter.URGENT):
+            tasks.append(asyncio.ensure_future(acquire(urgency)))
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert order == [RateLimiter.URGENT, RateLimiter.NORMAL, RateLimiter.BULK, RateLimiter.BULK]
+    assert limiter.queue_depth == 0
+
+
+def test_authority_queries_are_not_queued_behind_resolver_sweep():
+    """
+    With a single query thread busy sweeping resolvers, a query to an authority of another
+    record goes ahead of the rest of the sweep.
+    """
+    engine = DNS(default_resolver=['127.0.0.1'], max_parallel_queries=1, rate_limiter=RateLimiter(total=20),
+                 query_freshness=None)
+    sent = []
+
+    def query(query_request, address, timeout=None):
+        sent.append(address)
+        raise dns.exception.Timeout()
+
+    engine.transport.query = query
+    sweep = ['192.0.2.%d' % number for number in range(1, 31)]
+    sweeping = threading.Thread(target=engine.run_query, args=('www.example.com', 'A', sweep, 1.0),
+                                kwargs={'authorities': {}})
+    sweeping.start()
+    time.sleep(0.1)
+    engine.run_query('www.example.org', 'A', [], 1.0, authorities={'ns1.example.org.': ['198.51.100.1']})
+    sweeping.join()
+
+    assert sent.index('198.51.100.1') < 25
+    assert sorted(sent) == sorted(sweep + ['198.51.100.1'])
+
+
+def test_coalesced_queries_take_no_rate_limit():
+    engine = DNS(default_resolver=['127.0.0.1'], rate_limiter=RateLimiter(total=1000), query_freshness=0.0)
+    sent = []
+    acquired = []
+    acquire = engine.rate_limiter.acquire
+
+    def counting_acquire(server, urgency=RateLimiter.NORMAL):
+        acquired.append(server)
+        return acquire(server, urgency)
+
+    def query(query_request, address, timeout=None):
+        sent.append(address)
+        time.sleep(0.2)
+        raise dns.exception.Timeout()
+
+    engine.rate_limiter.acquire = counting_acquire
+    engine.transport.query = query
+    threads = [threading.Thread(target=engine.run_query, args=('www.example.com', 'A', ['192.0.2.1'], 1.0),
+                                kwargs={'authorities': {}})
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sent == ['192.0.2.1']
+    assert acquired == ['192.0.2.1']
+    assert engine.stats.servers['192.0.2.1'].shared == 2
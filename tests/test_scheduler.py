@@ -0,0 +1,47 @@
+from lib.monitor import PollScheduler
+
+
+def test_fixed_interval_when_not_adaptive():
+    scheduler = PollScheduler(10, adaptive=False)
+
+    assert scheduler.next_interval(local_ttl=300, timeouts=5) == 10
+
+
+def test_waits_half_of_remaining_ttl():
+    scheduler = PollScheduler(10)
+
+    assert scheduler.next_interval(local_ttl=300) == 150
+    assert scheduler.next_interval(local_ttl=12) == 10
+    assert scheduler.next_interval(local_ttl=3600) == scheduler.max_interval
+
+
+def test_speeds_up_to_min_interval_close_to_expiry():
+    scheduler = PollScheduler(10, min_interval=2)
+
+    assert scheduler.next_interval() == 10
+    assert scheduler.next_interval(local_ttl=300) == 150
+    assert scheduler.next_interval(local_ttl=12) == 6
+    assert scheduler.next_interval(local_ttl=1) == 2
+
+
+def test_timeouts_back_off_exponentially_with_jitter():
+    scheduler = PollScheduler(10, max_interval=1000)
+    for failed_passes in range(1, 6):
+        backoff = min(10 * 2 ** failed_passes, 1000)
+        interval = scheduler.next_interval(timeouts=1)
+        assert backoff / 2 <= interval <= backoff
+
+    # Capped at max interval however long servers keep timing out
+    for _ in range(PollScheduler.MAX_BACKOFF_STEPS * 2):
+        assert scheduler.next_interval(timeouts=1) <= 1000
+    assert scheduler.failed_passes == PollScheduler.MAX_BACKOFF_STEPS
+
+
+def test_backoff_resets_after_a_pass_without_timeouts():
+    scheduler = PollScheduler(10, min_interval=5)
+    scheduler.next_interval(timeouts=1)
+    scheduler.next_interval(timeouts=1)
+
+    assert scheduler.next_interval() == 10
+    assert scheduler.failed_passes == 0
+    assert 10 <= scheduler.next_interval(timeouts=1) <= 20
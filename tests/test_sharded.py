@@ -0,0 +1,48 @@
+from lib.dns import DNS, DelegationCache
+from lib.monitor import ShardedWatchlist, WatchlistRecord
+
+
+def _watchlist(hosts, processes=4, dns=None):
+    records = [WatchlistRecord(host, 'A') for host in hosts]
+
+    return ShardedWatchlist(None, None, records, processes, dns=dns)
+
+
+def test_records_are_split_by_zone_cut():
+    hosts = ['www.example.co.uk', 'mail.example.co.uk', 'www.other.co.uk', 'www.example.com']
+    watchlist = _watchlist(hosts)
+    watchlist.zones = {'www.example.co.uk': 'example.co.uk.', 'mail.example.co.uk': 'example.co.uk.',
+                       'www.other.co.uk': 'other.co.uk.'}
+
+    assert watchlist.domain_of('www.other.co.uk') == 'other.co.uk.'
+    # Unknown zone falls back to last two labels
+    assert watchlist.domain_of('www.example.com') == 'example.com.'
+    shard_of_host = {}
+    for shard, records in enumerate(watchlist.shards()):
+        for record in records:
+            shard_of_host[record.host] = shard
+    assert shard_of_host['www.example.co.uk'] == shard_of_host['mail.example.co.uk']
+    assert sorted(shard_of_host) == sorted(hosts)
+
+
+def test_zone_cuts_are_found_by_coordinator(stub_farm, tmp_path, monkeypatch):
+    layout = stub_farm.layout
+    dns = DNS(default_resolver=[layout.LOCAL_ADDRESS], query_timeout=2,
+              delegation_cache_file=str(tmp_path / 'authorities.json'))
+    saves = []
+    save = dns.delegation_cache.save
+    monkeypatch.setattr(dns.delegation_cache, 'save', lambda: saves.append(1) or save())
+    watchlist = _watchlist(layout.hosts(), dns=dns)
+    watchlist.quiet = True
+    watchlist.init_monitor()
+
+    # Cache file is written once for all zones
+    assert len(saves) == 1
+    assert len(DelegationCache(cache_file=str(tmp_path / 'authorities.json')).active_zones()) == layout.zones
+
+    assert watchlist.zones == {host: host.split('.', 1)[1] for host in layout.hosts()}
+
+    # Workers start from the zone cuts found
+    cache = DelegationCache()
+    cache.merge(dns.delegation_cache.entries())
+    assert sorted(cache.active_zones()) == sorted(layout.zone_name(zone) for zone in range(layout.zones))
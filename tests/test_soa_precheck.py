@@ -0,0 +1,63 @@
+from lib.dns import AnswerSet, ServerResult
+from lib.monitor import Monitor
+
+AUTHORITIES = {'ns1.example.com.': ['192.0.2.1'], 'ns2.example.com.': ['192.0.2.2']}
+
+
+class FakeDNS:
+    """
+    Authorities answer SOA with a fixed serial and the record with NXDOMAIN, it doesn't exist yet.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.serial = 1
+
+    def run_query(self, host, rr_type, additional_dns, timeout, authorities=None, results=None, verbose=False):
+        self.queries.append((rr_type, sorted(authorities or {})))
+        answers = {}
+        for authority, addresses in (authorities or {}).items():
+            result = ServerResult(ServerResult.ROLE_AUTHORITY, authority, addresses[0])
+            if rr_type == 'SOA':
+                result.answers = AnswerSet.from_text('SOA', 'ns1.example.com. h.example.com. %d 1 2 3 4' %
+                                                     self.serial)
+                answers[authority] = result.answers
+            else:
+                result.rcode = 'NXDOMAIN'
+            if results is not None:
+                results.append(result)
+
+        return answers, {}, []
+
+
+def _monitor():
+    monitor = Monitor(FakeDNS())
+    monitor.quiet = True
+    monitor.soa_precheck = True
+    monitor.zone = 'example.com.'
+    monitor.authorities = AUTHORITIES
+
+    return monitor
+
+
+def test_unchanged_serial_skips_authorities_of_missing_record():
+    monitor = _monitor()
+    monitor.query_authorities('www.example.com', 'A', 1, [])
+    monitor.dns.queries = []
+
+    results = []
+    monitor.query_authorities('www.example.com', 'A', 1, results)
+
+    assert monitor.dns.queries == [('SOA', sorted(AUTHORITIES)), ('A', [])]
+    assert sorted(result.label for result in results) == sorted(AUTHORITIES)
+
+
+def test_moved_serial_queries_authorities():
+    monitor = _monitor()
+    monitor.query_authorities('www.example.com', 'A', 1, [])
+    monitor.dns.serial = 2
+    monitor.dns.queries = []
+
+    monitor.query_authorities('www.example.com', 'A', 1, [])
+
+    assert monitor.dns.queries == [('SOA', sorted(AUTHORITIES)), ('A', sorted(AUTHORITIES))]
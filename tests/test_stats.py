@@ -0,0 +1,69 @@
+import threading
+from lib.dns import LatencyHistogram, QueryStats, RateLimiter, ServerResult
+
+
+def test_percentiles_are_accurate_to_bucket_width():
+    histogram = LatencyHistogram()
+    for millisecond in range(1, 1001):
+        histogram.record(millisecond / 1000.0)
+
+    accuracy = 2 ** (1.0 / LatencyHistogram.SUB_BUCKETS)
+    for percent, latency in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert latency <= histogram.percentile(percent) <= latency * accuracy
+    assert histogram.percentile(100) == 1.0
+    assert histogram.count == 1000
+    assert histogram.min == 0.001
+
+
+def test_out_of_range_latencies_go_to_edge_buckets():
+    histogram = LatencyHistogram()
+    histogram.record(0.0)
+    histogram.record(LatencyHistogram.MAX_LATENCY * 10)
+
+    assert histogram.buckets[0] == 1
+    assert histogram.buckets[-1] == 1
+    assert histogram.percentile(100) >= LatencyHistogram.MAX_LATENCY
+    assert histogram.max == LatencyHistogram.MAX_LATENCY * 10
+
+
+def test_cumulative_buckets_count_latencies_up_to_each_bound():
+    histogram = LatencyHistogram()
+    for latency in (0.002, 0.02, 0.03, 0.2, 3.0):
+        histogram.record(latency)
+
+    assert histogram.cumulative_buckets([0.001, 0.01, 0.1, 1.0, 10.0]) == [0, 1, 3, 4, 5]
+
+
+def test_nothing_recorded():
+    histogram = LatencyHistogram()
+
+    assert histogram.percentile(50) is None
+    assert histogram.cumulative_buckets([1.0]) == [0]
+
+
+def _report_while_locked(lock, report):
+    """
+    :return: bool, report finished while the same thread held the lock, like a signal handler would
+    """
+    reports = []
+
+    def run():
+        with lock:
+            reports.append(report())
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(2)
+
+    return bool(reports)
+
+
+def test_report_from_signal_handler_does_not_deadlock():
+    stats = QueryStats()
+    result = ServerResult(ServerResult.ROLE_LOCAL, '127.0.0.1', '127.0.0.1')
+    result.latency = 0.01
+    stats.record(result)
+    limiter = RateLimiter(total=10)
+
+    assert _report_while_locked(stats.lock, stats.report)
+    assert _report_while_locked(limiter.lock, limiter.report)
@@ -0,0 +1,81 @@
+import socket
+import threading
+import dns.message
+import dns.exception
+import pytest
+from lib.dns import Transport
+
+
+class UdpServer:
+    """
+    Answers queries on a loopback port, optionally a stale reply with another ID and garbage first.
+    Replies to queries listed in delayed are held back and sent before the reply to the next query.
+    """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.stale_first = False
+        self.delayed = set()
+        self.held = []
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                wire, client = self.sock.recvfrom(65535)
+            except OSError:
+                return
+            query = dns.message.from_wire(wire)
+            response = dns.message.make_response(query)
+            if query.id in self.delayed:
+                self.held.append(response)
+                continue
+            for held in self.held:
+                self.sock.sendto(held.to_wire(), client)
+            self.held = []
+            if self.stale_first:
+                stale = dns.message.make_response(query)
+                stale.id = (query.id + 1) % 65536
+                self.sock.sendto(stale.to_wire(), client)
+                self.sock.sendto(b'garbage', client)
+            self.sock.sendto(response.to_wire(), client)
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def server():
+    udp_server = UdpServer()
+    yield udp_server
+    udp_server.close()
+
+
+def test_replies_with_other_ids_are_skipped(server):
+    server.stale_first = True
+    transport = Transport()
+    query = dns.message.make_query('example.com.', 'A')
+
+    response = transport.query(query, '127.0.0.1', timeout=2, port=server.port)
+
+    assert query.is_response(response)
+
+
+def test_late_reply_on_reused_socket_is_skipped(server):
+    transport = Transport(max_idle_sockets=1)
+    late_query = dns.message.make_query('late.example.com.', 'A')
+    server.delayed.add(late_query.id)
+    with pytest.raises(dns.exception.Timeout):
+        transport.query(late_query, '127.0.0.1', timeout=0.2, port=server.port)
+
+    query = dns.message.make_query('example.com.', 'A')
+    query.id = (late_query.id + 1) % 65536
+    response = transport.query(query, '127.0.0.1', timeout=2, port=server.port)
+
+    assert query.is_response(response)
+    assert response.question[0].name.to_text() == 'example.com.'
+    # Same socket was used for both
+    assert len(transport.idle_sockets[('udp', '127.0.0.1', server.port)]) == 1
@@ -0,0 +1,51 @@
+import dns.name
+import dns.rdatatype
+from lib.dns import ZoneDiff, ZoneFile
+
+ZONE = '''$TTL 300
+@       SOA ns1 hostmaster 1 3600 600 86400 300
+@       NS  ns1
+ns1     A   192.0.2.1
+www     A   192.0.2.10
+www     A   192.0.2.11
+mail    MX  10 mx
+'''
+
+
+def _zone_file(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+
+    return ZoneFile('example.com.', str(path))
+
+
+def _key(name, rr_type):
+    return dns.name.from_text(name), dns.rdatatype.from_text(rr_type)
+
+
+def test_same_zones_have_no_differences(tmp_path):
+    reference = _zone_file(tmp_path, 'reference', ZONE)
+    copy = _zone_file(tmp_path, 'copy', ZONE)
+
+    assert ZoneDiff([reference, copy]).run() == {copy: {}}
+
+
+def test_differences_per_name_and_type(tmp_path):
+    reference = _zone_file(tmp_path, 'reference', ZONE)
+    copy = _zone_file(tmp_path, 'copy', ZONE.replace('www     A   192.0.2.11\n', '')
+                      .replace('mail    MX  10 mx', 'mail    MX  20 mx') + 'ftp     A   192.0.2.20\n')
+
+    assert ZoneDiff([reference, copy]).run() == {copy: {
+        _key('www.example.com.', 'A'): 1,
+        _key('mail.example.com.', 'MX'): 0,
+        _key('ftp.example.com.', 'A'): -1,
+    }}
+
+
+def test_order_of_records_does_not_matter(tmp_path, monkeypatch):
+    monkeypatch.setattr(ZoneFile, 'BATCH_SIZE', 1)
+    reference = _zone_file(tmp_path, 'reference', ZONE)
+    lines = ZONE.splitlines()
+    copy = _zone_file(tmp_path, 'copy', '\n'.join(lines[:2] + lines[:1:-1]) + '\n')
+
+    assert ZoneDiff([reference, copy]).run() == {copy: {}}